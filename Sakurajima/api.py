@@ -1,14 +1,14 @@
 import requests
 import json
 import base64
-import random
+import os
 from urllib.parse import unquote
+from concurrent.futures import ThreadPoolExecutor
 from Sakurajima.models import (
     Anime,
     RecommendationEntry,
     Relation,
     AniWatchEpisode,
-    Episode,
     ChronicleEntry,
     UserAnimeListEntry,
     UserMedia,
@@ -21,6 +21,8 @@ from Sakurajima.models import (
 from Sakurajima.models.user_models import Friend, FriendRequestIncoming, FriendRequestOutgoing
 from Sakurajima.utils.episode_list import EpisodeList
 from Sakurajima.utils.network import Network
+from Sakurajima.utils.proxy_pool import ProxyPool
+from Sakurajima.utils.page_iterator import PageIterator
 from Sakurajima.errors import AniwatchError
 
 class Sakurajima:
@@ -37,18 +39,26 @@ class Sakurajima:
     """
 
     def __init__(
-        self, username=None, userId=None, authToken=None, proxies=None, endpoint="https://aniwatch.me/api/ajax/APIHandle"
+        self, username=None, userId=None, authToken=None, proxies=None, endpoint="https://aniwatch.me/api/ajax/APIHandle",
+        proxy_pool=None, pool_sizes=None, rate_limiter=None, response_cache=None, catalog=None
     ):
 
         self.API_URL = endpoint
-        self.network = Network(username, userId, authToken, proxies, endpoint)
+        self.username = username
+        self.userId = userId
+        self.catalog = catalog
+        # When a CatalogIndex is set, searches are answered from it instead of the server.
+        self.network = Network(
+            username, userId, authToken, proxies, endpoint, proxy_pool, pool_sizes, rate_limiter, response_cache
+        )
 
     @classmethod
     def using_proxy(
         cls, proxy_file=None, username=None, userId=None, authToken=None, endpoint="https://aniwatch.me/api/ajax/APIHandle"
         ):
         """An alternate constructor that reads a file containing a list of proxies
-        and chooses a random proxy to use with Sakurajima.
+        and routes every request through the healthiest of them using a :class:`ProxyPool`.
+        Proxies that fail or get banned are taken out of rotation for a while.
 
         :param username: The username of the user, defaults to None
         :type username: str, optional
@@ -63,10 +73,7 @@ class Sakurajima:
         :return: A Sakurajima object configured to use a proxy.
         :rtype: Sakurajima
         """
-        with open(proxy_file, "r") as proxy_file_handle:
-            proxies = proxy_file_handle.readlines()
-        proxy = random.choice(proxies).replace("\n", "")
-        return cls(username, userId, authToken, {"https": proxy})            
+        return cls(username, userId, authToken, endpoint=endpoint, proxy_pool=ProxyPool.from_file(proxy_file))
     
     @classmethod
     def from_cookie(cls, cookie_file):
@@ -117,12 +124,108 @@ class Sakurajima:
             "action": "getEpisodes",
             "detail_id": str(anime_id),
         }
-        return EpisodeList(
-            [
-                Episode(data_dict, self.network, self.API_URL, anime_id)
-                for data_dict in self.network.post(data, f"/anime/{anime_id}")["episodes"]
-            ]
-        )
+        return EpisodeList.from_rows(self.network.post(data, f"/anime/{anime_id}")["episodes"], self.network, self.API_URL, anime_id)
+
+    def resume(
+        self,
+        episode_id: int,
+        path: str = None,
+        multi_threading: bool = False,
+        max_threads: int = None,
+        use_ffmpeg: bool = True,
+        delete_chunks: bool = True,
+    ):
+        """Resumes an interrupted episode download. The progress data saved by the
+        downloader is used to download only the chunks that are missing, the episode
+        is then merged like it would be by :meth:`Episode.download`.
+
+        :param episode_id: The episode ID of the episode whose download you want to resume.
+        :type episode_id: int
+        :param path: The path that was passed to :meth:`Episode.download`, defaults to None.
+                     If left None the current working directory is used.
+        :type path: str, optional
+        :param multi_threading: Set this to true to resume using multiple threads, defaults to False.
+        :type multi_threading: bool, optional
+        :param max_threads: The maximum number of threads used when ``multi_threading`` is enabled,
+                            defaults to None.
+        :type max_threads: int, optional
+        :param use_ffmpeg: Whether to use ``ffmpeg`` to merge the chunks, defaults to True.
+        :type use_ffmpeg: bool, optional
+        :param delete_chunks: Whether to delete the chunks and the progress data once the episode
+                              has been merged, defaults to True.
+        :type delete_chunks: bool, optional
+        """
+        # The download stack is only imported once something is actually downloaded.
+        from Sakurajima.utils.playlist import Playlist
+        from Sakurajima.utils.downloader import Downloader, MultiThreadDownloader
+        from Sakurajima.utils.progress_tracker import ProgressTracker
+        current_path = os.getcwd()
+        if path:
+            os.chdir(path)
+        try:
+            progress_data = ProgressTracker(episode_id).get_progress_data()
+            if progress_data is None:
+                raise ValueError(f"No progress data found for the episode {episode_id}")
+            resume_data, _ = progress_data
+            m3u8 = Playlist.loads(resume_data["playlist"])
+            if multi_threading:
+                dlr = MultiThreadDownloader(
+                    self.network, m3u8, resume_data["file_name"], episode_id, max_threads, use_ffmpeg,
+                    resume_data["include_intro"], delete_chunks, headers=resume_data["chunk_headers"],
+                    direct_write=resume_data["direct_write"], ffmpeg_pipe=resume_data.get("ffmpeg_pipe", False)
+                )
+            else:
+                dlr = Downloader(
+                    self.network, m3u8, resume_data["file_name"], episode_id, use_ffmpeg,
+                    resume_data["include_intro"], delete_chunks, headers=resume_data["chunk_headers"],
+                    direct_write=resume_data["direct_write"], ffmpeg_pipe=resume_data.get("ffmpeg_pipe", False)
+                )
+            dlr.resume()
+            dlr.merge()
+            if delete_chunks:
+                dlr.remove_chunks()
+        finally:
+            os.chdir(current_path)
+
+    def download_batch(
+        self,
+        episodes,
+        quality: str,
+        file_name: str = "<anititle> - <ep>",
+        path: str = None,
+        max_segments: int = 32,
+        max_handshakes: int = 4,
+        **download_options
+    ):
+        """Downloads many episodes, possibly of different anime, through a single :class:`DownloadScheduler`.
+        Use :class:`DownloadScheduler` directly to give the episodes different priorities.
+
+        :param episodes: The :class:`Episode` objects that are to be downloaded.
+        :type episodes: list[Episode]
+        :param quality: The quality that you want to download, see :meth:`Episode.download`.
+        :type quality: str
+        :param file_name: The file name template used for every episode, see :meth:`Episode.download`,
+                          defaults to "<anititle> - <ep>".
+        :type file_name: str, optional
+        :param path: The directory the episodes are downloaded to, defaults to None. If None, the
+                     current working directory is used.
+        :type path: str, optional
+        :param max_segments: The maximum number of segments that are downloaded at once across all
+                             the episodes, defaults to 32.
+        :type max_segments: int, optional
+        :param max_handshakes: The maximum number of episodes that fetch their M3U8 data at once,
+                               defaults to 4.
+        :type max_handshakes: int, optional
+        :param download_options: Passed on to :meth:`Episode.create_downloader`, for example
+                                 ``include_intro``, ``use_ffmpeg``, ``delete_chunks`` or ``direct_write``.
+        :return: A list of :class:`DownloadJob` objects, one per episode, with the state of each download.
+        :rtype: list[DownloadJob]
+        """
+        from Sakurajima.utils.scheduler import DownloadScheduler
+        scheduler = DownloadScheduler(max_segments, max_handshakes, path=path)
+        for episode in episodes:
+            scheduler.add(episode, quality, file_name, **download_options)
+        return scheduler.run()
 
     def get_anime(self, anime_id: int):
         """Gets an anime by its ID.
@@ -145,6 +248,65 @@ class Sakurajima:
         else:
             return Anime(json["anime"], network=self.network, api_url=self.API_URL,)
 
+    def get_animes(self, anime_ids, with_episodes: bool = False, max_workers: int = 16, return_exceptions: bool = False):
+        """Gets several anime at once. The anime are fetched concurrently, and an anime whose
+        ID is given more than once is only fetched once. The requests still go through the
+        network's rate limiter.
+
+        :param anime_ids: The IDs of the anime you want to get.
+        :type anime_ids: list[int]
+        :param with_episodes: Whether to also fetch the episodes of every anime, so that
+                              :meth:`Anime.get_episodes` does not make a request, defaults to False.
+        :type with_episodes: bool, optional
+        :param max_workers: The maximum number of requests made at once, defaults to 16.
+        :type max_workers: int, optional
+        :param return_exceptions: Whether to put the exception in place of an anime that could not be
+                                  fetched instead of raising it, defaults to False.
+        :type return_exceptions: bool, optional
+        :return: The anime in the same order as the IDs.
+        :rtype: list[Anime]
+        """
+        anime_ids = [str(anime_id) for anime_id in anime_ids]
+        unique_ids = list(dict.fromkeys(anime_ids))
+
+        def fetch(anime_id):
+            try:
+                anime = self.get_anime(anime_id)
+                if with_episodes:
+                    anime.get_episodes()
+                return anime
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise e
+
+        if not unique_ids:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_ids))) as executor:
+            animes = dict(zip(unique_ids, executor.map(fetch, unique_ids)))
+        return [animes[anime_id] for anime_id in anime_ids]
+
+    def hydrate(self, animes, with_episodes: bool = False, max_workers: int = 16, return_exceptions: bool = False):
+        """Gets the complete objects of several partial Anime objects at once, like the ones returned
+        by :meth:`get_popular_anime` or :meth:`search`. This does the same as calling
+        :meth:`Anime.get_complete_object` on each of them, but concurrently, see :meth:`get_animes`.
+
+        :param animes: The anime you want the complete objects of.
+        :type animes: list[Anime]
+        :param with_episodes: Whether to also fetch the episodes of every anime, defaults to False.
+        :type with_episodes: bool, optional
+        :param max_workers: The maximum number of requests made at once, defaults to 16.
+        :type max_workers: int, optional
+        :param return_exceptions: Whether to put the exception in place of an anime that could not be
+                                  fetched instead of raising it, defaults to False.
+        :type return_exceptions: bool, optional
+        :return: The complete anime in the same order.
+        :rtype: list[Anime]
+        """
+        return self.get_animes(
+            [anime.anime_id for anime in animes], with_episodes, max_workers, return_exceptions
+        )
+
     def get_recommendations(self, anime_id: int):
         """Gets a list of recommendations for an anime.
 
@@ -267,6 +429,16 @@ class Sakurajima:
         data = {"controller": "Anime", "action": "getPopularAnime", "page": page}
         return [Anime(data_dict, self.network, self.API_URL) for data_dict in self.network.post(data, "/top")["entries"]]
 
+    def iter_popular_anime(self, cursor=None):
+        """Iterates over all the all time popular anime, page by page. The next page is fetched
+        in the background while the current one is consumed, see :class:`PageIterator`.
+
+        :param cursor: The :attr:`PageIterator.cursor` of an earlier iterator to resume from, defaults to None
+        :type cursor: tuple, optional
+        :rtype: PageIterator[Anime]
+        """
+        return PageIterator(self.get_popular_anime, cursor)
+
     def get_popular_seasonal_anime(self, page=1):
         """Gets popular anime of the current season.
 
@@ -278,6 +450,16 @@ class Sakurajima:
         data = {"controller": "Anime", "action": "getPopularSeasonals", "page": page}
         return [Anime(data_dict, self.network, self.API_URL) for data_dict in self.network.post(data, "/seasonal")["entries"]]
 
+    def iter_popular_seasonal_anime(self, cursor=None):
+        """Iterates over all the popular anime of the current season, page by page. The next page is fetched
+        in the background while the current one is consumed, see :class:`PageIterator`.
+
+        :param cursor: The :attr:`PageIterator.cursor` of an earlier iterator to resume from, defaults to None
+        :type cursor: tuple, optional
+        :rtype: PageIterator[Anime]
+        """
+        return PageIterator(self.get_popular_seasonal_anime, cursor)
+
     def get_popular_upcoming_anime(self, page=1):
         """Gets popular anime that have not started airing yet.
 
@@ -289,11 +471,31 @@ class Sakurajima:
         data = {"controller": "Anime", "action": "getPopularUpcomings", "page": page}
         return [Anime(data_dict, self.network, self.API_URL) for data_dict in self.network.post(data, "/home")["entries"]]
 
+    def iter_popular_upcoming_anime(self, cursor=None):
+        """Iterates over all the popular anime that have not started airing yet, page by page. The next page is fetched
+        in the background while the current one is consumed, see :class:`PageIterator`.
+
+        :param cursor: The :attr:`PageIterator.cursor` of an earlier iterator to resume from, defaults to None
+        :type cursor: tuple, optional
+        :rtype: PageIterator[Anime]
+        """
+        return PageIterator(self.get_popular_upcoming_anime, cursor)
+
     def get_hot_anime(self, page=1):
         # TODO inspect this to figure out a correct description.
         data = {"controller": "Anime", "action": "getHotAnime", "page": page}
         return [Anime(data_dict, self.network, self.API_URL) for data_dict in self.network.post(data, "/home")["entries"]]
 
+    def iter_hot_anime(self, cursor=None):
+        """Iterates over all the hot anime, page by page. The next page is fetched
+        in the background while the current one is consumed, see :class:`PageIterator`.
+
+        :param cursor: The :attr:`PageIterator.cursor` of an earlier iterator to resume from, defaults to None
+        :type cursor: tuple, optional
+        :rtype: PageIterator[Anime]
+        """
+        return PageIterator(self.get_hot_anime, cursor)
+
     def get_best_rated_anime(self, page=1):
         """Gets the highest rated animes on "aniwatch.me". 
 
@@ -305,6 +507,16 @@ class Sakurajima:
         data = {"controller": "Anime", "action": "getBestRatedAnime", "page": page}
         return [Anime(data_dict, self.network, self.API_URL) for data_dict in self.network.post(data, "/home")["entries"]]
 
+    def iter_best_rated_anime(self, cursor=None):
+        """Iterates over all the highest rated anime, page by page. The next page is fetched
+        in the background while the current one is consumed, see :class:`PageIterator`.
+
+        :param cursor: The :attr:`PageIterator.cursor` of an earlier iterator to resume from, defaults to None
+        :type cursor: tuple, optional
+        :rtype: PageIterator[Anime]
+        """
+        return PageIterator(self.get_best_rated_anime, cursor)
+
     def add_recommendation(self, anime_id: int, recommended_anime_id: int):
         """Submit a recommendation for an anime.
 
@@ -371,6 +583,18 @@ class Sakurajima:
             ChronicleEntry(data_dict, self.network, self.API_URL) for data_dict in self.network.post(data, f"/profile/{user_id}")["chronicle"]
         ]
 
+    def iter_user_chronicle(self, user_id, cursor=None):
+        """Iterates over all the entries of a user's chronicle, page by page. The next page is fetched
+        in the background while the current one is consumed, see :class:`PageIterator`.
+
+        :param user_id: The id of the target user
+        :type user_id: int, str
+        :param cursor: The :attr:`PageIterator.cursor` of an earlier iterator to resume from, defaults to None
+        :type cursor: tuple, optional
+        :rtype: PageIterator[ChronicleEntry]
+        """
+        return PageIterator(lambda page: self.get_user_chronicle(user_id, page), cursor)
+
     def get_user_anime_list(self):
         """Gets the user's aniwatch.me anime list. This list includes animes 
         that are marked by the user. 
@@ -386,7 +610,7 @@ class Sakurajima:
         }
         return [
             UserAnimeListEntry(data_dict, self.network)
-            for data_dict in self.network.post(data, f"/profile/{user_id}")["animelist"]
+            for data_dict in self.network.post(data, f"/profile/{self.userId}")["animelist"]
         ]
 
     def get_user_media(self, page=1):
@@ -404,7 +628,17 @@ class Sakurajima:
             "profile_id": str(self.userId),
             "page": page,
         }
-        return [UserMedia(data_dict, self.network, self.API_URL) for data_dict in self.network.post(data, f"/profile/{user_id}")["entries"]]
+        return [UserMedia(data_dict, self.network) for data_dict in self.network.post(data, f"/profile/{self.userId}")["entries"]]
+
+    def iter_user_media(self, cursor=None):
+        """Iterates over all the user's favorite media, page by page. The next page is fetched
+        in the background while the current one is consumed, see :class:`PageIterator`.
+
+        :param cursor: The :attr:`PageIterator.cursor` of an earlier iterator to resume from, defaults to None
+        :type cursor: tuple, optional
+        :rtype: PageIterator[UserMedia]
+        """
+        return PageIterator(self.get_user_media, cursor)
 
     def send_image_to_discord(self, episode_id, base64_image, episode_time):
         data = {
@@ -422,6 +656,16 @@ class Sakurajima:
         resp = self.network.post(data)
         return [Friend(self.network, x) for x in resp["friends"]]
 
+    def iter_friends(self, cursor=None):
+        """Iterates over all the user's friends, page by page. The next page is fetched
+        in the background while the current one is consumed, see :class:`PageIterator`.
+
+        :param cursor: The :attr:`PageIterator.cursor` of an earlier iterator to resume from, defaults to None
+        :type cursor: tuple, optional
+        :rtype: PageIterator[Friend]
+        """
+        return PageIterator(self.get_friends, cursor)
+
     def get_outgoing_requests(self, page=1):
         data = {"controller": "Profile", "action": "getFriends", "page": page}
         resp = self.network.post(data)
@@ -564,6 +808,18 @@ class Sakurajima:
             ChronicleEntry(data_dict, self.network, self.API_URL) for data_dict in self.network.post(data)["chronicle"]
         ]
 
+    def iter_anime_chronicle(self, anime_id: int, cursor=None):
+        """Iterates over all the entries of the user's anime specific chronicle, page by page. The next page is fetched
+        in the background while the current one is consumed, see :class:`PageIterator`.
+
+        :param anime_id: The ID of the anime whose chronicle you want.
+        :type anime_id: int
+        :param cursor: The :attr:`PageIterator.cursor` of an earlier iterator to resume from, defaults to None
+        :type cursor: tuple, optional
+        :rtype: PageIterator[ChronicleEntry]
+        """
+        return PageIterator(lambda page: self.get_anime_chronicle(anime_id, page), cursor)
+
     def remove_chronicle_entry(self, chronicle_id: int):
         """Removes a specific chronicle entry. 
 
@@ -794,6 +1050,16 @@ class Sakurajima:
             WatchListEntry(data_dict, self.network, self.API_URL) for data_dict in self.network.post(data)["entries"]
         ]
 
+    def iter_watchlist(self, cursor=None):
+        """Iterates over all the entries of the user's watchlist, page by page. The next page is fetched
+        in the background while the current one is consumed, see :class:`PageIterator`.
+
+        :param cursor: The :attr:`PageIterator.cursor` of an earlier iterator to resume from, defaults to None
+        :type cursor: tuple, optional
+        :rtype: PageIterator[WatchListEntry]
+        """
+        return PageIterator(self.get_watchlist, cursor)
+
     def login(self, username, password):
         data = {
             "username": username,
@@ -813,7 +1079,8 @@ class Sakurajima:
         return self.network.post(data)
 
     def search(self, query: str):
-        """Searches the aniwatch.me library for the given anime title.
+        """Searches the aniwatch.me library for the given anime title. If the client has a
+        :class:`CatalogIndex`, the search is made in it without making any requests.
 
         :param query: The title of the anime that you want to search. Aniwatch also 
                       stores synonyms, english names for animes so those can be used too.
@@ -821,6 +1088,8 @@ class Sakurajima:
         :return: A list of Anime objects.
         :rtype: [type]
         """
+        if self.catalog is not None:
+            return [Anime(data_dict, self.network, self.API_URL) for data_dict in self.catalog.search(query)]
         data = {
             "controller": "Search",
             "action": "search",
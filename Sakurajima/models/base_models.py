@@ -1,77 +1,70 @@
-import datetime
-import requests
 import json
-from m3u8 import M3U8
-from Crypto.Cipher import AES
 from Sakurajima.models.relation import Relation
 from Sakurajima.models.recommendation import RecommendationEntry
 from Sakurajima.models.chronicle import ChronicleEntry
 from Sakurajima.models.media import Media
 from Sakurajima.models.helper_models import Language, Stream
+from Sakurajima.models.fields import Field, RawModel, timestamp
 from Sakurajima.utils.episode_list import EpisodeList
-from Sakurajima.utils.downloader import Downloader, MultiThreadDownloader
 from Sakurajima.errors import AniwatchError
-import subprocess
-from time import sleep
-from pathvalidate import sanitize_filename
-from multiprocessing import Process
 import os
+import time
 from base64 import b64decode
-import shutil
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from Sakurajima.utils.playlist import Playlist
 
-class Anime(object):
+
+class Anime(RawModel):
     """Wraps all the relevant data for an anime like anime_id
     (called as detail_id by AniWatch backend), title, airing date etc.
     Use the get_episodes method to get a list of available episodes"""
 
+    __slots__ = ("__network", "__API_URL", "__episodes")
+
+    anime_id = Field("detail_id")
+    airing_start = Field("airing_start")
+    airing_end = Field("airing_end")
+    start_index = Field("start_index")
+    end_index = Field("end_index")
+    airing_start_unknown = Field("airing_start_unknown")
+    airing_end_unknown = Field("airing_end_unknown")
+    relation_id = Field("relation_id")
+    genre = Field("genre")
+    staff = Field("staff")
+    tags = Field("tags")
+    title = Field("title")
+    description = Field("description")
+    cover = Field("cover")
+    episode_max = Field("episode_max")
+    type = Field("type")
+    broadcast_start = Field("broadcast_start", decode=timestamp)
+    launch_day = Field("launch_day", decode=timestamp)
+    status = Field("status")
+    synonyms = Field("synonyms")
+    broadcast_time = Field("broadcast_time")
+    launch_offset = Field("launch_offset")
+    has_nudity = Field("hasNudity")
+    cur_episodes = Field("cur_episodes")
+    is_on_anime_list = Field("isOnAnimeList")
+    planned_to_watch = Field("planned_to_watch")
+    completed = Field("completed")
+    watching = Field("watching")
+    progress = Field("progress")
+    dropped = Field("dropped")
+    on_hold = Field("on_hold")
+    rating = Field("rating")
+    members_counter = Field("member_counters")
+    members_counter_rank = Field("members_counter_rank")
+    score = Field("score")
+    score_count = Field("score_count")
+    score_rank = Field("score_rank")
+
     def __init__(self, data_dict: dict, network, api_url: str):
+        super().__init__(data_dict)
         self.__network = network
         self.__API_URL = api_url
-        self.data_dict = data_dict
-        self.anime_id = data_dict.get("detail_id", None)
-        self.airing_start = data_dict.get("airing_start", None)
-        self.airing_end = data_dict.get("airing_end", None)
-        self.start_index = data_dict.get("start_index", None)
-        self.end_index = data_dict.get("end_index", None)
-        self.airing_start_unknown = data_dict.get("airing_start_unknown", None)
-        self.airing_end_unknown = data_dict.get("airing_end_unknown", None)
-        self.relation_id = data_dict.get("relation_id", None)
-        self.genre = data_dict.get("genre", None)
-        self.staff = data_dict.get("staff", None)
-        self.tags = data_dict.get("tags", None)
-        self.title = data_dict.get("title", None)
-        self.description = data_dict.get("description", None)
-        self.cover = data_dict.get("cover", None)
-        self.episode_max = data_dict.get("episode_max", None)
-        self.type = data_dict.get("type", None)
-        try:
-            self.broadcast_start = datetime.utcfromtimestamp(data_dict.get("broadcast_start"))
-        except:
-            self.broadcast_start = None
-        try:
-            self.launch_day = datetime.datetime.utcfromtimestamp(data_dict.get("launch_day"))
-        except:
-            self.launch_day = None
-        self.status = data_dict.get("status", None)
-        self.synonyms = data_dict.get("synonyms", None)
-        self.broadcast_time = data_dict.get("broadcast_time", None)
-        self.launch_offset = data_dict.get("launch_offset", None)
-        self.has_nudity = data_dict.get("hasNudity", None)
-        self.cur_episodes = data_dict.get("cur_episodes", None)
-        self.is_on_anime_list = data_dict.get("isOnAnimeList", None)
-        self.planned_to_watch = data_dict.get("planned_to_watch", None)
-        self.completed = data_dict.get("completed", None)
-        self.watching = data_dict.get("watching", None)
-        self.progress = data_dict.get("progress", None)
-        self.dropped = data_dict.get("dropped", None)
-        self.on_hold = data_dict.get("on_hold", None)
-        self.rating = data_dict.get("rating", None)
-        self.members_counter = data_dict.get("member_counters", None)
-        self.members_counter_rank = data_dict.get("members_counter_rank", None)
-        self.score = data_dict.get("score", None)
-        self.score_count = data_dict.get("score_count", None)
-        self.score_rank = data_dict.get("score_rank", None)
         self.__episodes = None
 
     def __generate_default_headers(self):
@@ -105,17 +98,60 @@ class Anime(object):
                 error = json["error"]
                 raise AniwatchError(error)
             else:
-                self.__episodes = EpisodeList(
-                    [
-                        Episode(data_dict, self.__network, self.__API_URL, self.anime_id, self.title,)
-                        for data_dict in json["episodes"]
-                    ]
+                self.__episodes = EpisodeList.from_rows(
+                    json["episodes"], self.__network, self.__API_URL, self.anime_id, self.title,
                 )
             return self.__episodes
 
     def __repr__(self):
         return f"<Anime: {self.title}>"
 
+    def download_episodes(
+        self,
+        quality: str,
+        episodes=None,
+        file_name: str = None,
+        path: str = None,
+        max_segments: int = 32,
+        max_handshakes: int = 4,
+        **download_options
+    ):
+        """Downloads several episodes of the anime at once through a :class:`DownloadScheduler`,
+        which shares a single pool of segment downloads between all of them. 
+
+        :param episodes: The episodes to download, either :class:`Episode` objects or episode numbers,
+                         defaults to None. If None, all available episodes are downloaded.
+        :type episodes: list, optional
+        :param quality: The quality that you want to download, see :meth:`Episode.download`.
+        :type quality: str
+        :param file_name: The file name template used for every episode, see :meth:`Episode.download`,
+                          defaults to None.
+        :type file_name: str, optional
+        :param path: The directory the episodes are downloaded to, defaults to None. If None, the
+                     current working directory is used.
+        :type path: str, optional
+        :param max_segments: The maximum number of segments that are downloaded at once across all
+                             the episodes, defaults to 32.
+        :type max_segments: int, optional
+        :param max_handshakes: The maximum number of episodes that fetch their M3U8 data at once,
+                               defaults to 4.
+        :type max_handshakes: int, optional
+        :param download_options: Passed on to :meth:`Episode.create_downloader`, for example
+                                 ``include_intro``, ``use_ffmpeg``, ``delete_chunks`` or ``direct_write``.
+        :return: A list of :class:`DownloadJob` objects, one per episode, with the state of each download.
+        :rtype: list[DownloadJob]
+        """
+        all_episodes = self.get_episodes()
+        if episodes is None:
+            episodes = all_episodes
+        from Sakurajima.utils.scheduler import DownloadScheduler
+        scheduler = DownloadScheduler(max_segments, max_handshakes, path=path)
+        for episode in episodes:
+            if not isinstance(episode, Episode):
+                episode = all_episodes.get_episode_by_number(episode)
+            scheduler.add(episode, quality, file_name, **download_options)
+        return scheduler.run()
+
     def get_relations(self):
         """Gets the relation of the anime.
 
@@ -365,44 +401,49 @@ class Anime(object):
         return self.data_dict
 
 
-class Episode(object):
+class Episode(RawModel):
+    __slots__ = ("anime_title", "anime_id", "__network", "__API_URL", "__aniwatch_episode", "__marked_as_watched")
+
+    number = Field("number")
+    """The episode number of the episode."""
+    title = Field("title")
+    """The title of the episode."""
+    description = Field("description")
+    """The description of the episode."""
+    thumbnail = Field("thumbnail")
+    """The URL to the thumbnail for the episode."""
+    added = Field("added", decode=timestamp)
+    """The date when the episode was added."""
+    filler = Field("filler")
+    """Is set to 1 if the episode is filler else 0"""
+    ep_id = Field("ep_id")
+    """The ID of the episode"""
+    duration = Field("duration")
+    """The duration of the episode"""
+    is_aired = Field("is_aired")
+    """Is set to 1 if the episode has aired else 0."""
+    lang = Field("lang")
+    """The language of the episode."""
+    watched = Field("watched")
+    """Is set to 1 if the user has marked the episode as watched else 0"""
+
     def __init__(self, data_dict, network, api_url, anime_id, anime_title=None):
+        super().__init__(data_dict)
         self.anime_title = anime_title
         """The title of the anime that the episode belongs to."""
         self.__network = network
         self.anime_id = anime_id
         """The anime ID of the anime that the episode belongs to."""
         self.__API_URL = api_url
-        self.number = data_dict.get("number", None)
-        """The episode number of the episode."""
-        self.title = data_dict.get("title", None)
-        """The title of the episode."""
-        self.description = data_dict.get("description", None)
-        """The description of the episode."""
-        self.thumbnail = data_dict.get("thumbnail", None)
-        """The URL to the thumbnail for the episode."""
-        self.added = datetime.datetime.utcfromtimestamp(data_dict.get("added", None))
-        """The date when the episode was added."""
-        self.filler = data_dict.get("filler", None)
-        """Is set to 1 if the episode is filler else 0"""
-        self.ep_id = data_dict.get("ep_id", None)
-        """The ID of the episode"""
-        self.duration = data_dict.get("duration", None)
-        """The duration of the episode"""
-        self.is_aired = data_dict.get("is_aired", None)
-        """Is set to 1 if the episode has aired else 0.""" 
-        self.lang = data_dict.get("lang", None)
-        """The language of the episode."""
-        self.watched = data_dict.get("watched", None)
-        """Is set to 1 if the user has marked the episode as watched else 0"""
         self.__aniwatch_episode = None
-        self.__m3u8 = None
+        self.__marked_as_watched = False
 
     def __generate_default_headers(self):
         headers = {
             "REFERER": f"https://aniwatch.me/anime/{self.anime_id}/{self.number}",
             "X-PATH": f"/anime/{self.anime_id}/{self.ep_id}"
             }
+        return headers
 
     def get_aniwatch_episode(self, lang="en-US"):
         """Gets the AniWatchEpisode object associated with the episode.
@@ -430,31 +471,83 @@ class Episode(object):
             self.__aniwatch_episode = AniWatchEpisode(json, self.ep_id)
             return self.__aniwatch_episode
 
-    def get_m3u8(self, quality: str) -> M3U8:
-        """Gets the episode's M3U8 data.
+    def get_m3u8(self, quality: str, refresh: bool = False, prefetch: bool = False) -> "Playlist":
+        """Gets the episode's M3U8 data. Playlists are cached per episode and quality, and shared
+        by every :class:`Episode` object of the episode, until shortly before their signed URLs expire.
 
         :param quality: The quality whose M3U8 data you need. All the available 
                         are "ld" (360p), "sd" (480p), "hd" (720p) and "fullhd" (1080p).
         :type quality: str
-        :return: A M3U8 object, the data can be accessed by calling the ``data`` property on the
+        :param refresh: Whether to fetch the playlist again even if it is cached, defaults to False.
+        :type refresh: bool, optional
+        :param prefetch: Whether to start fetching the key and the first segment in the background
+                         when the playlist is fetched, so that a download that follows can start right
+                         away, defaults to False.
+        :type prefetch: bool, optional
+        :return: A Playlist object, the data can be accessed by calling the ``data`` property on the
                  object.
-        :rtype: M3U8
+        :rtype: :class:`Playlist`
         """
-        if self.__m3u8:
-            return self.__m3u8
-        else:
-            try:
-                headers = self.__generate_default_headers()
+        from Sakurajima.utils.playlist import _shared_playlist_cache
+        if refresh:
+            _shared_playlist_cache.invalidate(self.ep_id, quality)
+        try:
+            return _shared_playlist_cache.get(self.ep_id, quality, lambda: self.__fetch_m3u8(quality, prefetch))
+        except:
+            return None
+
+    def __fetch_m3u8(self, quality, prefetch):
+        # The handshake runs as a dependency graph. Marking the episode as watched does not depend
+        # on anything, the sprites and the playlist only need the stream data, and the key and the
+        # first segment only need the playlist. Independent steps run at the same time.
+        from concurrent.futures import ThreadPoolExecutor
+        from Sakurajima.utils.playlist import Playlist, get_url_expiry, _shared_playlist_cache
+        headers = self.__generate_default_headers()
+        executor = ThreadPoolExecutor(max_workers=4)
+        try:
+            bookkeeping = []
+            if not self.__marked_as_watched:
+                bookkeeping.append(executor.submit(self.toggle_mark_as_watched))
+            aniwatch_episode = self.get_aniwatch_episode()
+            uri = aniwatch_episode.stream.sources[quality] # The uri to the M3U8 file.
+            expiry = get_url_expiry(uri)
+            if expiry is not None and expiry <= time.time() + _shared_playlist_cache.margin:
+                # The stream URIs are signed, get new ones if the cached ones have expired.
+                self.__aniwatch_episode = None
                 aniwatch_episode = self.get_aniwatch_episode()
-                self.toggle_mark_as_watched()
-                self.spoof_download_sprites()
-                uri = aniwatch_episode.stream.sources[quality] # The uri to the M3U8 file.
-                res = self.__network.get_with_user_session(uri, headers)
-                self.__m3u8 = M3U8(res.text)
-                return self.__m3u8
-            except:
-                return Nonec
-    
+                uri = aniwatch_episode.stream.sources[quality]
+            if not self.__marked_as_watched:
+                bookkeeping.append(executor.submit(self.spoof_download_sprites))
+            res = self.__network.get_with_user_session(uri, headers)
+            playlist = Playlist.loads(res.text)
+            if prefetch:
+                self.__prefetch(executor, playlist)
+            # The key and the first segment keep loading in the background once the bookkeeping is done.
+            for future in bookkeeping:
+                future.result()
+            self.__marked_as_watched = True
+        finally:
+            executor.shutdown(wait=False)
+        return playlist, uri
+
+    def __prefetch(self, executor, playlist):
+        from Sakurajima.utils.decrypter_provider import DecrypterProvider
+        index = playlist.get_first_segment()
+        if index is None:
+            return
+        if playlist.get_key(index) is not None:
+            # Warms the shared key cache up, a failure here is retried by the download.
+            executor.submit(DecrypterProvider(self.__network, playlist).get_segment_key, index)
+        segment_uri = playlist.uris[index]
+        headers = self.__generate_default_headers()
+
+        def fetch_segment():
+            res = self.__network.get(segment_uri, headers=headers)
+            res.raise_for_status()
+            return res.content
+
+        playlist.add_prefetched(segment_uri, executor.submit(fetch_segment))
+
     def spoof_download_sprites(self):
         sprites_url = self.get_aniwatch_episode().stream.sprites
         headers = self.__generate_default_headers()
@@ -475,6 +568,12 @@ class Episode(object):
         delete_chunks: bool = True,
         on_progress=None,
         print_progress: bool = True,
+        direct_write: bool = False,
+        concurrency_controller=None,
+        decryption_pool=None,
+        ffmpeg_pipe: bool = False,
+        asynchronous: bool = False,
+        max_concurrency: int = 64,
     ):
         """Downloads the current episode in your selected quality.
 
@@ -524,9 +623,73 @@ class Episode(object):
         :param print_progress: Print the number of chunks done and the total number of chunks to the console, 
                       defaults to True.
         :type print_progress: bool, optional
+        :param direct_write: Set this to true to write the downloaded chunks straight into the final file
+                      instead of the ``chunks`` directory, defaults to False. This skips the merging step
+                      and halves the disk space needed during the download. The chunks are concatenated
+                      without ``ffmpeg`` in this mode.
+        :type direct_write: bool, optional
+        :param concurrency_controller: An :class:`AdaptiveConcurrencyController` used to adjust the number of
+                      chunks downloaded at once when using multi threaded downloading, defaults to None. When
+                      set, ``max_threads`` is ignored, failed chunks are retried and the controller can be inspected
+                      while the download runs to monitor its current window and history.
+        :type concurrency_controller: :class:`AdaptiveConcurrencyController`, optional
+        :param decryption_pool: A :class:`DecryptionPool` used to decrypt the chunks in worker processes,
+                      defaults to None. This helps when the CPU rather than the connection is the bottleneck,
+                      for example when several episodes are downloaded at once over a fast connection.
+        :type decryption_pool: :class:`DecryptionPool`, optional
+        :param ffmpeg_pipe: Set this to true to start ``ffmpeg`` when the download starts and pipe the chunks
+                      into it in order as they are downloaded, defaults to False. The remux then overlaps the
+                      download and the video is ready right after the last chunk. Implies ``direct_write``.
+                      Requires FFMPEG. An interrupted download can not be resumed in this mode and starts over.
+        :type ffmpeg_pipe: bool, optional
+        :param asynchronous: Set this to true to download the chunks from a single ``asyncio`` event loop
+                      instead of a thread pool, defaults to False. This keeps a large number of chunk 
+                      requests in flight without starting an OS thread for each of them. Requires ``aiohttp``.
+                      Takes precedence over ``multi_threading``.
+        :type asynchronous: bool, optional
+        :param max_concurrency: The maximum number of chunk requests that are in flight at once when using
+                      asynchronous downloading, defaults to 64.
+        :type max_concurrency: int, optional
+        """
+        m3u8 = self.get_m3u8(quality, prefetch=True)
+        current_path = os.getcwd()
+        if path:
+            os.chdir(path)
+        
+        try:
+            dlr = self.create_downloader(
+                m3u8,
+                file_name,
+                multi_threading=multi_threading,
+                max_threads=max_threads,
+                use_ffmpeg=use_ffmpeg,
+                include_intro=include_intro,
+                delete_chunks=delete_chunks,
+                on_progress=on_progress,
+                print_progress=print_progress,
+                direct_write=direct_write,
+                concurrency_controller=concurrency_controller,
+                decryption_pool=decryption_pool,
+                ffmpeg_pipe=ffmpeg_pipe,
+                asynchronous=asynchronous,
+                max_concurrency=max_concurrency,
+            )
+            dlr.download()
+            dlr.merge()
+            if delete_chunks:
+                dlr.remove_chunks()
+        finally:
+            os.chdir(current_path)
+
+    def format_file_name(self, file_name: str = None):
+        """Expands the macros in a file name template and sanitizes the result, see :meth:`download`
+        for the supported macros.
+
+        :param file_name: The file name template, defaults to None. If left None, the file name will
+                          be "[anime_name]-[episode_number]".
+        :type file_name: str, optional
+        :rtype: str
         """
-        m3u8 = self.get_m3u8(quality)
-
         if file_name is None:
             file_name = f"{self.anime_title[:128]}-{self.number}"
         else:
@@ -535,23 +698,173 @@ class Episode(object):
                 .replace("<eptitle>", self.title)
                 .replace("<anititle>", self.anime_title[:128])
             )
-        file_name = sanitize_filename(file_name)
-        current_path = os.getcwd()
-        if path:
-            os.chdir(path)
-        
-        if multi_threading:
-            dlr = MultiThreadDownloader(
-                self.__network, m3u8, file_name, self.ep_id, max_threads, use_ffmpeg, include_intro, delete_chunks, self.__generate_default_headers()
+        from pathvalidate import sanitize_filename
+        return sanitize_filename(file_name)
+
+    def create_downloader(
+        self,
+        m3u8,
+        file_name: str = None,
+        multi_threading: bool = False,
+        max_threads: int = None,
+        use_ffmpeg: bool = True,
+        include_intro: bool = False,
+        delete_chunks: bool = True,
+        on_progress=None,
+        print_progress: bool = True,
+        direct_write: bool = False,
+        concurrency_controller=None,
+        max_retries: int = None,
+        decryption_pool=None,
+        ffmpeg_pipe: bool = False,
+        asynchronous: bool = False,
+        max_concurrency: int = 64,
+    ):
+        """Creates the downloader that :meth:`download` uses, without starting it. The
+        parameters have the same meaning as in :meth:`download`.
+
+        :param m3u8: The M3U8 data of the episode, as returned by :meth:`get_m3u8`.
+        :type m3u8: :class:`Playlist`
+        :param max_retries: The number of times a failed chunk is retried by the multi threaded downloader,
+                            defaults to None. If None, chunks are retried 5 times when a ``concurrency_controller``
+                            is set and not at all otherwise.
+        :type max_retries: int, optional
+        :rtype: :class:`Downloader`, :class:`MultiThreadDownloader` or :class:`AsyncDownloader`
+        """
+        # The download stack is only imported once something is actually downloaded.
+        from Sakurajima.utils.downloader import Downloader, MultiThreadDownloader, AsyncDownloader
+        file_name = self.format_file_name(file_name)
+        if asynchronous:
+            return AsyncDownloader(
+                self.__network, m3u8, file_name, self.ep_id, max_concurrency, use_ffmpeg, include_intro, delete_chunks,
+                headers=self.__generate_default_headers(), direct_write=direct_write,
+                decryption_pool=decryption_pool, ffmpeg_pipe=ffmpeg_pipe, on_progress=on_progress,
+                print_progress=print_progress
+            )
+        elif multi_threading:
+            if max_retries is None:
+                max_retries = 5 if concurrency_controller else 0
+            return MultiThreadDownloader(
+                self.__network, m3u8, file_name, self.ep_id, max_threads, use_ffmpeg, include_intro, delete_chunks,
+                headers=self.__generate_default_headers(), direct_write=direct_write,
+                concurrency_controller=concurrency_controller, max_retries=max_retries,
+                print_progress=print_progress, decryption_pool=decryption_pool, ffmpeg_pipe=ffmpeg_pipe
             )
         else:
-            dlr = Downloader(self.__network, m3u8, file_name, self.ep_id, use_ffmpeg, include_intro, delete_chunks, self.__generate_default_headers())
-        
-        dlr.download()
-        dlr.merge()
-        if delete_chunks:
-            dlr.remove_chunks()
-        os.chdir(current_path)
+            return Downloader(
+                self.__network, m3u8, file_name, self.ep_id, use_ffmpeg, include_intro, delete_chunks,
+                on_progress=on_progress, headers=self.__generate_default_headers(), direct_write=direct_write,
+                decryption_pool=decryption_pool, ffmpeg_pipe=ffmpeg_pipe
+            )
+
+    def stream(
+        self,
+        quality: str,
+        max_threads: int = 8,
+        read_ahead: int = 16,
+        include_intro: bool = False,
+        decryption_pool=None,
+    ):
+        """Streams the episode, yielding the decrypted TS chunks in playback order while the chunks
+        after them are downloaded. Nothing is written to disk, so the first chunk can be used right
+        away, for example by piping it into ``ffmpeg`` or a player.
+
+        .. code-block:: python
+
+            with open("episode.ts", "wb") as file:
+                for chunk in episode.stream("hd"):
+                    file.write(chunk)
+
+        :param quality: The quality that you want to stream. All the available 
+                        are "ld" (360p), "sd" (480p), "hd" (720p) and "fullhd".
+        :type quality: str
+        :param max_threads: The maximum number of chunks that are downloaded at once, defaults to 8.
+        :type max_threads: int, optional
+        :param read_ahead: The maximum number of chunks that are downloaded ahead of the one that is
+                           yielded next, which bounds the memory used, defaults to 16.
+        :type read_ahead: int, optional
+        :param include_intro: Whether to include the aniwatch intro, defaults to False.
+        :type include_intro: bool, optional
+        :param decryption_pool: A :class:`DecryptionPool` used to decrypt the chunks in worker processes,
+                                defaults to None.
+        :type decryption_pool: :class:`DecryptionPool`, optional
+        :raises ValueError: If the stream of the given quality can not be fetched.
+        :return: A generator of the decrypted chunks.
+        :rtype: ``generator`` of bytes
+        """
+        return iter(self.__create_stream_downloader(quality, max_threads, read_ahead, include_intro, decryption_pool))
+
+    def stream_to(self, quality: str, file=None, **kwargs) -> int:
+        """Streams the episode into a file-like object, see :meth:`stream`.
+
+        .. code-block:: python
+
+            ffmpeg = subprocess.Popen(["ffmpeg", "-i", "pipe:0", "episode.mkv"], stdin=subprocess.PIPE)
+            episode.stream_to("hd", ffmpeg.stdin)
+            ffmpeg.stdin.close()
+            ffmpeg.wait()
+
+        :param quality: The quality that you want to stream.
+        :type quality: str
+        :param file: The binary file-like object to write to, defaults to None. If None, the
+                     episode is written to the standard output.
+        :param kwargs: The other arguments of :meth:`stream`.
+        :return: The number of bytes written.
+        :rtype: int
+        """
+        return self.__create_stream_downloader(quality, **kwargs).write_to(file)
+
+    def __create_stream_downloader(
+        self, quality, max_threads=8, read_ahead=16, include_intro=False, decryption_pool=None
+    ):
+        from Sakurajima.utils.downloader import StreamDownloader
+        m3u8 = self.get_m3u8(quality, prefetch=True)
+        if m3u8 is None:
+            raise ValueError(f"Could not get the {quality} stream of {self}")
+        return StreamDownloader(
+            self.__network, m3u8, self.__generate_default_headers(), max_threads, read_ahead, include_intro,
+            decryption_pool=decryption_pool
+        )
+
+    def serve(
+        self, quality: str, server=None, include_intro: bool = False, decryption_pool=None, replace: bool = False
+    ) -> str:
+        """Serves the episode to players on the same machine through a local :class:`HLSServer`,
+        so that it can be watched while it is being downloaded. Segments are fetched, decrypted and
+        cached when a player asks for them, and the ones after them are prefetched.
+
+        .. code-block:: python
+
+            url = episode.serve("hd")
+            subprocess.run(["mpv", url])
+
+        :param quality: The quality that you want to serve.
+        :type quality: str
+        :param server: The server to serve the episode with, defaults to None. If None, a server
+                       shared by the whole process is started the first time it is needed.
+        :type server: :class:`HLSServer`, optional
+        :param include_intro: Whether to include the aniwatch intro, defaults to False.
+        :type include_intro: bool, optional
+        :param decryption_pool: A :class:`DecryptionPool` used to decrypt the segments in worker processes,
+                                defaults to None.
+        :type decryption_pool: :class:`DecryptionPool`, optional
+        :param replace: Whether to restart the stream if the episode is already being served in this
+                        quality, defaults to False. By default the players share the running stream.
+        :type replace: bool, optional
+        :raises ValueError: If the stream of the given quality can not be fetched.
+        :return: The URL of the playlist that players can open.
+        :rtype: str
+        """
+        from Sakurajima.utils.hls_server import get_shared_server
+        m3u8 = self.get_m3u8(quality, prefetch=True)
+        if m3u8 is None:
+            raise ValueError(f"Could not get the {quality} stream of {self}")
+        if server is None:
+            server = get_shared_server()
+        return server.add_stream(
+            f"{self.ep_id}-{quality}", self.__network, m3u8, self.__generate_default_headers(), include_intro,
+            decryption_pool, replace
+        )
 
     def get_available_qualities(self):
         """Gets a list of available qualities for the episode.
@@ -1,30 +1,31 @@
 import requests
 import json
-import datetime
+from Sakurajima.models.fields import Field, RawModel, timestamp
 
 
-class ChronicleEntry(object):
+class ChronicleEntry(RawModel):
     """A chronicle tracks a user's watch history. A chronicle maybe specific to a single
     series or it maybe a more general user chronicle. A ChronicleEntry object represents
     a single in entry in a chronicle."""
+    __slots__ = ("__network", "__API_URL")
+
+    episode = Field("episode")
+    """The episode number of the watched episode."""
+    anime_id = Field("id")
+    """The ID of the anime that the chronicle entry relates to."""
+    anime_title = Field("anime_title")
+    """The title of the anime that the chronicle entry relates to."""
+    ep_title = Field("ep_title")
+    """The title of the episode that the chronicle entry relates to."""
+    chronicle_id = Field("chronicle_id")
+    """The ID of the chronicle entry."""
+    date = Field("date", decode=timestamp)
+    """The date the chronicle entry was created."""
+
     def __init__(self, data_dict, network, api_url):
+        super().__init__(data_dict)
         self.__network = network
         self.__API_URL = api_url
-        self.episode = data_dict.get("episode", None)
-        """The episode number of the watched episode."""
-        self.anime_id = data_dict.get("id", None)
-        """The ID of the anime that the chronicle entry relates to."""
-        self.anime_title = data_dict.get("anime_title", None)
-        """The title of the anime that the chronicle entry relates to."""
-        self.ep_title = data_dict.get("ep_title", None)
-        """The title of the episode that the chronicle entry relates to."""
-        self.chronicle_id = data_dict.get("chronicle_id", None)
-        """The ID of the chronicle entry."""
-        try:
-            self.date = datetime.datetime.utcfromtimestamp(data_dict["date"])
-            """The date the chronicle entry was created."""
-        except Exception:
-            self.date = None
 
     def __repr__(self):
         return f"<ChronicleEntry: {self.chronicle_id}>"
@@ -0,0 +1,65 @@
+import datetime
+
+
+def timestamp(value):
+    """Decodes a UNIX timestamp into a UTC :class:`datetime.datetime`, or None if it is not one."""
+    try:
+        return datetime.datetime.utcfromtimestamp(value)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+
+class Field(object):
+    """An attribute of a :class:`RawModel` that is read from the model's ``data_dict`` when it is
+    accessed, instead of being copied out of it when the model is created. Fields that need to be
+    decoded, like timestamps, are only decoded the first time they are accessed.
+    """
+    __slots__ = ("key", "default", "decode", "name")
+
+    def __init__(self, key: str, default=None, decode=None):
+        """
+        :param key: The key of the value in the data of the model.
+        :type key: str
+        :param default: The value of the field if the key is missing, defaults to None.
+        :param decode: A function that turns the raw value into the value of the field, defaults to None.
+        :type decode: ``function``, optional
+        """
+        self.key = key
+        self.default = default
+        self.decode = decode
+        self.name = key
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        decoded = instance._decoded
+        if decoded is not None and self.name in decoded:
+            return decoded[self.name]
+        value = instance.data_dict.get(self.key, self.default)
+        if self.decode is not None:
+            value = self.decode(value)
+            if decoded is None:
+                decoded = instance._decoded = {}
+            decoded[self.name] = value
+        return value
+
+    def __set__(self, instance, value):
+        # The data of the model is left untouched as it may be shared with other objects.
+        if instance._decoded is None:
+            instance._decoded = {}
+        instance._decoded[self.name] = value
+
+
+class RawModel(object):
+    """The base of the models that keep the JSON data they were created from and decode their
+    attributes from it lazily with :class:`Field`. Models are slotted to keep them small.
+    """
+    __slots__ = ("data_dict", "_decoded")
+
+    def __init__(self, data_dict: dict):
+        self.data_dict = data_dict
+        """The data the model was created from."""
+        self._decoded = None
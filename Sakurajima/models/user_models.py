@@ -2,40 +2,44 @@ import requests
 import json
 from Sakurajima.models import base_models as bm
 from Sakurajima.models.chronicle import ChronicleEntry
+from Sakurajima.models.fields import Field, RawModel
 import datetime
 
 
-class UserAnimeListEntry(object):
+class UserAnimeListEntry(RawModel):
     """A UserAnimeListEntry represents a single show on a user's aniwatch.me 
     anime list.
     """
+    __slots__ = ("__network",)
+
+    title = Field("title")
+    """The title of the anime."""
+    episodes_max = Field("episodes_max")
+    """The total number of episodes the anime has."""
+    type = Field("type")
+    """The type of the show. For example, the type can anime, special or movie etc."""
+    cover = Field("cover")
+    """The URL to the cover image of the anime."""
+    anime_id = Field("details_id")
+    """The ID of the anime."""
+    progress = Field("progress")
+    """The total number of episodes that the user has watched for this anime."""
+    airing_start = Field("airing_start")
+    """The season the anime started airing."""
+    cur_episodes = Field("cur_episodes")
+    """The total number of episodes that have already aired."""
+
     def __init__(self, data_dict, network):
+        super().__init__(data_dict)
         self.__network = network
-        self.title = data_dict.get("title", None)
-        """The title of the anime."""
-        self.episodes_max = data_dict.get("episodes_max", None)
-        """The total number of episodes the anime has."""
-        self.type = data_dict.get("type", None)
-        """The type of the show. For example, the type can anime, special or movie etc."""
-        self.cover = data_dict.get("cover", None)
-        """The URL to the cover image of the anime."""
-        self.anime_id = data_dict.get("details_id", None)
-        """The ID of the anime."""
-        self.progress = data_dict.get("progress", None)
-        """The total number of episodes that the user has watched for this anime."""
-        self.airing_start = data_dict.get("airing_start", None)
-        """The season the anime started airing."""
-        self.cur_episodes = data_dict.get("cur_episodes", None)
-        """The total number of episodes that have already aired."""
-        if data_dict.get("completed", None) == 1:
-            self.status = "completed"
-            """The watch status of the anime."""
-        elif data_dict.get("planned_to_watch", None) == 1:
-            self.status = "planned_to_watch"
-        elif data_dict.get("on_hold", None) == 1:
-            self.status = "on_hold"
-        elif data_dict.get("dropped", None) == 1:
-            self.status = "dropped"
+
+    @property
+    def status(self):
+        """The watch status of the anime."""
+        for status in ("completed", "planned_to_watch", "on_hold", "dropped"):
+            if self.data_dict.get(status, None) == 1:
+                return status
+        return None
 
     def get_anime(self):
         """Gets the Anime object of the entry.
@@ -47,7 +51,7 @@ class UserAnimeListEntry(object):
             "action": "getAnime",
             "detail_id": str(self.anime_id),
         }
-        return bm.Anime(self.__post(data)["anime"], network=self.__network, api_url=self.__API_URL,)
+        return bm.Anime(self.__network.post(data)["anime"], network=self.__network, api_url=self.__network.API_URL,)
 
     def __repr__(self):
         return f"<AnimeListEntry: {self.title}>"
@@ -1,24 +1,37 @@
 from Sakurajima.models import base_models as bm
+from Sakurajima.models.fields import Field, RawModel
 
 
-class WatchListEntry(object):
+class WatchListEntry(RawModel):
+    __slots__ = ("__network", "__API_URL")
+
+    title = Field("title")
+    type = Field("type")
+    anime_id = Field("detail_id")
+    selPage = Field("selPage")
+    pages = Field("pages")
+    status = Field("status")
+    progress = Field("progress")
+    list_status = Field("list_status")
+    max_episodes = Field("max_episodes")
+    cover = Field("cover")
+    available_episodes = Field("available_episodes")
+
     def __init__(self, data_dict, network, api_url):
+        super().__init__(data_dict)
         self.__network = network
         self.__API_URL = api_url
-        self.title = data_dict.get("title", None)
-        self.type = data_dict.get("type", None)
-        self.anime_id = data_dict.get("detail_id", None)
-        self.selPage = data_dict.get("selPage", None)
-        self.pages = data_dict.get("pages", None)
-        self.status = data_dict.get("status", None)
-        self.progress = data_dict.get("progress", None)
-        self.list_status = data_dict.get("list_status", None)
-        self.max_episodes = data_dict.get("max_episodes", None)
-        self.cover = data_dict.get("cover", None)
-        self.available_episodes = data_dict.get("available_episodes", None)
-        self.episodes = [
-            bm.Episode(data, self.__network, self.__API_URL, self.anime_id) for data in data_dict.get("episodes", [])
-        ]
+
+    @property
+    def episodes(self):
+        """The episodes in the entry, created the first time they are accessed."""
+        if self._decoded is None:
+            self._decoded = {}
+        if "episodes" not in self._decoded:
+            self._decoded["episodes"] = [
+                bm.Episode(data, self.__network, self.__API_URL, self.anime_id) for data in self.data_dict.get("episodes", [])
+            ]
+        return self._decoded["episodes"]
 
     def __repr__(self):
         return f"<WatchListEntry: {self.title}>"
@@ -0,0 +1,250 @@
+import re
+import json
+import time
+import sqlite3
+from threading import Lock
+
+
+def _text(value) -> str:
+    # Flattens the fields of the anime data, some of which are lists of dicts, into searchable text.
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return " ".join(_text(item) for item in value.values() if isinstance(item, (str, list, dict)))
+    if isinstance(value, (list, tuple)):
+        return " ".join(_text(item) for item in value)
+    return str(value)
+
+
+def _trigrams(word: str) -> set:
+    # The word is padded so that short words and their beginnings and ends weigh in too.
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _similarity(word: str, words: list) -> float:
+    # The share of trigrams that the word has in common with the most similar of the words.
+    trigrams = _trigrams(word)
+    best = 0.0
+    for other in words:
+        other_trigrams = _trigrams(other)
+        best = max(best, len(trigrams & other_trigrams) / len(trigrams | other_trigrams))
+    return best
+
+
+class CatalogIndex(object):
+    """A local full-text index of the aniwatch.me catalog, kept in an SQLite database, that answers
+    title lookups without making any requests. The title, synonyms, tags, genres and staff of
+    every anime are indexed with FTS5. Searches match the beginning of words and are ranked with
+    matches in the title first, then the synonyms, then everything else. If nothing matches, anime
+    whose title or synonyms look like the query are returned instead, which makes the search
+    tolerant to typos.
+
+    Fill the index with :meth:`add`, for example with ``client.hydrate(...)`` of the anime from the
+    charts, or with :meth:`refresh`, which also keeps it up to date.
+    """
+    COLUMN_WEIGHTS = (10.0, 5.0, 1.0, 1.0, 1.0)
+    """The bm25 weights of the title, synonyms, tags, genre and staff columns."""
+    FUZZY_THRESHOLD = 0.3
+    """How similar to the query the title or synonyms of an anime have to be for a fuzzy match,
+    as the average share of trigrams in common between each word of the query and its most
+    similar word."""
+
+    def __init__(self, path: str = "sakurajima_catalog.sqlite3"):
+        """
+        :param path: The path of the SQLite database, defaults to "sakurajima_catalog.sqlite3".
+                     Use ":memory:" for an index that is not persisted.
+        :type path: str, optional
+        """
+        self.path = path
+        self.__lock = Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS anime (anime_id INTEGER PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS anime_updated ON anime (updated);
+            CREATE VIRTUAL TABLE IF NOT EXISTS anime_text USING fts5(
+                title, synonyms, tags, genre, staff, tokenize = 'unicode61 remove_diacritics 2'
+            );
+            """
+        )
+        try:
+            self.__connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS anime_trigrams USING fts5(title, synonyms, tokenize = 'trigram')"
+            )
+            self.fuzzy = True
+        except sqlite3.OperationalError:
+            # The trigram tokenizer needs SQLite 3.34 or newer.
+            self.fuzzy = False
+
+    def __len__(self):
+        with self.__lock:
+            return self.__connection.execute("SELECT COUNT(*) FROM anime").fetchone()[0]
+
+    def add(self, animes) -> int:
+        """Adds anime to the index, replacing the ones that are already in it.
+
+        :param animes: The anime to add, partial Anime objects only get their known fields indexed.
+        :type animes: list[Anime]
+        :return: The number of anime added.
+        :rtype: int
+        """
+        rows = []
+        for anime in animes:
+            data = anime.data_dict
+            if data.get("detail_id") is None:
+                continue
+            rows.append((int(data["detail_id"]), data))
+        now = time.time()
+        with self.__lock:
+            connection = self.__connection
+            connection.execute("BEGIN")
+            try:
+                for anime_id, data in rows:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO anime (anime_id, data, updated) VALUES (?, ?, ?)",
+                        (anime_id, json.dumps(data), now),
+                    )
+                    connection.execute("DELETE FROM anime_text WHERE rowid = ?", (anime_id,))
+                    connection.execute(
+                        "INSERT INTO anime_text (rowid, title, synonyms, tags, genre, staff) VALUES (?, ?, ?, ?, ?, ?)",
+                        (
+                            anime_id,
+                            _text(data.get("title")),
+                            _text(data.get("synonyms")),
+                            _text(data.get("tags")),
+                            _text(data.get("genre")),
+                            _text(data.get("staff")),
+                        ),
+                    )
+                    if self.fuzzy:
+                        connection.execute("DELETE FROM anime_trigrams WHERE rowid = ?", (anime_id,))
+                        connection.execute(
+                            "INSERT INTO anime_trigrams (rowid, title, synonyms) VALUES (?, ?, ?)",
+                            (anime_id, _text(data.get("title")), _text(data.get("synonyms"))),
+                        )
+                connection.execute("COMMIT")
+            except Exception as e:
+                connection.execute("ROLLBACK")
+                raise e
+        return len(rows)
+
+    def remove(self, anime_ids):
+        """Removes anime from the index.
+
+        :param anime_ids: The IDs of the anime to remove.
+        :type anime_ids: list[int]
+        """
+        with self.__lock:
+            for anime_id in anime_ids:
+                self.__connection.execute("DELETE FROM anime WHERE anime_id = ?", (int(anime_id),))
+                self.__connection.execute("DELETE FROM anime_text WHERE rowid = ?", (int(anime_id),))
+                if self.fuzzy:
+                    self.__connection.execute("DELETE FROM anime_trigrams WHERE rowid = ?", (int(anime_id),))
+
+    def get(self, anime_id: int) -> dict:
+        """Gets the data of an indexed anime.
+
+        :param anime_id: The ID of the anime.
+        :type anime_id: int
+        :return: The data of the anime, or None if it is not in the index.
+        :rtype: dict
+        """
+        with self.__lock:
+            row = self.__connection.execute("SELECT data FROM anime WHERE anime_id = ?", (int(anime_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def stale(self, max_age: float) -> list:
+        """Gets the IDs of the anime that were last added to the index more than ``max_age`` seconds ago.
+
+        :param max_age: The age in seconds.
+        :type max_age: float
+        :rtype: list[int]
+        """
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT anime_id FROM anime WHERE updated < ? ORDER BY updated", (time.time() - max_age,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def refresh(self, client, anime_ids=None, max_age: float = 7 * 24 * 60 * 60, max_workers: int = 16) -> int:
+        """Fetches anime with :meth:`Sakurajima.get_animes` and adds them to the index. Anime that
+        can not be fetched are skipped.
+
+        :param client: The client the anime are fetched with.
+        :type client: :class:`Sakurajima`
+        :param anime_ids: The IDs of the anime to fetch, defaults to None. If None, the anime that
+                          are older than ``max_age`` are fetched again.
+        :type anime_ids: list[int], optional
+        :param max_age: The age in seconds after which an anime is refreshed, defaults to a week.
+        :type max_age: float, optional
+        :param max_workers: The maximum number of requests made at once, defaults to 16.
+        :type max_workers: int, optional
+        :return: The number of anime added.
+        :rtype: int
+        """
+        if anime_ids is None:
+            anime_ids = self.stale(max_age)
+        animes = client.get_animes(anime_ids, max_workers=max_workers, return_exceptions=True)
+        return self.add([anime for anime in animes if not isinstance(anime, Exception)])
+
+    def search(self, query: str, limit: int = 20, fuzzy: bool = True) -> list:
+        """Searches the index.
+
+        :param query: The words to search for, every word has to match the beginning of a word
+                      in the title, synonyms, tags, genres or staff of an anime.
+        :type query: str
+        :param limit: The maximum number of results, defaults to 20.
+        :type limit: int, optional
+        :param fuzzy: Whether to look for anime whose title or synonyms look like the query if
+                      nothing matches it exactly, defaults to True.
+        :type fuzzy: bool, optional
+        :return: The data of the matching anime, best match first.
+        :rtype: list[dict]
+        """
+        words = [word.replace('"', "") for word in re.findall(r"\w+", query.lower())]
+        if not words:
+            return []
+        weights = ", ".join(str(weight) for weight in self.COLUMN_WEIGHTS)
+        with self.__lock:
+            ids = [
+                row[0]
+                for row in self.__connection.execute(
+                    f"SELECT rowid FROM anime_text WHERE anime_text MATCH ? ORDER BY bm25(anime_text, {weights}) LIMIT ?",
+                    (" ".join(f'"{word}"*' for word in words), limit),
+                )
+            ]
+            trigrams = {word[i:i + 3] for word in words for i in range(len(word) - 2)}
+            if fuzzy and self.fuzzy and not ids and trigrams:
+                # Every word of the query is compared with the most similar word of the title or
+                # synonyms, anime that are similar enough are ranked by how similar they are.
+                scores = []
+                for row in self.__connection.execute(
+                    "SELECT rowid, title, synonyms FROM anime_trigrams WHERE anime_trigrams MATCH ? "
+                    "ORDER BY bm25(anime_trigrams) LIMIT ?",
+                    (" OR ".join(f'"{trigram}"' for trigram in sorted(trigrams)), limit * 5),
+                ):
+                    text_words = re.findall(r"\w+", f"{row[1]} {row[2]}".lower())
+                    score = sum(_similarity(word, text_words) for word in words) / len(words)
+                    if score >= self.FUZZY_THRESHOLD:
+                        scores.append((score, row[0]))
+                scores.sort(key=lambda score: -score[0])
+                ids = [anime_id for _, anime_id in scores[:limit]]
+            data = {
+                row[0]: json.loads(row[1])
+                for row in self.__connection.execute(
+                    f"SELECT anime_id, data FROM anime WHERE anime_id IN ({', '.join('?' * len(ids))})", ids
+                )
+            }
+        return [data[anime_id] for anime_id in ids if anime_id in data]
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+    def __repr__(self):
+        return f"<CatalogIndex {self.path}>"
@@ -0,0 +1,185 @@
+import time
+from collections import deque
+from threading import Condition
+
+
+class AdaptiveConcurrencyController(object):
+    """Adjusts the number of chunk requests that are allowed to be in flight at once based on
+    how the requests are doing, using additive increase / multiplicative decrease (AIMD).
+
+    Every successful request grows the window by roughly ``increase`` per window's worth of
+    requests, as long as the latency of the request stays within ``latency_tolerance`` times the
+    lowest latency seen so far. A failed or rate limited request shrinks the window by
+    ``decrease_factor``, at most once per average request latency so that a burst of failures
+    from requests that were already in flight only counts once.
+
+    The throughput of all the requests together is measured over rounds of a window's worth of
+    requests. When a round gets through less than ``1 - throughput_tolerance`` of the best
+    throughput seen at a smaller window, the extra requests only queue up behind each other and
+    the window goes back to the size that reached that throughput. The best throughput is slowly
+    forgotten, so that the window can grow again when the connection gets faster.
+    """
+    THROUGHPUT_HALF_LIFE = 30.0
+    """The number of seconds after which the best throughput seen counts for half as much."""
+
+    def __init__(
+        self,
+        initial_window: int = 4,
+        min_window: int = 1,
+        max_window: int = 64,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 3.0,
+        history_size: int = 1024,
+        throughput_tolerance: float = 0.2,
+    ):
+        """
+        :param initial_window: The number of requests allowed in flight at the start, defaults to 4.
+        :type initial_window: int, optional
+        :param min_window: The window never shrinks below this, defaults to 1.
+        :type min_window: int, optional
+        :param max_window: The window never grows above this, defaults to 64.
+        :type max_window: int, optional
+        :param increase: How much the window grows per window's worth of successful requests, defaults to 1.
+        :type increase: float, optional
+        :param decrease_factor: The factor the window is multiplied by on an error, defaults to 0.5.
+        :type decrease_factor: float, optional
+        :param latency_tolerance: The window stops growing while requests take longer than this multiple
+                                  of the lowest latency seen, defaults to 3.
+        :type latency_tolerance: float, optional
+        :param history_size: The number of entries kept in :attr:`history`, defaults to 1024.
+        :type history_size: int, optional
+        :param throughput_tolerance: The fraction of the best throughput a round of requests may lose
+                                     before the window goes back to the size that reached it, defaults to 0.2.
+        :type throughput_tolerance: float, optional
+        """
+        self.min_window = min_window
+        self.max_window = max_window
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.throughput_tolerance = throughput_tolerance
+        self.history = deque(maxlen=history_size)
+        """The most recent requests as ``(timestamp, window, latency, size, outcome)`` tuples, where
+        outcome is one of "ok", "error" or "rate_limited"."""
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.latency = None
+        """The exponentially weighted moving average of the request latency in seconds."""
+        self.throughput = None
+        """The exponentially weighted moving average of the throughput of a single request in bytes per second."""
+        self.total_throughput = None
+        """The number of bytes per second that all the requests together received during the last round."""
+        self.__window = float(max(min_window, min(initial_window, max_window)))
+        self.__in_flight = 0
+        self.__min_latency = None
+        self.__last_decrease = 0.0
+        self.__round_start = None
+        self.__round_requests = 0
+        self.__round_size = 0
+        self.__best_throughput = None
+        self.__best_window = None
+        self.__condition = Condition()
+
+    @property
+    def window(self):
+        """The number of requests that are currently allowed to be in flight at once."""
+        return int(self.__window)
+
+    @property
+    def in_flight(self):
+        """The number of requests that are currently in flight."""
+        return self.__in_flight
+
+    @property
+    def error_rate(self):
+        """The fraction of the requests in :attr:`history` that failed or were rate limited."""
+        if not self.history:
+            return 0.0
+        failed = sum(1 for entry in self.history if entry[4] != "ok")
+        return failed / len(self.history)
+
+    def acquire(self):
+        """Blocks until a new request is allowed to start."""
+        with self.__condition:
+            while self.__in_flight >= self.window:
+                self.__condition.wait()
+            self.__in_flight += 1
+            if self.__round_start is None:
+                self.__round_start = time.monotonic()
+
+    def release(self, latency: float, size: int = 0, error: bool = False, rate_limited: bool = False):
+        """Reports the outcome of a request that was started after calling :meth:`acquire`.
+
+        :param latency: How long the request took in seconds.
+        :type latency: float
+        :param size: The number of bytes received, defaults to 0.
+        :type size: int, optional
+        :param error: Whether the request failed, defaults to False.
+        :type error: bool, optional
+        :param rate_limited: Whether the server rejected the request because of rate limiting, defaults to False.
+        :type rate_limited: bool, optional
+        """
+        now = time.monotonic()
+        with self.__condition:
+            self.__in_flight -= 1
+            self.requests += 1
+            if rate_limited:
+                outcome = "rate_limited"
+                self.rate_limited += 1
+            elif error:
+                outcome = "error"
+                self.errors += 1
+            else:
+                outcome = "ok"
+            if outcome == "ok":
+                self.__observe(latency, size)
+                if latency <= self.latency_tolerance * self.__min_latency:
+                    self.__window = min(self.max_window, self.__window + self.increase / self.__window)
+            elif now - self.__last_decrease >= (self.latency or 0.0):
+                self.__window = max(self.min_window, self.__window * self.decrease_factor)
+                self.__last_decrease = now
+            self.__round_requests += 1
+            self.__round_size += size if outcome == "ok" else 0
+            if self.__round_requests >= self.window:
+                self.__end_round(now)
+            self.history.append((time.time(), self.window, latency, size, outcome))
+            self.__condition.notify_all()
+
+    def __end_round(self, now):
+        elapsed = now - self.__round_start
+        if elapsed > 0:
+            self.total_throughput = self.__round_size / elapsed
+            if self.__best_throughput is None or self.total_throughput >= self.__best_throughput:
+                self.__best_throughput = self.total_throughput
+                self.__best_window = self.__window
+            else:
+                if (
+                    self.total_throughput < (1 - self.throughput_tolerance) * self.__best_throughput
+                    and self.__window > self.__best_window
+                ):
+                    # More requests in flight did not get more data through.
+                    self.__window = max(self.min_window, self.__best_window)
+                # The best throughput is forgotten over time, with a half-life of THROUGHPUT_HALF_LIFE.
+                self.__best_throughput *= 0.5 ** (elapsed / self.THROUGHPUT_HALF_LIFE)
+        self.__round_start = now
+        self.__round_requests = 0
+        self.__round_size = 0
+
+    def __observe(self, latency, size):
+        if self.__min_latency is None or latency < self.__min_latency:
+            self.__min_latency = latency
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency = 0.8 * self.latency + 0.2 * latency
+        if latency > 0:
+            throughput = size / latency
+            if self.throughput is None:
+                self.throughput = throughput
+            else:
+                self.throughput = 0.8 * self.throughput + 0.2 * throughput
+
+    def __repr__(self):
+        return f"<AdaptiveConcurrencyController window={self.window}>"
@@ -1,44 +1,189 @@
+import time
+from threading import Lock
+from concurrent.futures import Future, ThreadPoolExecutor
 from Crypto.Cipher import AES
 
+
+class KeyCache(object):
+    """A thread-safe cache of decryption keys keyed by their URI. Keys expire after ``ttl`` seconds.
+    When several threads ask for a key that is not cached yet, it is only fetched once and every
+    caller gets the same result. By default a single cache is shared by every :class:`DecrypterProvider`
+    in the process, across episodes and :class:`Sakurajima` instances.
+    """
+    def __init__(self, ttl: float = 600):
+        """
+        :param ttl: The number of seconds a key is kept for, defaults to 600.
+        :type ttl: float, optional
+        """
+        self.ttl = ttl
+        self.__keys = {}
+        self.__pending = {}
+        self.__lock = Lock()
+
+    def get(self, uri: str, fetch) -> bytearray:
+        """Gets the key for the given URI, calling ``fetch`` to get it if it is not cached.
+
+        :param uri: The URI of the key.
+        :type uri: str
+        :param fetch: A function that takes no arguments and returns the key.
+        :type fetch: ``function``
+        :rtype: bytearray
+        """
+        with self.__lock:
+            entry = self.__keys.get(uri)
+            if entry is not None and entry[1] > time.monotonic():
+                return entry[0]
+            future = self.__pending.get(uri)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.__pending[uri] = future
+        if not leader:
+            return future.result()
+        try:
+            key = fetch()
+        except Exception as e:
+            with self.__lock:
+                del self.__pending[uri]
+            future.set_exception(e)
+            raise e
+        with self.__lock:
+            self.__keys[uri] = (key, time.monotonic() + self.ttl)
+            del self.__pending[uri]
+        future.set_result(key)
+        return key
+
+    def invalidate(self, uri: str = None):
+        """Removes a key from the cache.
+
+        :param uri: The URI of the key to remove, defaults to None. If None, every key is removed.
+        :type uri: str, optional
+        """
+        with self.__lock:
+            if uri is None:
+                self.__keys.clear()
+            else:
+                self.__keys.pop(uri, None)
+
+
+_shared_key_cache = KeyCache()
+
+
 class DecrypterProvider(object):
+    """Provides the AES decrypters for the segments of a playlist. Keys are fetched lazily the
+    first time a segment that uses them is decrypted, playlists whose segments use several
+    different keys are supported.
+    """
+    MAX_COMPARISON_SAMPLES = 25
+    COMPARISON_BATCH_SIZE = 4
 
-    def __init__(self, network, m3u8, get_by_comparison = False):
+    def __init__(self, network, m3u8, get_by_comparison = False, key_cache: KeyCache = None):
+        """
+        :param network: The Sakurajima :class:`Network` object that is used to make network requests.
+        :type network: :class:`Network`
+        :param m3u8: The M3U8 data of the episode.
+        :type m3u8: :class:`Playlist`
+        :param get_by_comparison: Whether to get the keys by comparing several samples of them, defaults to False.
+        :type get_by_comparison: bool, optional
+        :param key_cache: The cache the keys are kept in, defaults to None. If None, the cache shared
+                          by the whole process is used.
+        :type key_cache: :class:`KeyCache`, optional
+        """
         self.__network = network
         self.m3u8 = m3u8
-        self.key = None
-        self.uri = self.m3u8.data["keys"][1]["uri"]
-        if get_by_comparison:
-            self.get_key_by_comparison()
-        else:
-            self.get_key()
-
-    def get_key_by_comparison(self) -> bytearray:
-        if self.key == None:
-            key1 = bytearray(self.__network.get(self.uri).content)
-            key2 = key1
-            tries = 1
-            while key1 == key2 and tries <=25:
-                key2 = bytearray(self.__network.get(self.uri).content)
-                tries += 1
-            final_key = []
-            for index in range(len(key1)):
-                smaller = min(key1[index], key2[index])
-                final_key.append(smaller)
-            self.key = bytearray(final_key)
-        return self.key
-    
-    def get_key(self) -> bytearray:
-        if self.key == None:
-            self.key = bytearray(self.__network.get(self.uri).content)
-        return self.key
+        self.get_by_comparison = get_by_comparison
+        self.key_cache = key_cache or _shared_key_cache
+        segments = self.m3u8.data["segments"]
+        self.uri = None
+        """The URI of the first key in the playlist."""
+        for segment in segments:
+            if segment.get("key"):
+                self.uri = segment["key"]["uri"]
+                break
+        self.__ivs = [self.__initialization_vector(index, segment) for index, segment in enumerate(segments)]
+
+    @property
+    def key(self):
+        """The key of the first key URI in the playlist."""
+        return self.get_key()
+
+    def get_key_by_comparison(self, uri: str = None) -> bytearray:
+        """Gets a key by fetching several samples of it and taking the byte-wise minimum of them.
+        The samples are fetched concurrently in batches until two different ones have been seen.
+
+        :param uri: The URI of the key, defaults to None. If None, the first key URI in the playlist is used.
+        :type uri: str, optional
+        :rtype: bytearray
+        """
+        uri = uri or self.uri
+
+        def fetch():
+            samples = []
+            with ThreadPoolExecutor(self.COMPARISON_BATCH_SIZE) as executor:
+                while len(samples) < self.MAX_COMPARISON_SAMPLES:
+                    batch_size = min(self.COMPARISON_BATCH_SIZE, self.MAX_COMPARISON_SAMPLES - len(samples))
+                    samples.extend(executor.map(lambda _: self.__fetch_key(uri), range(batch_size)))
+                    if len(set(samples)) > 1:
+                        break
+            return bytearray(map(min, *samples))
+
+        return self.key_cache.get(uri, fetch)
+
+    def get_key(self, uri: str = None) -> bytearray:
+        """Gets a key, fetching it only if it is not cached.
+
+        :param uri: The URI of the key, defaults to None. If None, the first key URI in the playlist is used.
+        :type uri: str, optional
+        :rtype: bytearray
+        """
+        uri = uri or self.uri
+        if self.get_by_comparison:
+            return self.get_key_by_comparison(uri)
+        return self.key_cache.get(uri, lambda: bytearray(self.__fetch_key(uri)))
+
+    def __fetch_key(self, uri):
+        res = self.__network.get(uri)
+        res.raise_for_status()
+        return res.content
 
     @staticmethod
     def create_initialization_vector(chunk_number) -> bytearray:
-        iv = [0 for _ in range(0, 16)]
-        for i in range(12, 16):
-            iv[i] = chunk_number[0] >> 8 * (15 - i) & 255
-        return bytearray(iv)
-    
+        if isinstance(chunk_number, tuple):
+            chunk_number = chunk_number[0]
+        return bytearray((chunk_number & 0xFFFFFFFF).to_bytes(16, "big"))
+
+    def __initialization_vector(self, chunk_number, segment):
+        key_dict = segment.get("key") or {}
+        iv = key_dict.get("iv")
+        if iv:
+            # An IV given in the EXT-X-KEY tag takes precedence over the chunk number.
+            return bytearray(int(iv, 16).to_bytes(16, "big"))
+        return self.create_initialization_vector(chunk_number)
+
+    def get_initialization_vector(self, chunk_number) -> bytearray:
+        """Gets the precomputed initialization vector of a chunk.
+
+        :param chunk_number: The position of the chunk in the playlist.
+        :type chunk_number: int
+        :rtype: bytearray
+        """
+        if isinstance(chunk_number, tuple):
+            chunk_number = chunk_number[0]
+        return self.__ivs[chunk_number]
+
+    def get_segment_key(self, chunk_number) -> bytearray:
+        """Gets the key that the chunk at the given position in the playlist is encrypted with.
+
+        :param chunk_number: The position of the chunk in the playlist.
+        :type chunk_number: int
+        :rtype: bytearray
+        """
+        if isinstance(chunk_number, tuple):
+            chunk_number = chunk_number[0]
+        key_dict = self.m3u8.data["segments"][chunk_number].get("key") or {}
+        return self.get_key(key_dict.get("uri"))
+
     def get_decrypter(self, chunk_number) -> AES:
-        iv = self.create_initialization_vector(chunk_number)
-        return AES.new(self.get_key(), AES.MODE_CBC, iv = iv)
\ No newline at end of file
+        return AES.new(
+            bytes(self.get_segment_key(chunk_number)), AES.MODE_CBC, iv = bytes(self.get_initialization_vector(chunk_number))
+        )
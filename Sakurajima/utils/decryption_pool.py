@@ -0,0 +1,120 @@
+from concurrent.futures import ProcessPoolExecutor
+from Crypto.Cipher import AES
+
+try:
+    from multiprocessing import resource_tracker
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:
+    # Python 3.7 and older, the chunks are decrypted on the calling thread instead.
+    SharedMemory = None
+
+TS_PACKET_SIZE = 188
+TS_SYNC_BYTE = 0x47
+
+
+def _is_valid_ts(buffer, size):
+    # Every MPEG-TS packet starts with the sync byte, the trailing padding is ignored.
+    packets = size // TS_PACKET_SIZE
+    sync_bytes = bytes(buffer[0:packets * TS_PACKET_SIZE:TS_PACKET_SIZE])
+    return packets > 0 and sync_bytes.count(TS_SYNC_BYTE) == packets
+
+
+def _decrypt_shared(name, size, key, iv, validate_ts):
+    # Runs in a worker process. Decrypts the chunk in place inside the shared memory block
+    # so the chunk itself never has to be pickled.
+    shared_memory = SharedMemory(name=name)
+    try:
+        buffer = shared_memory.buf[:size]
+        try:
+            AES.new(key, AES.MODE_CBC, iv=iv).decrypt(buffer, output=buffer)
+            return not validate_ts or _is_valid_ts(buffer, size)
+        except Exception as e:
+            # The frames in the traceback still reference the buffer and would keep it exported.
+            raise e.with_traceback(None)
+        finally:
+            # The block can not be closed while a view of it is still exported.
+            buffer.release()
+    finally:
+        shared_memory.close()
+
+
+class DecryptionPool(object):
+    """Decrypts chunks in a pool of worker processes so that decryption is spread across all
+    the CPU cores instead of running on the downloading threads. The chunks are handed to the
+    workers through shared memory rather than being pickled. Pass the same pool to several
+    downloaders to share it between them. Create the pool before starting any downloads.
+
+    Shared memory requires Python 3.8, on older versions the chunks are decrypted on the
+    calling thread and no worker processes are started.
+    """
+    def __init__(self, max_workers: int = None, validate_ts: bool = False):
+        """
+        :param max_workers: The number of worker processes, defaults to None. If None, one
+                            worker per CPU core is used.
+        :type max_workers: int, optional
+        :param validate_ts: Whether to check that the decrypted chunks are valid MPEG-TS, defaults
+                            to False. A chunk that fails the check raises a ``ValueError``, which
+                            usually means that the wrong key was used. Empty chunks always pass.
+        :type validate_ts: bool, optional
+        """
+        self.validate_ts = validate_ts
+        self.__executor = None
+        if SharedMemory is not None:
+            # The workers have to share the resource tracker of this process. One that a worker
+            # started for itself would take the blocks it attached to for leaked, and unlink them
+            # when the worker exits, while this process still owns them.
+            resource_tracker.ensure_running()
+            self.__executor = ProcessPoolExecutor(max_workers=max_workers)
+            # Start the workers right away, before any downloading threads exist. Workers that are
+            # forked while another thread holds a lock can deadlock on it.
+            self.__executor.submit(int).result()
+
+    def decrypt(self, key, iv, chunk) -> bytes:
+        """Decrypts an AES-128-CBC encrypted chunk in one of the worker processes and blocks
+        until it is done.
+
+        :param key: The decryption key.
+        :type key: bytes
+        :param iv: The initialization vector.
+        :type iv: bytes
+        :param chunk: The encrypted chunk.
+        :type chunk: bytes
+        :return: The decrypted chunk.
+        :rtype: bytes
+        """
+        size = len(chunk)
+        if size == 0:
+            # An empty chunk holds no packets that could have been decrypted with the wrong key,
+            # so it passes the MPEG-TS check. Shared memory blocks can not be empty anyway.
+            return b""
+        if self.__executor is None:
+            decrypted = AES.new(bytes(key), AES.MODE_CBC, iv=bytes(iv)).decrypt(bytes(chunk))
+            if self.validate_ts and not _is_valid_ts(decrypted, size):
+                raise ValueError("The decrypted chunk is not a valid MPEG-TS stream")
+            return decrypted
+        shared_memory = SharedMemory(create=True, size=size)
+        try:
+            shared_memory.buf[:size] = chunk
+            valid = self.__executor.submit(
+                _decrypt_shared, shared_memory.name, size, bytes(key), bytes(iv), self.validate_ts
+            ).result()
+            if not valid:
+                raise ValueError("The decrypted chunk is not a valid MPEG-TS stream")
+            return bytes(shared_memory.buf[:size])
+        finally:
+            shared_memory.close()
+            shared_memory.unlink()
+
+    def shutdown(self):
+        """Stops the worker processes."""
+        if self.__executor is not None:
+            self.__executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    def __repr__(self):
+        return "<DecryptionPool>"
@@ -1,14 +1,97 @@
 import os
+import sys
+import time
+import asyncio
+import urllib.parse
+from collections import deque
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
-from Sakurajima.utils.merger import ChunkMerger, FFmpegMerger, ChunkRemover
+from Sakurajima.utils.merger import ChunkMerger, FFmpegMerger, ChunkRemover, get_chunk_path
+from Sakurajima.utils.writer import OrderedWriter, FFmpegWriter
 from threading import Thread, Lock
 from progress.bar import IncrementalBar
 from Sakurajima.utils.progress_tracker import ProgressTracker
 from Sakurajima.utils.decrypter_provider import DecrypterProvider
 from concurrent.futures import ThreadPoolExecutor
 
-class Downloader(object):
+
+class _BaseDownloader(object):
+    # The output handling that all the downloaders share: the progress journal, resuming,
+    # writing straight into the output file, merging the chunks and cleaning up.
+    def __init__(
+        self, network, m3u8, file_name, episode_id, use_ffmpeg, include_intro, delete_chunks, headers,
+        direct_write, decryption_pool, ffmpeg_pipe
+    ):
+        self.__network = network
+        self.m3u8 = m3u8
+        self.file_name = file_name
+        self.use_ffmpeg = use_ffmpeg
+        self.include_intro = include_intro
+        self.delete_chunks = delete_chunks
+        self.headers = headers
+        self.direct_write = direct_write or ffmpeg_pipe
+        self.ffmpeg_pipe = ffmpeg_pipe
+        self.decryption_pool = decryption_pool
+        self.chunks_done = {}
+        self.progress_tracker = ProgressTracker(episode_id)
+
+    def init_tracker(self):
+        self.progress_tracker.init_tracker(
+            {
+                "headers": self.__network.headers,
+                # A snapshot, the sessions keep changing the cookies while the download runs.
+                "cookies": self.__network.cookies.copy(),
+                "segments": self.m3u8.data["segments"],
+                "playlist": self.m3u8.dumps(),
+                "chunk_headers": self.headers,
+                "file_name": self.file_name,
+                "total_chunks": self.total_chunks,
+                "include_intro": self.include_intro,
+                "direct_write": self.direct_write,
+                "ffmpeg_pipe": self.ffmpeg_pipe,
+            },
+            resume=bool(self.chunks_done),
+        )
+
+    def resume(self):
+        """Resumes an interrupted download of the video file. Only the chunks that are missing
+        from the progress journal are downloaded.
+        """
+        self.chunks_done = self.progress_tracker.read_journal()
+        self.download()
+
+    def open_writer(self, max_buffered: int = 32):
+        if self.ffmpeg_pipe:
+            # ffmpeg has to be fed the episode from the start, so a resumed download starts over.
+            self.chunks_done = {}
+            return FFmpegWriter(f"{self.file_name}.mp4", max_buffered, self.progress_tracker.update_chunks_done)
+        # When resuming, everything up to the first missing chunk is already in the output file.
+        start_index, offset = _resume_point(self.chunks_done)
+        self.chunks_done = {chunk_number: self.chunks_done[chunk_number] for chunk_number in range(start_index)}
+        return OrderedWriter(
+            f"{self.file_name}.mp4", max_buffered, start_index, offset, self.progress_tracker.update_chunks_done
+        )
+
+    def merge(self):
+        """Merges the downloaded chunks into a single file.
+        """
+        if self.direct_write:
+            # The chunks were written straight into the output file.
+            return
+        if self.use_ffmpeg:
+            FFmpegMerger(self.file_name, self.total_chunks).merge()
+        else:
+            ChunkMerger(self.file_name, self.total_chunks).merge()
+
+    def remove_chunks(self):
+        """Deletes the downloaded chunks and the progress tracking data.
+        """
+        if not self.direct_write:
+            ChunkRemover(self.file_name, self.total_chunks).remove()
+        self.progress_tracker.remove_data()
+
+
+class Downloader(_BaseDownloader):
     """
     Facilitates downloading an episode from aniwatch.me using a single thread.
 
@@ -23,13 +106,16 @@ class Downloader(object):
         include_intro: bool = False,
         delete_chunks: bool = True,
         on_progress=None,
-        headers=None
+        headers=None,
+        direct_write: bool = False,
+        decryption_pool=None,
+        ffmpeg_pipe: bool = False
     ):
         """
         :param network: The Sakurajima :class:`Network` object that is used to make network requests.  
         :type network: :class:`Network`
         :param m3u8: The M3U8 data of the episode that is to be downloaded.
-        :type m3u8: :class:`M3U8`
+        :type m3u8: :class:`Playlist`
         :param file_name: The name of the downloaded video file.
         :type file_name: str
         :param episode_id: The episode ID of the episode being downloaded.
@@ -47,27 +133,26 @@ class Downloader(object):
                             passed the chunk number of the downloaded chunk and the total number of chunks as 
                             parameters, defaults to None
         :type on_progress:  ``function``, optional
+        :param direct_write: Whether to write the chunks straight into the output file instead of
+                             downloading them into the ``chunks`` directory and merging them afterwards,
+                             defaults to False. The output is the same as that of :class:`ChunkMerger`,
+                             ``use_ffmpeg`` and ``delete_chunks`` have no effect.
+        :type direct_write: bool, optional
+        :param decryption_pool: A :class:`DecryptionPool` that the chunks are decrypted in, defaults to None.
+                                If None, the chunks are decrypted on the downloading threads.
+        :type decryption_pool: :class:`DecryptionPool`, optional
+        :param ffmpeg_pipe: Whether to pipe the chunks into ``ffmpeg`` in order while they are downloaded,
+                            defaults to False. ``ffmpeg`` remuxes them into the output file as they arrive,
+                            so the output is ready right after the last chunk. Implies ``direct_write``.
+                            An interrupted download can not be resumed in this mode and starts over.
+        :type ffmpeg_pipe: bool, optional
         """
+        super().__init__(
+            network, m3u8, file_name, episode_id, use_ffmpeg, include_intro, delete_chunks, headers,
+            direct_write, decryption_pool, ffmpeg_pipe
+        )
         self.__network = network
-        self.m3u8 = m3u8
-        self.file_name = file_name
-        self.use_ffmpeg = use_ffmpeg
-        self.include_intro = include_intro
-        self.delete_chunks = delete_chunks
         self.on_progress = on_progress
-        self.headers = headers
-        self.progress_tracker = ProgressTracker(episode_id)
-
-    def init_tracker(self):
-        self.progress_tracker.init_tracker(
-            {
-                "headers": self.__network.headers,
-                "cookies": self.__network.cookies,
-                "segments": self.m3u8.data["segments"],
-                "file_name": self.file_name,
-                "total_chunks": self.total_chunks,
-            }
-        )
 
     def download(self):
         """Runs the downloader and starts downloading the video file.
@@ -91,48 +176,46 @@ class Downloader(object):
         except FileExistsError:
             pass
 
+        writer = self.open_writer() if self.direct_write else None
         self.progress_bar = IncrementalBar("Downloading", max=self.total_chunks)
+        self.progress_bar.next(len(self.chunks_done))
         self.init_tracker()
         decryter_provider = DecrypterProvider(self.__network, self.m3u8)
         for chunk_number, chunk_tuple in enumerate(chunk_tuple_list):
+            if chunk_number in self.chunks_done:
+                continue
             # We need the chunk number here to name the files. Note that this is
             # different from the chunk number that is inside the tuple.
-            file_name = f"chunks\/{self.file_name}-{chunk_number}.chunk.ts"
-            ChunkDownloader(
+            file_name = get_chunk_path(self.file_name, chunk_number)
+            chunk_downloader = ChunkDownloader(
                 self.__network,
-                self.headers,
                 chunk_tuple[1], # The segment data
                 file_name,
                 chunk_tuple[0], # The chunk number needed for decryption.
                 decryter_provider,
-                
-                ).download()
+                self.headers,
+                self.decryption_pool,
+                )
+            if writer:
+                # The writer records the chunk in the journal once it is in the output file.
+                writer.write(chunk_number, chunk_downloader.process(chunk_downloader.get()))
+            else:
+                self.progress_tracker.update_chunks_done(chunk_number, chunk_downloader.download())
             self.progress_bar.next()
-            self.progress_tracker.update_chunks_done(chunk_number)
             if self.on_progress:
                 self.on_progress.__call__(chunk_number + 1, self.total_chunks)
 
+        if writer:
+            writer.close()
         self.progress_bar.finish()
 
-    def merge(self):
-        """Merges the downloaded chunks into a single file.
-        """
-        if self.use_ffmpeg:
-            FFmpegMerger(self.file_name, self.total_chunks).merge()
-        else:
-            ChunkMerger(self.file_name, self.total_chunks).merge()
-
-    def remove_chunks(self):
-        """Deletes the downloaded chunks.
-        """
-        ChunkRemover(self.file_name, self.total_chunks).remove()
-
-
 class ChunkDownloader(object):
     """
     The object that actually downloads a single chunk.
     """
-    def __init__(self, network, segment, file_name, chunk_number, decrypt_provider: DecrypterProvider, headers):
+    def __init__(
+        self, network, segment, file_name, chunk_number, decrypt_provider: DecrypterProvider, headers, decryption_pool=None, stripe=False
+    ):
         """
         :param network: The Sakurajima :class:`Network` object that is used to make network requests. 
         :type network: :class:`Network`
@@ -143,6 +226,12 @@ class ChunkDownloader(object):
         :param chunk_number: The chunk number of the the chunk to be downloaded, required to generate
                         the AES decryption initialization vector.
         :type chunk_number: int
+        :param decryption_pool: A :class:`DecryptionPool` to decrypt the chunk in, defaults to None.
+                                If None, the chunk is decrypted on the calling thread.
+        :type decryption_pool: :class:`DecryptionPool`, optional
+        :param stripe: Whether to fetch the chunk through the network's proxy pool with
+                       :meth:`ProxyPool.stripe`, defaults to False.
+        :type stripe: bool, optional
         """
         self.__network = network
         self.headers = headers
@@ -150,27 +239,69 @@ class ChunkDownloader(object):
         self.file_name = file_name
         self.chunk_number = chunk_number,
         self.decrypter_provider = decrypt_provider
+        self.decryption_pool = decryption_pool
+        self.stripe = stripe
 
     def download(self):
         """Starts downloading the chunk.
+
+        :return: The size of the saved chunk in bytes.
+        :rtype: int
         """
-        with open(self.file_name, "wb") as videofile:
-            res = self.__network.get(self.segment["uri"], headers=self.headers)
-            chunk = res.content
-            key_dict = self.segment.get("key", None)
-            
-            if key_dict is not None:
-                decrypted_chunk = self.decrypt_chunk(chunk)
-                videofile.write(decrypted_chunk)
-            else:
-                videofile.write(chunk)
+        return self.save(self.get())
+
+    def get(self):
+        """Fetches the raw bytes of the chunk from the server.
+
+        :rtype: bytes
+        """
+        chunk = self.decrypter_provider.m3u8.take_prefetched(self.segment["uri"])
+        if chunk is not None:
+            return chunk
+        res = self.__network.get(self.segment["uri"], headers=self.headers, stripe=self.stripe)
+        res.raise_for_status()
+        return res.content
+
+    def process(self, chunk):
+        """Decrypts the downloaded chunk if the segment is encrypted.
+
+        :param chunk: The raw bytes of the chunk as received from the server.
+        :type chunk: bytes
+        :rtype: bytes
+        """
+        key_dict = self.segment.get("key", None)
+        if key_dict is not None:
+            return self.decrypt_chunk(chunk)
+        return chunk
+
+    def save(self, chunk):
+        """Decrypts the downloaded chunk if required and writes it to disk. The chunk is
+        written to a temporary file first and then renamed, so a chunk file is either
+        complete or missing.
+
+        :param chunk: The raw bytes of the chunk as received from the server.
+        :type chunk: bytes
+        :return: The size of the saved chunk in bytes.
+        :rtype: int
+        """
+        chunk = self.process(chunk)
+        with open(f"{self.file_name}.part", "wb") as videofile:
+            videofile.write(chunk)
+        os.replace(f"{self.file_name}.part", self.file_name)
+        return len(chunk)
     
     def decrypt_chunk(self, chunk):
+        if self.decryption_pool:
+            return self.decryption_pool.decrypt(
+                self.decrypter_provider.get_segment_key(self.chunk_number),
+                self.decrypter_provider.get_initialization_vector(self.chunk_number),
+                chunk
+            )
         decryter = self.decrypter_provider.get_decrypter(self.chunk_number)
         return decryter.decrypt(chunk)
 
 
-class MultiThreadDownloader(object):
+class MultiThreadDownloader(_BaseDownloader):
     """
     Facilitates downloading an episode from aniwatch.me using multiple threads.
     """
@@ -184,12 +315,20 @@ class MultiThreadDownloader(object):
         use_ffmpeg: bool = True,
         include_intro: bool = False,
         delete_chunks: bool = True,
-        headers = None
+        headers = None,
+        direct_write: bool = False,
+        max_buffered_chunks: int = 32,
+        concurrency_controller = None,
+        max_retries: int = 0,
+        print_progress: bool = True,
+        decryption_pool = None,
+        stripe_proxies: bool = None,
+        ffmpeg_pipe: bool = False
     ):
         """
         :param network: The Sakurajima :class:`Network` object that is used to make network requests.
         :type network: :class:`Network`
-        :type m3u8: :class:`M3U8`
+        :type m3u8: :class:`Playlist`
         :param file_name: The name of the downloaded video file.
         :type file_name: str
         :param episode_id: The episode ID of the episode being downloaded.
@@ -206,54 +345,134 @@ class MultiThreadDownloader(object):
         :param delete_chunks: Whether to delete the downloaded chunks after that have been
                               merged into a single file, defaults to True
         :type delete_chunks: bool, optional
+        :param direct_write: Whether to write the chunks straight into the output file instead of
+                             downloading them into the ``chunks`` directory and merging them afterwards,
+                             defaults to False. Chunks that finish out of order are held in memory until
+                             the chunks before them have been written. ``use_ffmpeg`` and ``delete_chunks``
+                             have no effect.
+        :type direct_write: bool, optional
+        :param max_buffered_chunks: The maximum number of out of order chunks held in memory when
+                                    ``direct_write`` is enabled, defaults to 32.
+        :type max_buffered_chunks: int, optional
+        :param concurrency_controller: An :class:`AdaptiveConcurrencyController` that decides how many chunk
+                                       requests are in flight at once, defaults to None. When set, ``max_threads``
+                                       is ignored and the thread pool is sized to the controller's ``max_window``.
+        :type concurrency_controller: :class:`AdaptiveConcurrencyController`, optional
+        :param max_retries: The number of times a failed chunk request is retried, defaults to 0.
+        :type max_retries: int, optional
+        :param print_progress: Whether to print a progress bar to the console, defaults to True.
+        :type print_progress: bool, optional
+        :param decryption_pool: A :class:`DecryptionPool` that the chunks are decrypted in, defaults to None.
+                                If None, the chunks are decrypted on the downloading threads.
+        :type decryption_pool: :class:`DecryptionPool`, optional
+        :param stripe_proxies: Whether to spread the chunks across all the proxies of the network's
+                               :class:`ProxyPool` at once, weighted by the measured throughput of each
+                               proxy, defaults to None. If None, the chunks are striped whenever the
+                               pool has at least two proxies.
+        :type stripe_proxies: bool, optional
+        :param ffmpeg_pipe: Whether to pipe the chunks into ``ffmpeg`` in order while they are downloaded,
+                            defaults to False. ``ffmpeg`` remuxes them into the output file as they arrive,
+                            so the output is ready right after the last chunk. Implies ``direct_write``.
+                            An interrupted download can not be resumed in this mode and starts over.
+        :type ffmpeg_pipe: bool, optional
         """
+        super().__init__(
+            network, m3u8, file_name, episode_id, use_ffmpeg, include_intro, delete_chunks, headers,
+            direct_write, decryption_pool, ffmpeg_pipe
+        )
         self.__network = network
-        self.m3u8 = m3u8
-        self.file_name = file_name
-        self.use_ffmpeg = use_ffmpeg
         self.max_threads = max_threads
-        self.include_intro = include_intro
-        self.delete_chunks = delete_chunks
+        self.concurrency_controller = concurrency_controller
+        self.max_retries = max_retries
+        self.print_progress = print_progress
         self.threads = []
-        self.headers
-        self.progress_tracker = ProgressTracker(episode_id)
+        self.max_buffered_chunks = max_buffered_chunks
+        if stripe_proxies is None:
+            proxy_pool = getattr(network, "proxy_pool", None)
+            stripe_proxies = proxy_pool is not None and len(proxy_pool) > 1
+        self.stripe_proxies = stripe_proxies
+        self.writer = None
         self.__lock = Lock()
         try:
             os.makedirs("chunks")
         except FileExistsError:
             pass
 
-    def init_tracker(self):
-        self.progress_tracker.init_tracker(
-            {
-                "headers": self.__network.headers,
-                "cookies": self.__network.cookies,
-                "segments": self.m3u8.data["segments"],
-                "file_name": self.file_name,
-                "total_chunks": self.total_chunks,
-            }
-        )
-
-
     def assign_segments(self, segment):
 
-        ChunkDownloader(
+        chunk_downloader = ChunkDownloader(
             segment.network,
-            self.headers,
             segment.segment,
             segment.file_name,
             segment.chunk_number,
             segment.decrypter_provider,
+            self.headers,
+            self.decryption_pool,
+            self.stripe_proxies,
+        )
+        if self.writer:
+            try:
+                self.writer.acquire(segment.position)
+                # The writer records the chunk in the journal once it is in the output file.
+                self.writer.write(segment.position, chunk_downloader.process(self.fetch_chunk(chunk_downloader)))
+            except Exception as e:
+                # The chunks after this one can never be written, stop the threads waiting for them.
+                self.writer.abort(e)
+                raise e
+        else:
+            size = chunk_downloader.save(self.fetch_chunk(chunk_downloader))
+            self.progress_tracker.update_chunks_done(segment.position, size)
+        if self.progress_bar:
+            with self.__lock:
+                self.progress_bar.next()
 
-        ).download()
-        with self.__lock:
-            self.progress_tracker.update_chunks_done(segment.chunk_number)
-            self.progress_bar.next()
+    def fetch_chunk(self, chunk_downloader):
+        # Fetches a chunk, reporting every attempt to the concurrency controller if there is one.
+        controller = self.concurrency_controller
+        attempt = 0
+        while True:
+            if controller:
+                controller.acquire()
+            start = time.monotonic()
+            try:
+                chunk = chunk_downloader.get()
+            except Exception as e:
+                if controller:
+                    controller.release(time.monotonic() - start, error=True, rate_limited=_is_rate_limited(e))
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise e
+                time.sleep(attempt)
+                continue
+            if controller:
+                controller.release(time.monotonic() - start, len(chunk))
+            return chunk
 
     def download(self):
         """Runs the downloader and starts downloading the video file.
         """
+        segment_wrapper_list = self.prepare()
+
+        self.executor = ThreadPoolExecutor(max_workers = self.max_threads)
+        
+        try:
+            with self.executor as exe:
+                futures = exe.map(self.assign_segments, segment_wrapper_list)
+                for future in futures: 
+                    # This loop servers to run the generator.
+                    pass
+        finally:
+            self.finish()
+
+    def prepare(self):
+        """Sets up the progress tracking and the output, without downloading anything. The
+        decryption keys are fetched later, by the first segment that needs each of them. Used by :meth:`download` and by :class:`DownloadScheduler`, which
+        runs the segments of many downloaders on a shared thread pool.
 
+        :return: The segments that have to be downloaded, each of which is to be passed to 
+                 :meth:`assign_segments`.
+        :rtype: list
+        """
         decrypter_provider = DecrypterProvider(self.__network, self.m3u8)
         chunk_tuple_list = []
         # Will hold a list of tuples of the form (chunk_number, chunk).
@@ -269,55 +488,414 @@ class MultiThreadDownloader(object):
                     chunk_tuple_list.remove(chunk_tuple) 
         
         self.total_chunks = len(chunk_tuple_list)
-        self.progress_bar = IncrementalBar("Downloading", max=self.total_chunks)
+        if self.concurrency_controller:
+            # The controller decides how many of the threads are allowed to make a request at once.
+            self.max_threads = self.concurrency_controller.max_window
+        elif self.max_threads == None:
+            # If the value for max threads is not provided, then it is set to 
+            # the total number of chunks that are to be downloaded.
+            self.max_threads = self.total_chunks
+        # Keep a connection alive for every thread.
+        self.__network.sessions.resize("cdn", self.max_threads)
+        if self.direct_write:
+            self.writer = self.open_writer(self.max_buffered_chunks)
+        self.progress_bar = None
+        if self.print_progress:
+            self.progress_bar = IncrementalBar("Downloading", max=self.total_chunks)
+            self.progress_bar.next(len(self.chunks_done))
         self.init_tracker()
 
         segment_wrapper_list = []
 
         for chunk_number, chunk in enumerate(chunk_tuple_list):
-            file_name = f"chunks\/{self.file_name}-{chunk_number}.chunk.ts"
+            if chunk_number in self.chunks_done:
+                continue
+            file_name = get_chunk_path(self.file_name, chunk_number)
             segment_wrapper = _SegmentWrapper(
                 self.__network,
                 chunk[1], # Segment data.
                 file_name,
                 chunk[0], # The chunk number needed for decryption.
-                decrypter_provider
+                decrypter_provider,
+                chunk_number
             )
             segment_wrapper_list.append(segment_wrapper)
+        return segment_wrapper_list
 
-        if self.max_threads == None:
-            # If the value for max threads is not provided, then it is set to 
-            # the total number of chunks that are to be downloaded.
-            self.max_threads = self.total_chunks
+    def finish(self):
+        """Closes the output after all the segments returned by :meth:`prepare` have been downloaded.
+        """
+        if self.writer:
+            self.writer.close()
+        if self.progress_bar:
+            self.progress_bar.finish()
 
-        self.executor = ThreadPoolExecutor(max_workers = self.max_threads)
-        
-        with self.executor as exe:
-            futures = exe.map(self.assign_segments, segment_wrapper_list)
-            for future in futures: 
-                # This loop servers to run the generator.
-                pass
-        self.progress_bar.finish()
+class AsyncDownloader(_BaseDownloader):
+    """
+    Facilitates downloading an episode from aniwatch.me using a single ``asyncio`` event loop.
+    Unlike :class:`MultiThreadDownloader` this does not start an OS thread per chunk, the number
+    of in-flight chunk requests is bounded by a semaphore instead. Requires ``aiohttp``.
+    """
+    def __init__(
+        self,
+        network,
+        m3u8,
+        file_name: str,
+        episode_id: int,
+        max_concurrency: int = 64,
+        use_ffmpeg: bool = True,
+        include_intro: bool = False,
+        delete_chunks: bool = True,
+        headers = None,
+        direct_write: bool = False,
+        max_buffered_chunks: int = 32,
+        decryption_pool = None,
+        ffmpeg_pipe: bool = False,
+        on_progress=None,
+        print_progress: bool = True
+    ):
+        """
+        :param network: The Sakurajima :class:`Network` object that is used to make network requests.
+        :type network: :class:`Network`
+        :type m3u8: :class:`Playlist`
+        :param file_name: The name of the downloaded video file.
+        :type file_name: str
+        :param episode_id: The episode ID of the episode being downloaded.
+                           This is only required to uniquely identify the progree
+                           tracking data of the episode.
+        :type episode_id: int
+        :param max_concurrency: The maximum number of chunk requests that are in flight at once, defaults to 64.
+        :type max_concurrency: int, optional
+        :param use_ffmpeg: Whether to use ``ffmpeg`` to merge the downlaoded chunks, defaults to True
+        :type use_ffmpeg: bool, optional
+        :param include_intro: Whether to include the 5 second aniwatch intro, defaults to False
+        :type include_intro: bool, optional
+        :param delete_chunks: Whether to delete the downloaded chunks after that have been
+                              merged into a single file, defaults to True
+        :type delete_chunks: bool, optional
+        :param direct_write: Whether to write the chunks straight into the output file instead of
+                             downloading them into the ``chunks`` directory and merging them afterwards,
+                             defaults to False. Chunks that finish out of order are held in memory until
+                             the chunks before them have been written. ``use_ffmpeg`` and ``delete_chunks``
+                             have no effect.
+        :type direct_write: bool, optional
+        :param max_buffered_chunks: The maximum number of out of order chunks held in memory when
+                                    ``direct_write`` is enabled, defaults to 32.
+        :type max_buffered_chunks: int, optional
+        :param decryption_pool: A :class:`DecryptionPool` that the chunks are decrypted in, defaults to None.
+                                If None, the chunks are decrypted on the downloading threads.
+        :type decryption_pool: :class:`DecryptionPool`, optional
+        :param ffmpeg_pipe: Whether to pipe the chunks into ``ffmpeg`` in order while they are downloaded,
+                            defaults to False. ``ffmpeg`` remuxes them into the output file as they arrive,
+                            so the output is ready right after the last chunk. Implies ``direct_write``.
+                            An interrupted download can not be resumed in this mode and starts over.
+        :type ffmpeg_pipe: bool, optional
+        :param on_progress: Register a function that is called every time a chunk is downloaded, the function
+                            is passed the number of chunks done and the total number of chunks as parameters,
+                            defaults to None
+        :type on_progress:  ``function``, optional
+        :param print_progress: Whether to print a progress bar to the console, defaults to True.
+        :type print_progress: bool, optional
+        """
+        super().__init__(
+            network, m3u8, file_name, episode_id, use_ffmpeg, include_intro, delete_chunks, headers,
+            direct_write, decryption_pool, ffmpeg_pipe
+        )
+        self.__network = network
+        self.max_concurrency = max_concurrency
+        self.max_buffered_chunks = max_buffered_chunks
+        self.on_progress = on_progress
+        self.print_progress = print_progress
+        self.writer = None
+        try:
+            os.makedirs("chunks")
+        except FileExistsError:
+            pass
 
-    def merge(self):
-        """Merges the downloaded chunks into a single file.
+    def download(self):
+        """Runs the downloader on a new event loop and blocks until the video file
+        has been downloaded.
         """
-        if self.use_ffmpeg:
-            FFmpegMerger(self.file_name, self.total_chunks).merge()
-        else:
-            ChunkMerger(self.file_name, self.total_chunks).merge()
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.download_async())
+        finally:
+            loop.close()
 
-    def remove_chunks(self):
-        """Deletes the downloaded chunks.
+    async def download_async(self, session=None, semaphore=None):
+        """The coroutine that does the actual downloading. Await this directly to download
+        several episodes from the same event loop.
+
+        :param session: An ``aiohttp.ClientSession`` to make the requests with, defaults to None.
+                        If None, a session is created for this download and closed afterwards.
+        :type session: ``aiohttp.ClientSession``, optional
+        :param semaphore: An ``asyncio.Semaphore`` that bounds the number of in-flight requests,
+                          defaults to None. Pass the same semaphore to several downloaders to share
+                          a single concurrency limit between them. If None, a semaphore of size
+                          ``max_concurrency`` is used.
+        :type semaphore: ``asyncio.Semaphore``, optional
+        """
+        import aiohttp
+
+        decrypter_provider = DecrypterProvider(self.__network, self.m3u8)
+        chunk_tuple_list = []
+        # Will hold a list of tuples of the form (chunk_number, chunk).
+        for chunk_number, chunk in enumerate(self.m3u8.data["segments"]):
+            chunk_tuple_list.append((chunk_number, chunk))
+
+        if not self.include_intro:
+            chunk_tuple_list = [
+                chunk_tuple for chunk_tuple in chunk_tuple_list
+                if "img.aniwatch.me" not in chunk_tuple[1]["uri"]
+            ]
+
+        self.total_chunks = len(chunk_tuple_list)
+        if self.direct_write:
+            self.writer = self.open_writer(self.max_buffered_chunks)
+        self.progress_bar = None
+        if self.print_progress:
+            self.progress_bar = IncrementalBar("Downloading", max=self.total_chunks)
+            self.progress_bar.next(len(self.chunks_done))
+        self.__chunks_finished = len(self.chunks_done)
+        self.init_tracker()
+
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self.direct_write:
+            # Chunks wait on this before being requested so that the reorder buffer stays bounded.
+            self.__buffer_condition = asyncio.Condition()
+        owns_session = session is None
+        if owns_session:
+            session = aiohttp.ClientSession(
+                headers=dict(self.__network.userless_headers),
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency)
+            )
+        try:
+            await asyncio.gather(
+                *[
+                    self.download_chunk(session, semaphore, chunk_number, chunk_tuple, decrypter_provider)
+                    for chunk_number, chunk_tuple in enumerate(chunk_tuple_list)
+                    if chunk_number not in self.chunks_done
+                ]
+            )
+        finally:
+            if owns_session:
+                await session.close()
+            if self.writer:
+                self.writer.close()
+        if self.progress_bar:
+            self.progress_bar.finish()
+
+    async def download_chunk(self, session, semaphore, chunk_number, chunk_tuple, decrypter_provider):
+        chunk_downloader = ChunkDownloader(
+            self.__network,
+            chunk_tuple[1], # The segment data
+            get_chunk_path(self.file_name, chunk_number),
+            chunk_tuple[0], # The chunk number needed for decryption.
+            decrypter_provider,
+            self.headers,
+            self.decryption_pool,
+        )
+        try:
+            if self.writer:
+                async with self.__buffer_condition:
+                    await self.__buffer_condition.wait_for(lambda: self.writer.can_accept(chunk_number))
+            # Decrypting and writing to disk are blocking, they are handed off to the
+            # default executor so that they do not stall the other requests.
+            loop = asyncio.get_event_loop()
+            chunk = None
+            if self.m3u8.has_prefetched(chunk_tuple[1]["uri"]):
+                chunk = await loop.run_in_executor(None, self.m3u8.take_prefetched, chunk_tuple[1]["uri"])
+            if chunk is None:
+                async with semaphore:
+                    chunk = await self.fetch_chunk(session, chunk_tuple[1]["uri"])
+            if self.writer:
+                await loop.run_in_executor(None, self.write_chunk, chunk_downloader, chunk_number, chunk)
+                async with self.__buffer_condition:
+                    self.__buffer_condition.notify_all()
+            else:
+                size = await loop.run_in_executor(None, chunk_downloader.save, chunk)
+                self.progress_tracker.update_chunks_done(chunk_number, size)
+        except Exception as e:
+            if self.writer:
+                # The chunks after this one can never be written, wake up the ones waiting for them.
+                self.writer.abort(e)
+                async with self.__buffer_condition:
+                    self.__buffer_condition.notify_all()
+            raise e
+        # Every chunk finishes on the event loop's thread, so the count needs no lock.
+        self.__chunks_finished += 1
+        if self.progress_bar:
+            self.progress_bar.next()
+        if self.on_progress:
+            self.on_progress.__call__(self.__chunks_finished, self.total_chunks)
+
+    async def fetch_chunk(self, session, uri):
+        # Chunks go through the network's proxy pool like the requests made with Network.request,
+        # or else through the proxy that the network was created with.
+        proxy_pool = getattr(self.__network, "proxy_pool", None)
+        if proxy_pool is None:
+            proxies = getattr(self.__network, "proxies", None) or {}
+            proxy = proxies.get(urllib.parse.urlsplit(uri).scheme)
+            async with session.get(uri, headers=self.headers, proxy=proxy) as res:
+                res.raise_for_status()
+                return await res.read()
+        import aiohttp
+
+        timeout = aiohttp.ClientTimeout(total=proxy_pool.timeout)
+        attempts = min(3, len(proxy_pool))
+        tried = []
+        for attempt in range(attempts):
+            # Concurrent chunks are spread across the pool in proportion to the throughput of the proxies.
+            proxy = proxy_pool.stripe(exclude=tried)
+            tried.append(proxy)
+            start = time.monotonic()
+            try:
+                async with session.get(uri, headers=self.headers, proxy=proxy, timeout=timeout) as res:
+                    chunk = await res.read()
+            except Exception as e:
+                proxy_pool.report(proxy, time.monotonic() - start, False)
+                if attempt == attempts - 1:
+                    raise e
+                continue
+            finally:
+                proxy_pool.release(proxy)
+            banned = res.status in proxy_pool.ban_status_codes
+            proxy_pool.report(proxy, time.monotonic() - start, not banned, banned, len(chunk))
+            if not banned or attempt == attempts - 1:
+                res.raise_for_status()
+                return chunk
+
+    def write_chunk(self, chunk_downloader, position, chunk):
+        self.writer.write(position, chunk_downloader.process(chunk))
+
+class StreamDownloader(object):
+    """Downloads an episode ahead of playback and yields the decrypted chunks in their original
+    order, without writing anything to disk. Iterate over it to get the chunks, or pass them to
+    any file-like object with :meth:`write_to`. At most ``read_ahead`` chunks are downloaded or
+    held in memory ahead of the one that is yielded next.
+    """
+    def __init__(
+        self,
+        network,
+        m3u8,
+        headers = None,
+        max_threads: int = 8,
+        read_ahead: int = 16,
+        include_intro: bool = False,
+        max_retries: int = 3,
+        decryption_pool = None,
+    ):
+        """
+        :param network: The Sakurajima :class:`Network` object that is used to make network requests.
+        :type network: :class:`Network`
+        :param m3u8: The M3U8 data of the episode that is to be streamed.
+        :type m3u8: :class:`Playlist`
+        :param headers: The headers that are sent with every chunk request, defaults to None.
+        :type headers: dict, optional
+        :param max_threads: The maximum number of chunks that are downloaded at once, defaults to 8.
+        :type max_threads: int, optional
+        :param read_ahead: The maximum number of chunks that are downloaded ahead of the one that
+                           is yielded next, defaults to 16.
+        :type read_ahead: int, optional
+        :param include_intro: Whether to include the aniwatch intro, defaults to False.
+        :type include_intro: bool, optional
+        :param max_retries: The number of times a failed chunk is retried, defaults to 3.
+        :type max_retries: int, optional
+        :param decryption_pool: A :class:`DecryptionPool` that the chunks are decrypted in, defaults to None.
+                                If None, the chunks are decrypted on the downloading threads.
+        :type decryption_pool: :class:`DecryptionPool`, optional
+        """
+        self.__network = network
+        self.m3u8 = m3u8
+        self.headers = headers
+        self.read_ahead = max(read_ahead, 1)
+        self.max_threads = max(min(max_threads, self.read_ahead), 1)
+        self.include_intro = include_intro
+        self.max_retries = max_retries
+        self.decryption_pool = decryption_pool
+        self.total_chunks = None
+
+    def __iter__(self):
+        decrypter_provider = DecrypterProvider(self.__network, self.m3u8)
+        chunk_tuple_list = [
+            (chunk_number, chunk)
+            for chunk_number, chunk in enumerate(self.m3u8.data["segments"])
+            if self.include_intro or "img.aniwatch.me" not in chunk["uri"]
+        ]
+        self.total_chunks = len(chunk_tuple_list)
+        self.__network.sessions.resize("cdn", self.max_threads)
+        executor = ThreadPoolExecutor(max_workers=self.max_threads)
+        pending = deque()
+        try:
+            for chunk_number, chunk in chunk_tuple_list:
+                chunk_downloader = ChunkDownloader(
+                    self.__network, chunk, None, chunk_number, decrypter_provider, self.headers, self.decryption_pool
+                )
+                pending.append(executor.submit(self.fetch_chunk, chunk_downloader))
+                if len(pending) >= self.read_ahead:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Stops the read-ahead when the consumer stops iterating early or a chunk fails.
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def fetch_chunk(self, chunk_downloader):
+        attempt = 0
+        while True:
+            try:
+                return chunk_downloader.process(chunk_downloader.get())
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise e
+                time.sleep(attempt)
+
+    def write_to(self, file=None) -> int:
+        """Streams the episode into a file-like object, like an open file, a socket file or the
+        ``stdin`` of a :class:`subprocess.Popen`. The output is flushed after every chunk.
+
+        :param file: The binary file-like object to write to, defaults to None. If None, the
+                     episode is written to the standard output.
+        :return: The number of bytes written.
+        :rtype: int
         """
-        ChunkRemover(self.file_name, self.total_chunks).remove()
+        if file is None:
+            file = sys.stdout.buffer
+        written = 0
+        for chunk in self:
+            file.write(chunk)
+            file.flush()
+            written += len(chunk)
+        return written
+
 
 class _SegmentWrapper(object):
     # As the name suggests, this is only wrapper class introduced with a hope that it 
     # will lead to more readable code.
-    def __init__(self, network, segment, file_name, chunk_number, decrypter_provider):
+    def __init__(self, network, segment, file_name, chunk_number, decrypter_provider, position):
         self.network = network
         self.segment = segment
         self.file_name = file_name
         self.chunk_number = chunk_number
         self.decrypter_provider = decrypter_provider
+        self.position = position # The position of the chunk in the output file.
+
+
+def _is_rate_limited(exception):
+    response = getattr(exception, "response", None)
+    return getattr(response, "status_code", None) in (429, 503)
+
+
+def _resume_point(chunks_done):
+    # Returns the index of the first chunk that is missing from ``chunks_done`` and the
+    # combined size of the chunks before it.
+    start_index = 0
+    offset = 0
+    while start_index in chunks_done:
+        offset += chunks_done[start_index]
+        start_index += 1
+    return start_index, offset
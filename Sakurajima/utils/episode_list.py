@@ -1,14 +1,48 @@
+import calendar
+import datetime
+from bisect import bisect_left
 from Sakurajima.models import base_models as bm
 
 
 class EpisodeList(object):
     """An :class:`EpisodeList` is very similar to a normal list. You can do everything
-    with a :class:`EpisodeList` that you can with a normal list. The only difference is that 
-    an EpisodeList has some convinience methods that make selecting a particular episode easier. 
+    with a :class:`EpisodeList` that you can with a normal list. The only difference is that
+    an EpisodeList has some convinience methods that make selecting a particular episode easier.
+
+    An EpisodeList created with :meth:`from_rows` keeps the episode data as returned by the API
+    and only creates the :class:`Episode` objects of the episodes that are accessed. Lookups by
+    number, title and ID use indexes that are built the first time they are needed.
     """
     def __init__(self, episode_list):
         self.validate_list(episode_list)
-        self.__episode_list = episode_list
+        self.__rows = [None] * len(episode_list)
+        self.__episodes = list(episode_list)
+        self.__factory = None
+        self.__indexes = {}
+        self.__added_index = None
+
+    @classmethod
+    def from_rows(cls, rows, network, api_url, anime_id, anime_title=None):
+        """Creates an EpisodeList from the episode data returned by the API without creating any
+        :class:`Episode` objects up front.
+
+        :param rows: The episode data.
+        :type rows: list[dict]
+        :param network: The Sakurajima :class:`Network` object the episodes make their requests with.
+        :type network: :class:`Network`
+        :param api_url: The URL of the API.
+        :type api_url: str
+        :param anime_id: The ID of the anime the episodes belong to.
+        :type anime_id: int
+        :param anime_title: The title of the anime the episodes belong to, defaults to None.
+        :type anime_title: str, optional
+        :rtype: :class:`EpisodeList`
+        """
+        episode_list = cls([])
+        episode_list.__rows = list(rows)
+        episode_list.__episodes = [None] * len(episode_list.__rows)
+        episode_list.__factory = lambda row: bm.Episode(row, network, api_url, anime_id, anime_title)
+        return episode_list
 
     def validate_list(self, episode_list):
         for episode in episode_list:
@@ -19,8 +53,40 @@ class EpisodeList(object):
                     "EpisodeList only take in lists that contain only Episode objects"
                 )
 
+    def __episode(self, position):
+        episode = self.__episodes[position]
+        if episode is None:
+            episode = self.__episodes[position] = self.__factory(self.__rows[position])
+        return episode
+
+    def __value(self, position, field):
+        row = self.__rows[position]
+        if row is not None:
+            return row.get(field, None)
+        return getattr(self.__episodes[position], field)
+
+    def __index(self, field):
+        index = self.__indexes.get(field)
+        if index is None:
+            index = {}
+            for position in range(len(self)):
+                value = self.__value(position, field)
+                if value is not None:
+                    # Lookups return the first episode with the value, like a linear scan would.
+                    index.setdefault(value, position)
+            self.__indexes[field] = index
+        return index
+
+    def __lookup(self, field, value):
+        try:
+            position = self.__index(field).get(value)
+        except TypeError:
+            # Unhashable values can not match anything.
+            return None
+        return None if position is None else self.__episode(position)
+
     def get_episode_by_number(self, episode_number: int):
-        """Returns the first :class:`Episode` object from the list whose ``number`` attribue matches the 
+        """Returns the first :class:`Episode` object from the list whose ``number`` attribue matches the
         ``episode_number`` parameter.
 
         :param episode_number: The episode number that you want to find in the list.
@@ -28,60 +94,95 @@ class EpisodeList(object):
 
         :rtype: :class:`Episode`
         """
-        def check_episode_number(episode):
-            if episode.number == episode_number:
-                return True
-            else:
-                return False
-
-        result = None
-        for episode in self.__episode_list:
-            if check_episode_number(episode):
-                result = episode
-                break 
-        return result
+        return self.__lookup("number", episode_number)
 
     def get_episode_by_title(self, title: str):
-        """Returns the first :class:`Episode` object from the list whose ``title`` attribue matches the 
+        """Returns the first :class:`Episode` object from the list whose ``title`` attribue matches the
         ``title`` parameter.
 
         :param title: The title of the episode that you want to find.
         :type title: str
-        
-        :rtype: :class:`Episode`        
+
+        :rtype: :class:`Episode`
         """
-        def check_episode_title(episode):
-            if episode.title == title:
-                return True
-            else:
-                return False
+        return self.__lookup("title", title)
 
-        result = None
-        
-        for episode in self.__episode_list:
-            if check_episode_title(episode):
-                result = episode
-                break
-        return result
+    def get_episode_by_id(self, ep_id: int):
+        """Returns the :class:`Episode` object from the list whose ``ep_id`` attribute matches the
+        ``ep_id`` parameter.
+
+        :param ep_id: The ID of the episode that you want to find.
+        :type ep_id: int
+
+        :rtype: :class:`Episode`
+        """
+        return self.__lookup("ep_id", ep_id)
+
+    def get_episodes_added(self, since=None, until=None):
+        """Returns the episodes that were added in the given time range, oldest first.
+
+        :param since: Only episodes added at or after this time are returned, defaults to None.
+                      Either a UTC :class:`datetime.datetime` or a UNIX timestamp.
+        :type since: :class:`datetime.datetime`, optional
+        :param until: Only episodes added before this time are returned, defaults to None.
+        :type until: :class:`datetime.datetime`, optional
+
+        :rtype: :class:`EpisodeList`
+        """
+        if self.__added_index is None:
+            added = []
+            for position in range(len(self)):
+                value = self.__value(position, "added")
+                if isinstance(value, datetime.datetime):
+                    value = calendar.timegm(value.utctimetuple())
+                if value is not None:
+                    added.append((value, position))
+            added.sort()
+            self.__added_index = ([value for value, _ in added], [position for _, position in added])
+        keys, positions = self.__added_index
+        start = 0 if since is None else bisect_left(keys, _timestamp(since))
+        end = len(keys) if until is None else bisect_left(keys, _timestamp(until))
+        return self.__select(positions[start:end])
+
+    def __select(self, positions):
+        episode_list = EpisodeList([])
+        episode_list.__rows = [self.__rows[position] for position in positions]
+        episode_list.__episodes = [self.__episodes[position] for position in positions]
+        episode_list.__factory = self.__factory
+        return episode_list
 
     def last(self):
         """Returns the last :class:`Episode` object from the list.
 
         :rtype: :class:`Episode`
         """
-        return self.__episode_list[:-1]
-    
+        return self[-1]
+
     def __getitem__(self, position):
         if isinstance(position, int):
-            return self.__episode_list[position]
+            if position < 0:
+                position += len(self)
+            if not 0 <= position < len(self):
+                raise IndexError("EpisodeList index out of range")
+            return self.__episode(position)
         elif isinstance(position, slice):
-            return EpisodeList(self.__episode_list[position])
+            return self.__select(range(len(self))[position])
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self.__episode(position)
 
     def __len__(self):
-        return len(self.__episode_list)
+        return len(self.__episodes)
 
     def __reversed__(self):
         return self[::-1]
 
     def __repr__(self):
-        return f"EpisodeList({self.__episode_list})"
+        return f"EpisodeList({list(self)})"
+
+
+def _timestamp(value):
+    if isinstance(value, datetime.datetime):
+        return calendar.timegm(value.utctimetuple())
+    return value
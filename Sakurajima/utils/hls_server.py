@@ -0,0 +1,318 @@
+import time
+from threading import Thread, Lock
+from collections import OrderedDict
+from socketserver import ThreadingMixIn
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import Future, ThreadPoolExecutor
+from Sakurajima.utils.playlist import Playlist
+from Sakurajima.utils.downloader import ChunkDownloader
+from Sakurajima.utils.decrypter_provider import DecrypterProvider
+
+
+class _Stream(object):
+    # A playlist that is served, with everything needed to fetch and decrypt its segments.
+    def __init__(self, network, m3u8, headers, include_intro, decryption_pool):
+        self.network = network
+        self.m3u8 = m3u8
+        self.headers = headers
+        self.decryption_pool = decryption_pool
+        self.decrypter_provider = DecrypterProvider(network, m3u8)
+        self.chunk_numbers = [
+            chunk_number
+            for chunk_number, uri in enumerate(m3u8.uris)
+            if include_intro or "img.aniwatch.me" not in uri
+        ]
+        # The segments are served unencrypted under their position in the playlist, relative to it.
+        self.playlist = Playlist(
+            [f"{position}.ts" for position in range(len(self.chunk_numbers))],
+            [m3u8.durations[chunk_number] for chunk_number in self.chunk_numbers],
+            [-1] * len(self.chunk_numbers),
+            [],
+            target_duration=m3u8.target_duration,
+            is_endlist=True,
+            version=m3u8.version,
+        ).dumps().encode()
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        hls_server = self.server.hls_server
+        if len(parts) != 2 or not hls_server.has_stream(parts[0]):
+            self.send_error(404)
+            return
+        name, file_name = parts
+        if file_name == "playlist.m3u8":
+            self.__send(hls_server.get_playlist(name), "application/vnd.apple.mpegurl")
+        elif file_name.endswith(".ts") and file_name[:-3].isdigit():
+            try:
+                chunk = hls_server.get_segment(name, int(file_name[:-3]))
+            except IndexError:
+                self.send_error(404)
+                return
+            except Exception:
+                self.send_error(502, "The segment could not be fetched")
+                return
+            self.__send(chunk, "video/mp2t")
+        else:
+            self.send_error(404)
+
+    def __send(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class HLSServer(object):
+    """A local HTTP server that re-serves episodes to players on the same machine while they are
+    being downloaded. Every episode gets an unencrypted playlist whose segments are fetched,
+    decrypted and cached on demand, and the segments after the one a player asks for are
+    prefetched. All the players share the server's segment cache and the sessions of the
+    :class:`Network` the episodes were added with.
+
+    .. code-block:: python
+
+        with HLSServer() as server:
+            url = episode.serve("hd", server)
+            subprocess.run(["mpv", url])
+    """
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        max_threads: int = 8,
+        prefetch: int = 4,
+        cache_size: int = 32,
+        max_retries: int = 3,
+    ):
+        """
+        :param host: The address the server listens on, defaults to "127.0.0.1".
+        :type host: str, optional
+        :param port: The port the server listens on, defaults to 0, which picks a free port.
+        :type port: int, optional
+        :param max_threads: The maximum number of segments that are prefetched at once, defaults to 8.
+        :type max_threads: int, optional
+        :param prefetch: How many segments after the one that is requested are prefetched, defaults to 4.
+        :type prefetch: int, optional
+        :param cache_size: The maximum number of decrypted segments kept in memory, defaults to 32.
+        :type cache_size: int, optional
+        :param max_retries: The number of times a failed segment is retried, defaults to 3.
+        :type max_retries: int, optional
+        """
+        self.prefetch = prefetch
+        self.cache_size = max(cache_size, prefetch + 1)
+        self.max_retries = max_retries
+        self.__streams = {}
+        self.__cache = OrderedDict()
+        self.__pending = {}
+        self.__lock = Lock()
+        self.__executor = ThreadPoolExecutor(max_workers=max_threads)
+        self.__server = _ThreadingHTTPServer((host, port), _RequestHandler)
+        self.__server.hls_server = self
+        self.__thread = None
+
+    @property
+    def url(self) -> str:
+        """The URL of the server."""
+        host, port = self.__server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Starts serving requests on a background thread."""
+        if self.__thread is None:
+            self.__thread = Thread(target=self.__server.serve_forever, daemon=True)
+            self.__thread.start()
+        return self
+
+    def close(self):
+        """Stops the server and drops the cached segments."""
+        if self.__thread is not None:
+            self.__server.shutdown()
+            self.__thread = None
+        self.__server.server_close()
+        self.__executor.shutdown(wait=False)
+        with self.__lock:
+            self.__cache.clear()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_stream(
+        self,
+        name: str,
+        network,
+        m3u8,
+        headers: dict = None,
+        include_intro: bool = False,
+        decryption_pool=None,
+        replace: bool = False,
+    ) -> str:
+        """Starts serving a playlist. If a stream with the same name already serves the same
+        segments, it is kept along with its cached segments, so that several players can watch it.
+
+        :param name: The name of the stream, which is used in its URL.
+        :type name: str
+        :param network: The Sakurajima :class:`Network` object that the segments are fetched with.
+        :type network: :class:`Network`
+        :param m3u8: The playlist to serve.
+        :type m3u8: :class:`Playlist`
+        :param headers: The headers that are sent with every segment request, defaults to None.
+        :type headers: dict, optional
+        :param include_intro: Whether to include the aniwatch intro, defaults to False.
+        :type include_intro: bool, optional
+        :param decryption_pool: A :class:`DecryptionPool` that the segments are decrypted in, defaults to None.
+        :type decryption_pool: :class:`DecryptionPool`, optional
+        :param replace: Whether to replace an existing stream with the same name even if it serves
+                        the same segments, defaults to False.
+        :type replace: bool, optional
+        :return: The URL of the served playlist.
+        :rtype: str
+        """
+        stream = _Stream(network, m3u8, headers, include_intro, decryption_pool)
+        url = f"{self.url}/{name}/playlist.m3u8"
+        with self.__lock:
+            existing = self.__streams.get(name)
+            if (
+                not replace
+                and existing is not None
+                and existing.m3u8.uris == m3u8.uris
+                and existing.chunk_numbers == stream.chunk_numbers
+            ):
+                return url
+            self.__streams[name] = stream
+            # Segments of a previous stream with the same name must not be served for this one.
+            for key in [key for key in self.__cache if key[0] == name]:
+                del self.__cache[key]
+        return url
+
+    def remove_stream(self, name: str):
+        """Stops serving a playlist and drops its cached segments.
+
+        :param name: The name of the stream.
+        :type name: str
+        """
+        with self.__lock:
+            self.__streams.pop(name, None)
+            for key in [key for key in self.__cache if key[0] == name]:
+                del self.__cache[key]
+
+    def has_stream(self, name: str) -> bool:
+        with self.__lock:
+            return name in self.__streams
+
+    def get_playlist(self, name: str) -> bytes:
+        """Gets the rewritten playlist of a stream.
+
+        :param name: The name of the stream.
+        :type name: str
+        :rtype: bytes
+        """
+        with self.__lock:
+            return self.__streams[name].playlist
+
+    def get_segment(self, name: str, position: int) -> bytes:
+        """Gets a decrypted segment of a stream, fetching it if it is not cached, and prefetches
+        the segments after it.
+
+        :param name: The name of the stream.
+        :type name: str
+        :param position: The position of the segment in the served playlist.
+        :type position: int
+        :raises IndexError: If there is no segment at the position.
+        :rtype: bytes
+        """
+        with self.__lock:
+            total = len(self.__streams[name].chunk_numbers)
+        if not 0 <= position < total:
+            raise IndexError(f"The stream {name} has no segment {position}")
+        for ahead in range(position + 1, min(position + 1 + self.prefetch, total)):
+            with self.__lock:
+                queued = (name, ahead) in self.__cache or (name, ahead) in self.__pending
+            if not queued:
+                self.__executor.submit(self.__get, name, ahead)
+        return self.__get(name, position)
+
+    def __get(self, name, position):
+        # Every segment is only fetched once, however many players ask for it at the same time.
+        key = (name, position)
+        with self.__lock:
+            chunk = self.__cache.get(key)
+            if chunk is not None:
+                self.__cache.move_to_end(key)
+                return chunk
+            stream = self.__streams[name]
+            future = self.__pending.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.__pending[key] = future
+        if not leader:
+            return future.result()
+        try:
+            chunk = self.__fetch(stream, position)
+        except Exception as e:
+            with self.__lock:
+                del self.__pending[key]
+            future.set_exception(e)
+            raise e
+        with self.__lock:
+            if self.__streams.get(name) is stream:
+                self.__cache[key] = chunk
+                while len(self.__cache) > self.cache_size:
+                    self.__cache.popitem(last=False)
+            del self.__pending[key]
+        future.set_result(chunk)
+        return chunk
+
+    def __fetch(self, stream, position):
+        chunk_number = stream.chunk_numbers[position]
+        chunk_downloader = ChunkDownloader(
+            stream.network,
+            stream.m3u8.data["segments"][chunk_number],
+            None,
+            chunk_number,
+            stream.decrypter_provider,
+            stream.headers,
+            stream.decryption_pool,
+        )
+        attempt = 0
+        while True:
+            try:
+                return chunk_downloader.process(chunk_downloader.get())
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise e
+                time.sleep(attempt)
+
+    def __repr__(self):
+        return f"<HLSServer {self.url}>"
+
+
+_shared_server = None
+_shared_server_lock = Lock()
+
+
+def get_shared_server() -> HLSServer:
+    """Gets the :class:`HLSServer` that :meth:`Episode.serve` uses by default, starting it the
+    first time it is needed. It listens on a free port of 127.0.0.1.
+
+    :rtype: :class:`HLSServer`
+    """
+    global _shared_server
+    with _shared_server_lock:
+        if _shared_server is None:
+            _shared_server = HLSServer().start()
+        return _shared_server
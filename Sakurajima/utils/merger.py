@@ -1,6 +1,18 @@
 import shutil
-import subprocess
 import os
+from Sakurajima.utils.writer import FFmpegWriter
+
+
+def get_chunk_path(file_name, chunk_number):
+    """Returns the path of a downloaded chunk inside the ``chunks`` directory.
+
+    :param file_name: The file name prefix of the chunks.
+    :type file_name: str
+    :param chunk_number: The chunk number of the chunk.
+    :type chunk_number: int
+    :rtype: str
+    """
+    return os.path.join("chunks", f"{file_name}-{chunk_number}.chunk.ts")
 
 
 class ChunkMerger(object):
@@ -22,11 +34,9 @@ class ChunkMerger(object):
         """Starts the merger and creates a single file ``.mp4`` file.
         """
         with open(f"{self.file_name}.mp4", "wb") as merged_file:
-            for ts_file in [
-                open(f"chunks\/{self.file_name}-{chunk_number}.chunk.ts")
-                for chunk_number in range(self.total_chunks)
-            ]:
-                shutil.copyfileobj(ts_file, merged_file)
+            for chunk_number in range(self.total_chunks):
+                with open(get_chunk_path(self.file_name, chunk_number), "rb") as ts_file:
+                    shutil.copyfileobj(ts_file, merged_file)
 
 
 class FFmpegMerger(object):
@@ -39,17 +49,17 @@ class FFmpegMerger(object):
         self.total_chunks = total_chunks
 
     def merge(self):
-        """Starts the merger and creates a single file ``.mp4`` file.
+        """Starts the merger and creates a single file ``.mp4`` file. The chunks are fed to ``ffmpeg``
+        through a pipe, so there is no limit on their number.
         """
         print("Merging chunks into mp4.")
-        concat = '"concat'
-        for x in range(0, self.total_chunks):
-            if x == 0:
-                concat += f":chunks\/{self.file_name}-{x}.chunk.ts"
-            else:
-                concat += f"|chunks\/{self.file_name}-{x}.chunk.ts"
-        concat += '"'
-        subprocess.run(f'ffmpeg -i {concat} -c copy "{self.file_name}.mp4"')
+        writer = FFmpegWriter(f"{self.file_name}.mp4")
+        try:
+            for chunk_number in range(self.total_chunks):
+                with open(get_chunk_path(self.file_name, chunk_number), "rb") as ts_file:
+                    writer.write(chunk_number, ts_file.read())
+        finally:
+            writer.close()
 
 
 class ChunkRemover(object):
@@ -60,6 +70,6 @@ class ChunkRemover(object):
     def remove(self):
         for chunk_number in range(self.total_chunks):
             try:
-                os.remove(f"chunks\/{self.file_name}-{chunk_number}.chunk.ts")
+                os.remove(get_chunk_path(self.file_name, chunk_number))
             except FileNotFoundError:
                 pass
@@ -1,17 +1,217 @@
 from Sakurajima.utils.misc import Misc
+from Sakurajima.utils.rate_limiter import _shared_rate_limiter
+from Sakurajima.utils.response_cache import ResponseCache
+from concurrent.futures import Future
 from requests import Session
+from requests.adapters import HTTPAdapter
+from requests.cookies import RequestsCookieJar
+from requests.structures import CaseInsensitiveDict
+from threading import Lock, local
 import urllib.parse
+import time
+import copy
+
+
+class _SharedCookieJar(RequestsCookieJar):
+    # A cookie jar that the sessions of all the threads use at once. CookieJar already changes the
+    # cookies under _cookies_lock, reading them here takes the same lock.
+    def __iter__(self):
+        with self._cookies_lock:
+            return iter(list(super().__iter__()))
+
+
+class SessionPool(object):
+    """Hands out a separate ``requests`` session to every thread, while all the sessions share
+    the same cookie jar and the same connection pools, and keep their connections alive. There is one connection pool per host class: "api" for the API endpoint, "img" for
+    ``img.aniwatch.me`` and "cdn" for every other host, which is where the stream segments are on.
+    """
+    DEFAULT_POOL_SIZES = {"api": 4, "img": 4, "cdn": 16}
+    IMG_URL = "https://img.aniwatch.me"
+
+    def __init__(self, api_url: str, pool_sizes: dict = None):
+        """
+        :param api_url: The URL of the API endpoint.
+        :type api_url: str
+        :param pool_sizes: The number of connections kept alive per host for each host class,
+                           defaults to None. Missing host classes use :attr:`DEFAULT_POOL_SIZES`.
+        :type pool_sizes: dict, optional
+        """
+        parsed = urllib.parse.urlsplit(api_url)
+        self.api_url = f"{parsed.scheme}://{parsed.netloc}"
+        self.pool_sizes = dict(self.DEFAULT_POOL_SIZES)
+        self.pool_sizes.update(pool_sizes or {})
+        self.__adapters = {host_class: self.__create_adapter(size) for host_class, size in self.pool_sizes.items()}
+        self.__profiles = {}
+        self.__generation = 0
+        self.__local = local()
+        self.__lock = Lock()
+
+    def add_profile(self, name: str, headers, cookies=None, proxies=None):
+        """Registers a kind of session. Every thread gets its own session for each profile. The
+        headers and the cookies are shared by the sessions of all the threads, so a cookie that
+        the server sets in one thread is sent by all of them.
+
+        :param name: The name of the profile.
+        :type name: str
+        :param headers: The headers sent with every request.
+        :type headers: :class:`CaseInsensitiveDict`
+        :param cookies: The cookie jar of the sessions, defaults to None. It has to be safe to use
+                        from several threads at once, like the :attr:`Network.cookies`.
+        :type cookies: :class:`RequestsCookieJar`, optional
+        :param proxies: The proxies the sessions use, defaults to None.
+        :type proxies: dict, optional
+        """
+        self.__profiles[name] = (headers, cookies, proxies)
+
+    def get(self, name: str) -> Session:
+        """Gets the calling thread's session for the given profile, creating it if needed.
+
+        :param name: The name of the profile.
+        :type name: str
+        :rtype: :class:`Session`
+        """
+        sessions = getattr(self.__local, "sessions", None)
+        if sessions is None:
+            sessions = self.__local.sessions = {}
+        entry = sessions.get(name)
+        if entry is None:
+            headers, cookies, proxies = self.__profiles[name]
+            session = Session()
+            session.headers = headers
+            if cookies is not None:
+                session.cookies = cookies
+            if proxies:
+                session.proxies = proxies
+            entry = sessions[name] = [session, None]
+        if entry[1] != self.__generation:
+            # The connection pools were resized since the session was last used.
+            with self.__lock:
+                self.__mount(entry[0])
+                entry[1] = self.__generation
+        return entry[0]
+
+    def reset(self, name: str):
+        """Discards the calling thread's session for the given profile, the next call to :meth:`get`
+        creates a new one. The shared connection pools are left alone.
+
+        :param name: The name of the profile.
+        :type name: str
+        """
+        sessions = getattr(self.__local, "sessions", {})
+        sessions.pop(name, None)
+
+    def resize(self, host_class: str, size: int):
+        """Makes sure the connection pool of a host class keeps at least ``size`` connections
+        alive per host. Downloaders call this with their concurrency so that none of their
+        connections get thrown away. Pools are never shrunk.
+
+        :param host_class: One of "api", "img" or "cdn".
+        :type host_class: str
+        :param size: The number of connections.
+        :type size: int
+        """
+        with self.__lock:
+            if size <= self.pool_sizes[host_class]:
+                return
+            self.pool_sizes[host_class] = size
+            # The old adapter is not closed as requests may still be in flight on it.
+            self.__adapters[host_class] = self.__create_adapter(size)
+            self.__generation += 1
+
+    def close(self):
+        """Closes all the kept alive connections."""
+        with self.__lock:
+            for adapter in self.__adapters.values():
+                adapter.close()
+
+    def __create_adapter(self, size):
+        return HTTPAdapter(pool_maxsize=size)
+
+    def __mount(self, session):
+        session.mount("http://", self.__adapters["cdn"])
+        session.mount("https://", self.__adapters["cdn"])
+        session.mount(self.IMG_URL, self.__adapters["img"])
+        session.mount(self.api_url, self.__adapters["api"])
+
+    def __repr__(self):
+        return f"<SessionPool {self.pool_sizes}>"
+
+
+class RequestCoalescer(object):
+    """Makes sure that only one of several identical requests that are in flight at the same time
+    is actually sent. The callers that ask while it is in flight wait for it and get a copy of
+    its result, or the exception it raised.
+    """
+    def __init__(self):
+        self.__pending = {}
+        self.__lock = Lock()
+
+    def do(self, key, call):
+        """Calls ``call`` unless a call with the same key is already in flight, in which case
+        its result is waited for instead.
+
+        :param key: The key identifying the request.
+        :type key: str
+        :param call: A function that takes no arguments and makes the request.
+        :type call: ``function``
+        :return: The result of the call.
+        """
+        with self.__lock:
+            future = self.__pending.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.__pending[key] = future
+        if not leader:
+            # Every caller gets its own copy so that they cannot change each other's results.
+            return copy.deepcopy(future.result())
+        try:
+            result = call()
+        except BaseException as e:
+            # Also on KeyboardInterrupt and the like, or the callers waiting for it would hang.
+            future.set_exception(e)
+            raise e
+        else:
+            future.set_result(result)
+        finally:
+            with self.__lock:
+                del self.__pending[key]
+        return result
+
+    @property
+    def in_flight(self):
+        """The number of distinct requests currently in flight."""
+        return len(self.__pending)
+
 
 class Network:
-    def __init__(self, username: str, user_id: str, auth_token: str, proxies, endpoint):
+    COALESCED_ACTIONS = set(ResponseCache.DEFAULT_TTLS) | {"Anime.watchAnime"}
+    """The "Controller.action" keys of the API actions whose identical concurrent requests are coalesced."""
+
+    def __init__(
+        self, username: str, user_id: str, auth_token: str, proxies, endpoint, proxy_pool=None, pool_sizes=None,
+        rate_limiter=None, response_cache=None
+    ):
         self.API_URL = endpoint
-        self.session = Session() 
-        # This session will have all the details that are required to access the API
-        self.userless_session = Session()
-        # This session will only have "USER-AGENT" and "REFERER" 
-        self.session.proxies = proxies
-        self.headers = self.session.headers  # Expose session headers
-        self.cookies = self.session.cookies  # Expose session cookies
+        # The fixed proxies of the user session, in the format that ``requests`` expects.
+        self.proxies = proxies
+        # When a proxy pool is set, every request made with the user session is routed
+        # through the healthiest proxy in the pool instead of the fixed ``proxies``.
+        self.proxy_pool = proxy_pool
+        # When a response cache is set, read-only API actions are answered from it while they are fresh.
+        self.response_cache = response_cache
+        self.coalescer = RequestCoalescer()
+        # Every request made with the user session waits on the limiter, which is shared by
+        # the whole process unless a different one is passed in.
+        self.rate_limiter = rate_limiter or _shared_rate_limiter
+        self.sessions = SessionPool(endpoint, pool_sizes)
+        # Every thread gets its own "user" session, which has all the details that are required
+        # to access the API, and "userless" session, which only has "USER-AGENT" and "REFERER".
+        self.headers = CaseInsensitiveDict()  # Expose session headers
+        self.cookies = _SharedCookieJar()  # Expose session cookies
+        self.userless_headers = CaseInsensitiveDict()
+        self.sessions.add_profile("user", self.headers, self.cookies, proxies)
+        self.sessions.add_profile("userless", self.userless_headers)
         self.xsrf_token = Misc().generate_xsrf_token()
         if username is not None and user_id is not None and user_id is not None:
             session_token = f'{{"userid":{user_id},"username":{username},"usergroup":4,"player_lang":1,"player_quality":0,"player_time_left_side":2,"player_time_right_side":3,"screen_orientation":1,"nsfw":1,"chrLogging":1,"mask_episode_info":0,"blur_thumbnails":0,"autoplay":1,"preview_thumbnails":1,"update_watchlist":1,"update_watchlist_notification":1,"playheads":1,"hide_chat":0,"seek_time":5,"update_watchlist_percentage":80,"use_24h_clock":0,"use_light_intro":0,"cover":null,"title":"Member","premium":1,"lang":"en-US","auth":{auth_token},"remember_login":true}}'
@@ -32,9 +232,9 @@ class Network:
             "XSRF-TOKEN": self.xsrf_token
         }
 
-        self.session.headers.update(headers)
-        self.session.cookies.update(cookies)
-        self.userless_session.headers.update(
+        self.headers.update(headers)
+        self.cookies.update(cookies)
+        self.userless_headers.update(
             {
                 "USER-AGENT": headers["USER-AGENT"],
                 "ORIGIN": headers["ORIGIN"],
@@ -44,24 +244,89 @@ class Network:
     def __repr__(self):
         return "<Network>"
 
-    def post(self, data, headers):
+    @property
+    def session(self):
+        """The calling thread's session with the user details."""
+        return self.sessions.get("user")
+
+    @property
+    def userless_session(self):
+        """The calling thread's session without the user details."""
+        return self.sessions.get("userless")
+
+    def post(self, data, headers = None):
+        if isinstance(headers, str):
+            # Some calls only pass the path of the page the request is made from.
+            headers = {"X-PATH": headers, "REFERER": f"https://aniwatch.me{headers}"}
+        cache = self.response_cache
+        if cache is not None and cache.is_cacheable(data):
+            json = cache.get(data)
+            if json is not None:
+                return json
+        if ResponseCache.get_action(data) in self.COALESCED_ACTIONS:
+            # The same read-only request made by several threads at once is only sent once.
+            return self.coalescer.do(ResponseCache.get_key(data), lambda: self.__post(data, headers))
+        return self.__post(data, headers)
+
+    def __post(self, data, headers):
+        self.rate_limiter.acquire(data.get("controller"), data.get("action"))
         try:
-            res = self.session.post(self.API_URL, json=data, headers = headers)
-            return res.json()
+            res = self.request(self.session, "POST", self.API_URL, json=data, headers = headers)
+            json = res.json()
+            if self.response_cache is not None:
+                self.response_cache.set(data, json)
+            return json
         except Exception as e:
-            self.session.close()
+            self.sessions.reset("user")
             raise e
 
-    def get_with_user_session(self, uri, headers):
+    def get_with_user_session(self, uri, headers = None):
+        self.rate_limiter.acquire()
         try:
-            res = self.session.get(uri, headers = headers)
+            res = self.request(self.session, "GET", uri, headers = headers)
             return res
         except Exception as e:
-            self.session.close()
+            self.sessions.reset("user")
             raise e
 
-    def get(self, uri, headers = None):
+    def request(self, session, method, uri, stripe = False, **kwargs):
+        """Makes a request with the given session. If the network has a proxy pool, the request
+        goes through the best proxy in the pool, and is retried through another proxy if the
+        proxy fails or turns out to be banned. If ``stripe`` is True, the proxy is picked with
+        :meth:`ProxyPool.stripe` instead, so that concurrent requests are spread across the pool.
+        """
+        if self.proxy_pool is None:
+            return session.request(method, uri, **kwargs)
+        kwargs.setdefault("timeout", self.proxy_pool.timeout)
+        attempts = min(3, len(self.proxy_pool))
+        tried = []
+        for attempt in range(attempts):
+            if stripe:
+                proxy = self.proxy_pool.stripe(exclude = tried)
+            else:
+                proxy = self.proxy_pool.choose(exclude = tried)
+            tried.append(proxy)
+            start = time.monotonic()
+            try:
+                res = session.request(method, uri, proxies=self.proxy_pool.as_requests_proxies(proxy), **kwargs)
+            except Exception as e:
+                self.proxy_pool.report(proxy, time.monotonic() - start, False)
+                if attempt == attempts - 1:
+                    raise e
+                continue
+            finally:
+                if stripe:
+                    self.proxy_pool.release(proxy)
+            banned = self.proxy_pool.is_ban(res)
+            self.proxy_pool.report(proxy, time.monotonic() - start, not banned, banned, len(res.content))
+            if not banned or attempt == attempts - 1:
+                return res
+
+    def get(self, uri, headers = None, stripe = False):
         try:
+            if stripe and self.proxy_pool is not None:
+                # Striped requests are spread across every proxy in the pool.
+                return self.request(self.userless_session, "GET", uri, stripe = True, headers = headers)
             res = self.userless_session.get(uri, headers = headers)
             return res
         except Exception as e:
@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PageIterator(object):
+    """Iterates over the items of a paginated endpoint one by one, fetching the pages as they are
+    needed. While the items of a page are being consumed, the next page is already fetched in the
+    background. Iteration stops at the first empty page. Only two pages are held in memory at once.
+
+    The :attr:`cursor` of an iterator can be passed to a new one to pick up where it left off.
+    """
+    def __init__(self, fetch_page, cursor: tuple = None, prefetch: bool = True):
+        """
+        :param fetch_page: A function that takes a page number and returns the list of items on that page.
+        :type fetch_page: ``function``
+        :param cursor: The ``(page, offset)`` to start at, defaults to None. If None, the iteration
+                       starts at the first item of page 1.
+        :type cursor: tuple, optional
+        :param prefetch: Whether to fetch the next page in the background, defaults to True.
+        :type prefetch: bool, optional
+        """
+        self.fetch_page = fetch_page
+        self.prefetch = prefetch
+        self.page, self.offset = cursor or (1, 0)
+        self.__items = None
+        self.__pending = None
+        self.__pending_page = None
+        self.__executor = None
+        self.__done = False
+
+    @property
+    def cursor(self) -> tuple:
+        """The ``(page, offset)`` of the next item."""
+        return (self.page, self.offset)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.__done:
+            raise StopIteration
+        while self.__items is None or self.offset >= len(self.__items):
+            if self.__items is not None:
+                # The current page has been consumed.
+                self.page += 1
+                self.offset = 0
+            try:
+                self.__items = self.__get(self.page)
+            except Exception as e:
+                self.__items = None
+                raise e
+            if not self.__items:
+                self.close()
+                raise StopIteration
+            self.__prefetch(self.page + 1)
+        item = self.__items[self.offset]
+        self.offset += 1
+        return item
+
+    def __get(self, page):
+        if self.__pending is not None and self.__pending_page == page:
+            pending = self.__pending
+            self.__pending = None
+            return pending.result()
+        return self.fetch_page(page)
+
+    def __prefetch(self, page):
+        if not self.prefetch:
+            return
+        if self.__executor is None:
+            self.__executor = ThreadPoolExecutor(max_workers=1)
+        self.__pending = self.__executor.submit(self.fetch_page, page)
+        self.__pending_page = page
+
+    def close(self):
+        """Stops the iteration and the background fetching."""
+        self.__done = True
+        if self.__pending is not None:
+            self.__pending.cancel()
+            self.__pending = None
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
+            self.__executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return f"<PageIterator page={self.page} offset={self.offset}>"
@@ -0,0 +1,386 @@
+import re
+import time
+from array import array
+from bisect import bisect_right
+from threading import Lock
+from urllib.parse import urlsplit, parse_qsl
+from concurrent.futures import Future
+
+_ATTRIBUTE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+_QUOTED_KEY_ATTRIBUTES = ("uri", "keyformat", "keyformatversions")
+_EXPIRY_PARAMETERS = ("expires", "expire", "expiry", "exp", "e")
+
+
+def _parse_attributes(value: str) -> dict:
+    # Parses an attribute list like METHOD=AES-128,URI="...",IV=0x... into a dict with the names
+    # lowercased, the same way the m3u8 library names them.
+    return {name.replace("-", "_").lower(): value.strip('"') for name, value in _ATTRIBUTE.findall(value)}
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+class Playlist(object):
+    """An HLS media playlist, parsed by :meth:`loads`. Only the parts of the format that the
+    aniwatch.me playlists use are understood: segment URIs, their durations, the keys they are
+    encrypted with and the media sequence number. Every other tag is ignored.
+
+    The segments are kept in a compact table of parallel arrays instead of a dict per segment.
+    :attr:`data` and :meth:`dumps` present the playlist the same way an ``m3u8.M3U8`` object
+    does, so a Playlist can be passed to all the downloaders.
+    """
+    def __init__(
+        self,
+        uris: list,
+        durations,
+        key_indexes,
+        keys: list,
+        media_sequence: int = 0,
+        target_duration: int = None,
+        is_endlist: bool = False,
+        version: int = None,
+    ):
+        """
+        :param uris: The URI of every segment.
+        :type uris: list[str]
+        :param durations: The duration of every segment in seconds.
+        :type durations: list[float]
+        :param key_indexes: The index in ``keys`` of the key of every segment, or -1 if it is not encrypted.
+        :type key_indexes: list[int]
+        :param keys: The attributes of the EXT-X-KEY tags, named like "method", "uri" and "iv".
+        :type keys: list[dict]
+        :param media_sequence: The media sequence number of the first segment, defaults to 0.
+        :type media_sequence: int, optional
+        :param target_duration: The target duration of the playlist, defaults to None.
+        :type target_duration: int, optional
+        :param is_endlist: Whether the playlist has an EXT-X-ENDLIST tag, defaults to False.
+        :type is_endlist: bool, optional
+        :param version: The version of the playlist, defaults to None.
+        :type version: int, optional
+        """
+        self.uris = uris
+        self.durations = array("d", durations)
+        self.key_indexes = array("i", key_indexes)
+        self.keys = keys
+        self.media_sequence = media_sequence
+        self.target_duration = target_duration
+        self.is_endlist = is_endlist
+        self.version = version
+        self.starts = array("d", [0.0])
+        """The start time of every segment in seconds, followed by the duration of the playlist."""
+        for duration in self.durations:
+            self.starts.append(self.starts[-1] + duration)
+        self.__data = None
+        self.__prefetched = {}
+
+    @classmethod
+    def loads(cls, lines):
+        """Parses a media playlist.
+
+        :param lines: The text of the playlist, or an iterable of its lines, like
+                      ``response.iter_lines(decode_unicode=True)``.
+        :type lines: str
+        :raises ValueError: If the text is not an HLS playlist.
+        :rtype: :class:`Playlist`
+        """
+        if isinstance(lines, str):
+            lines = lines.splitlines()
+        uris = []
+        durations = []
+        key_indexes = []
+        keys = []
+        key_positions = {}
+        key_index = -1
+        duration = 0.0
+        media_sequence = 0
+        target_duration = None
+        is_endlist = False
+        version = None
+        header = False
+        for line in lines:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            line = line.strip()
+            if not line:
+                continue
+            if not header:
+                if not line.startswith("#EXTM3U"):
+                    raise ValueError("The text is not an HLS playlist, it does not start with #EXTM3U")
+                header = True
+            elif line[0] != "#":
+                uris.append(line)
+                durations.append(duration)
+                key_indexes.append(key_index)
+                duration = 0.0
+            elif line.startswith("#EXTINF:"):
+                duration = float(line[8:].split(",", 1)[0])
+            elif line.startswith("#EXT-X-KEY:"):
+                attributes = _parse_attributes(line[11:])
+                if attributes.get("method", "NONE") == "NONE":
+                    key_index = -1
+                else:
+                    # Segments that share a key share its attributes too.
+                    identity = tuple(sorted(attributes.items()))
+                    key_index = key_positions.get(identity)
+                    if key_index is None:
+                        key_index = key_positions[identity] = len(keys)
+                        keys.append(attributes)
+            elif line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+                media_sequence = int(line[22:])
+            elif line.startswith("#EXT-X-TARGETDURATION:"):
+                target_duration = int(float(line[22:]))
+            elif line.startswith("#EXT-X-VERSION:"):
+                version = int(line[15:])
+            elif line.startswith("#EXT-X-ENDLIST"):
+                is_endlist = True
+        if not header:
+            raise ValueError("The text is not an HLS playlist, it is empty")
+        return cls(uris, durations, key_indexes, keys, media_sequence, target_duration, is_endlist, version)
+
+    def __len__(self):
+        return len(self.uris)
+
+    @property
+    def duration(self) -> float:
+        """The duration of the playlist in seconds."""
+        return self.starts[-1]
+
+    def get_key(self, index: int) -> dict:
+        """Gets the attributes of the key a segment is encrypted with.
+
+        :param index: The position of the segment in the playlist.
+        :type index: int
+        :return: The attributes of the key, or None if the segment is not encrypted.
+        :rtype: dict
+        """
+        key_index = self.key_indexes[index]
+        return None if key_index < 0 else self.keys[key_index]
+
+    def get_segment_at(self, seconds: float) -> int:
+        """Finds the segment that plays at the given time.
+
+        :param seconds: The time from the start of the playlist in seconds.
+        :type seconds: float
+        :return: The position of the segment in the playlist.
+        :rtype: int
+        """
+        return min(max(bisect_right(self.starts, seconds) - 1, 0), max(len(self) - 1, 0))
+
+    def get_first_segment(self, include_intro: bool = False) -> int:
+        """Finds the first segment that a download starts with.
+
+        :param include_intro: Whether the intro segments, which are served from ``img.aniwatch.me``,
+                              are downloaded, defaults to False.
+        :type include_intro: bool, optional
+        :return: The position of the segment in the playlist, or None if there is none.
+        :rtype: int
+        """
+        for index, uri in enumerate(self.uris):
+            if include_intro or "img.aniwatch.me" not in uri:
+                return index
+        return None
+
+    def add_prefetched(self, uri: str, future):
+        """Registers a segment that is being fetched ahead of the download, see :meth:`take_prefetched`.
+
+        :param uri: The URI of the segment.
+        :type uri: str
+        :param future: The future that the raw bytes of the segment are set on.
+        :type future: :class:`concurrent.futures.Future`
+        """
+        self.__prefetched[uri] = future
+
+    def has_prefetched(self, uri: str) -> bool:
+        """Checks if a segment was fetched ahead of the download and has not been taken yet.
+
+        :param uri: The URI of the segment.
+        :type uri: str
+        :rtype: bool
+        """
+        return uri in self.__prefetched
+
+    def take_prefetched(self, uri: str) -> bytes:
+        """Takes a segment that was fetched ahead of the download, waiting for it if it is still
+        being fetched. Every prefetched segment can only be taken once.
+
+        :param uri: The URI of the segment.
+        :type uri: str
+        :return: The raw bytes of the segment, or None if it was not prefetched or the fetch failed.
+        :rtype: bytes
+        """
+        future = self.__prefetched.pop(uri, None)
+        if future is None or future.exception() is not None:
+            return None
+        return future.result()
+
+    @property
+    def data(self) -> dict:
+        """The playlist in the form of ``m3u8.M3U8.data``. The segments are dicts with a "uri",
+        "duration" and "key" and are only created the first time this is accessed. Like in
+        ``m3u8``, "keys" has a None in it, where the first unencrypted segment appears, if there
+        are any unencrypted segments. For an aniwatch.me playlist it is ``[None, key]``, the
+        None standing for the intro.
+        """
+        if self.__data is None:
+            keys = list(self.keys)
+            for index, key_index in enumerate(self.key_indexes):
+                if key_index < 0:
+                    keys.insert(max(self.key_indexes[:index], default=-1) + 1, None)
+                    break
+            self.__data = {
+                "media_sequence": self.media_sequence,
+                "targetduration": self.target_duration,
+                "is_endlist": self.is_endlist,
+                "version": self.version,
+                "keys": keys,
+                "segments": [
+                    {"uri": uri, "duration": duration, "key": self.get_key(index)}
+                    for index, (uri, duration) in enumerate(zip(self.uris, self.durations))
+                ],
+            }
+        return self.__data
+
+    def dumps(self) -> str:
+        """Serializes the playlist.
+
+        :rtype: str
+        """
+        lines = ["#EXTM3U"]
+        if self.version is not None:
+            lines.append(f"#EXT-X-VERSION:{self.version}")
+        if self.target_duration is not None:
+            lines.append(f"#EXT-X-TARGETDURATION:{self.target_duration}")
+        lines.append(f"#EXT-X-MEDIA-SEQUENCE:{self.media_sequence}")
+        key_index = -1
+        for index, uri in enumerate(self.uris):
+            if self.key_indexes[index] != key_index:
+                key_index = self.key_indexes[index]
+                lines.append(self.__dump_key(self.get_key(index)))
+            lines.append(f"#EXTINF:{_number(self.durations[index])},")
+            lines.append(uri)
+        if self.is_endlist:
+            lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def __dump_key(key):
+        if key is None:
+            return "#EXT-X-KEY:METHOD=NONE"
+        attributes = []
+        for name, value in key.items():
+            if name in _QUOTED_KEY_ATTRIBUTES:
+                value = f'"{value}"'
+            attributes.append(f"{name.upper().replace('_', '-')}={value}")
+        return "#EXT-X-KEY:" + ",".join(attributes)
+
+    def __repr__(self):
+        return f"<Playlist {len(self)} segments, {self.duration:.1f}s>"
+
+
+def get_url_expiry(uri: str) -> float:
+    """Gets the time a signed URL expires at from its query string.
+
+    :param uri: The URL.
+    :type uri: str
+    :return: The UNIX timestamp of the expiry, or None if the URL does not carry one.
+    :rtype: float
+    """
+    for name, value in parse_qsl(urlsplit(uri).query):
+        # Only values that look like a UNIX timestamp count, so unrelated parameters are ignored.
+        if name.lower() in _EXPIRY_PARAMETERS and value.isdigit() and int(value) > 1000000000:
+            return float(value)
+    return None
+
+
+class PlaylistCache(object):
+    """A thread-safe cache of the playlists of episodes, keyed by the episode ID and the quality.
+    Playlists are kept until shortly before the signed URLs of their segments expire, or for
+    ``ttl`` seconds if the URLs do not say when they expire. When several threads ask for a
+    playlist that is not cached yet, the handshake is only made once and every caller gets the
+    same result. By default a single cache is shared by every :class:`Episode` in the process.
+    """
+    def __init__(self, ttl: float = 30 * 60, margin: float = 60):
+        """
+        :param ttl: The number of seconds a playlist is kept for if its URLs do not expire,
+                    defaults to 30 minutes.
+        :type ttl: float, optional
+        :param margin: How many seconds before its URLs expire a playlist is fetched again, defaults to 60.
+        :type margin: float, optional
+        """
+        self.ttl = ttl
+        self.margin = margin
+        self.__playlists = {}
+        self.__pending = {}
+        self.__lock = Lock()
+
+    def get_expiry(self, playlist: Playlist, uri: str = None) -> float:
+        """Gets the time until which a playlist can be used.
+
+        :param playlist: The playlist.
+        :type playlist: :class:`Playlist`
+        :param uri: The URL the playlist was fetched from, defaults to None.
+        :type uri: str, optional
+        :return: A UNIX timestamp.
+        :rtype: float
+        """
+        expiry = time.time() + self.ttl
+        for signed_uri in (uri, playlist.uris[0] if len(playlist) else None):
+            url_expiry = get_url_expiry(signed_uri) if signed_uri else None
+            if url_expiry is not None:
+                expiry = min(expiry, url_expiry - self.margin)
+        return expiry
+
+    def get(self, ep_id: int, quality: str, fetch) -> Playlist:
+        """Gets the playlist of an episode, calling ``fetch`` to get it if it is not cached or has expired.
+
+        :param ep_id: The ID of the episode.
+        :type ep_id: int
+        :param quality: The quality of the playlist.
+        :type quality: str
+        :param fetch: A function that takes no arguments and returns the playlist and the URL it
+                      was fetched from.
+        :type fetch: ``function``
+        :rtype: :class:`Playlist`
+        """
+        key = (ep_id, quality)
+        with self.__lock:
+            entry = self.__playlists.get(key)
+            if entry is not None and entry[1] > time.time():
+                return entry[0]
+            future = self.__pending.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.__pending[key] = future
+        if not leader:
+            return future.result()
+        try:
+            playlist, uri = fetch()
+            expiry = self.get_expiry(playlist, uri)
+        except Exception as e:
+            with self.__lock:
+                del self.__pending[key]
+            future.set_exception(e)
+            raise e
+        with self.__lock:
+            self.__playlists[key] = (playlist, expiry)
+            del self.__pending[key]
+        future.set_result(playlist)
+        return playlist
+
+    def invalidate(self, ep_id: int = None, quality: str = None):
+        """Removes playlists from the cache.
+
+        :param ep_id: Removes the playlists of this episode, defaults to None. If None, every playlist is removed.
+        :type ep_id: int, optional
+        :param quality: Only removes the playlist of this quality, defaults to None.
+        :type quality: str, optional
+        """
+        with self.__lock:
+            for key in list(self.__playlists):
+                if (ep_id is None or key[0] == ep_id) and (quality is None or key[1] == quality):
+                    del self.__playlists[key]
+
+
+_shared_playlist_cache = PlaylistCache()
@@ -1,39 +1,99 @@
 import pickle
+import struct
 import os
+from threading import Lock
 
 
 class ProgressTracker(object):
+    """Keeps track of the chunks of an episode that have been downloaded so that an
+    interrupted download can be resumed. Finished chunks are recorded in an append-only
+    journal that holds one fixed-size record per chunk, a record that was only partially
+    written when the process died is ignored when the journal is read back.
+    """
+    RECORD = struct.Struct("<IQ")
+    """The layout of a journal record, the chunk number followed by the size of the chunk in bytes."""
+
     def __init__(self, episode_id):
         self.resume_data = None
         self.chunks_done = []
         self.episode_id = episode_id
+        self.directory = os.path.join("chunks", f".temp-{episode_id}")
+        self.resume_data_path = os.path.join(self.directory, ".resume_data")
+        self.journal_path = os.path.join(self.directory, ".journal")
+        self.__journal = None
+        self.__lock = Lock()
         try:
-            os.makedirs(f"chunks\/.temp-{episode_id}")
+            os.makedirs(self.directory)
         except FileExistsError:
             pass
-        
-    def init_tracker(self, resume_data):
-        with open(f"chunks\/.temp-{self.episode_id}\/.resume_data", "wb") as resume_data_file:
+
+    def init_tracker(self, resume_data, resume: bool = False):
+        """Saves the data required to resume the download and opens the journal.
+
+        :param resume_data: The data required to resume the download.
+        :type resume_data: dict
+        :param resume: Whether to keep the chunks that are already recorded in the journal,
+                       defaults to False. If False the journal is cleared.
+        :type resume: bool, optional
+        """
+        self.resume_data = resume_data
+        temp_path = f"{self.resume_data_path}.tmp"
+        with open(temp_path, "wb") as resume_data_file:
             pickle.dump(resume_data, resume_data_file)
-        with open(f"chunks\/.temp-{self.episode_id}\/.chunks_done", "wb") as chunks_done_file:
-            pickle.dump(self.chunks_done, chunks_done_file)
+        os.replace(temp_path, self.resume_data_path)
+        if self.__journal:
+            self.__journal.close()
+        # The journal is unbuffered so that every record is handed to the OS as soon as it is written.
+        self.__journal = open(self.journal_path, "ab" if resume else "wb", buffering=0)
+
+    def update_chunks_done(self, chunk_done: int, size: int = 0):
+        """Records a finished chunk in the journal.
+
+        :param chunk_done: The chunk number of the finished chunk.
+        :type chunk_done: int
+        :param size: The size of the finished chunk in bytes, defaults to 0.
+        :type size: int, optional
+        """
+        with self.__lock:
+            self.chunks_done.append(chunk_done)
+            self.__journal.write(self.RECORD.pack(chunk_done, size))
 
-    def update_chunks_done(self, chunk_done: int):
-        self.chunks_done.append(chunk_done)
-        with open(f"chunks\/.temp-{self.episode_id}\/.chunks_done", "wb") as chunks_done_file:
-            pickle.dump(self.chunks_done, chunks_done_file)
+    def read_journal(self):
+        """Reads the chunks recorded in the journal.
+
+        :return: A dictionary that maps the chunk numbers of the finished chunks to their size.
+        :rtype: dict
+        """
+        chunks_done = {}
+        try:
+            with open(self.journal_path, "rb") as journal:
+                data = journal.read()
+        except FileNotFoundError:
+            return chunks_done
+        complete = len(data) - len(data) % self.RECORD.size
+        for chunk_number, size in self.RECORD.iter_unpack(data[:complete]):
+            chunks_done[chunk_number] = size
+        return chunks_done
 
     def get_progress_data(self):
         try:
-            with open(f"chunks\/.temp-{self.episode_id}\/.resume_data", "rb") as resume_data_file:
+            with open(self.resume_data_path, "rb") as resume_data_file:
                 resume_data = pickle.load(resume_data_file)
-            with open(f"chunks\/.temp-{self.episode_id}\/.chunks_done", "rb") as chunks_done_file:
-                chunks_done = pickle.load(chunks_done_file)
-            return resume_data, chunks_done
+            return resume_data, self.read_journal()
         except:
             print("No data found!")
             return None
 
     def remove_data(self):
-        os.remove(f"chunks\/.temp-{self.episode_id}\/.resume_data")
-        os.remove(f"chunks\/.temp-{self.episode_id}\/.chunks_done")
+        if self.__journal:
+            self.__journal.close()
+            self.__journal = None
+        for path in (self.resume_data_path, self.journal_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        try:
+            os.rmdir(self.directory)
+        except OSError:
+            pass
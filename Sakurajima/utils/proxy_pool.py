@@ -0,0 +1,217 @@
+import time
+import random
+from threading import Lock
+
+
+class ProxyStats(object):
+    """The health statistics of a single proxy in a :class:`ProxyPool`."""
+
+    def __init__(self, proxy: str):
+        self.proxy = proxy
+        """The proxy URL."""
+        self.latency = None
+        """The exponentially weighted moving average of the request latency in seconds."""
+        self.throughput = None
+        """The exponentially weighted moving average of the download throughput in bytes per second."""
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.bans = 0
+        self.evicted_until = 0.0
+        """The monotonic time until which the proxy is not used, 0 if the proxy is healthy."""
+        self.in_flight = 0
+        """The number of striped requests currently going through the proxy."""
+
+    @property
+    def success_rate(self):
+        total = self.successes + self.failures
+        if total == 0:
+            return 1.0
+        return self.successes / total
+
+    @property
+    def score(self):
+        """Higher is better. Proxies that have not been used yet get the highest possible score so
+        that every proxy gets measured."""
+        if self.latency is None:
+            return 0.0 if self.failures else float("inf")
+        return self.success_rate / max(self.latency, 0.001)
+
+    def __repr__(self):
+        return f"<ProxyStats {self.proxy}: {self.successes} ok, {self.failures} failed>"
+
+
+class ProxyPool(object):
+    """A pool of proxies that routes every request through the healthiest proxy available.
+    The pool keeps track of the latency, success rate and bans of every proxy. A proxy that
+    fails ``max_failures`` times in a row or gets banned is evicted, and re-admitted once its
+    ``cooldown`` has passed.
+    """
+    def __init__(
+        self,
+        proxies,
+        max_failures: int = 3,
+        cooldown: float = 300,
+        ban_status_codes=(403, 429),
+        timeout: float = 30,
+    ):
+        """
+        :param proxies: A list of proxy URLs, for example "http://1.2.3.4:8080".
+        :type proxies: list[str]
+        :param max_failures: The number of consecutive failures after which a proxy is evicted, defaults to 3.
+        :type max_failures: int, optional
+        :param cooldown: The number of seconds an evicted proxy stays out of the pool, defaults to 300.
+        :type cooldown: float, optional
+        :param ban_status_codes: HTTP status codes that mean the proxy has been banned, defaults to (403, 429).
+        :type ban_status_codes: tuple, optional
+        :param timeout: The timeout in seconds for requests made through the pool, defaults to 30.
+        :type timeout: float, optional
+        """
+        if not proxies:
+            raise ValueError("ProxyPool needs at least one proxy")
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.ban_status_codes = ban_status_codes
+        self.timeout = timeout
+        self.stats = {proxy: ProxyStats(proxy) for proxy in proxies}
+        """A dictionary of :class:`ProxyStats` keyed by the proxy URL."""
+        self.__lock = Lock()
+
+    @classmethod
+    def from_file(cls, proxy_file: str, **kwargs):
+        """Creates a pool from a file with one proxy per line.
+
+        :param proxy_file: The path of the file.
+        :type proxy_file: str
+        :rtype: :class:`ProxyPool`
+        """
+        with open(proxy_file, "r") as proxy_file_handle:
+            proxies = [line.strip() for line in proxy_file_handle if line.strip()]
+        return cls(proxies, **kwargs)
+
+    def __len__(self):
+        return len(self.stats)
+
+    @property
+    def healthy(self):
+        """The proxies that are currently not evicted."""
+        now = time.monotonic()
+        return [stats.proxy for stats in self.stats.values() if stats.evicted_until <= now]
+
+    def choose(self, exclude=()) -> str:
+        """Chooses the proxy the next request should go through. This is the healthy proxy with
+        the best score, ties are broken randomly. If every proxy is evicted, the one that is due
+        to be re-admitted first is returned.
+
+        :param exclude: Proxies that should not be chosen if there is any other one left, for example
+                        the ones a request has already failed through, defaults to ().
+        :type exclude: tuple, optional
+        :rtype: str
+        """
+        with self.__lock:
+            now = time.monotonic()
+            remaining = [stats for stats in self.stats.values() if stats.proxy not in exclude] or list(self.stats.values())
+            candidates = [stats for stats in remaining if stats.evicted_until <= now]
+            if not candidates:
+                return min(remaining, key=lambda stats: stats.evicted_until).proxy
+            best = max(stats.score for stats in candidates)
+            return random.choice([stats for stats in candidates if stats.score == best]).proxy
+
+    def stripe(self, exclude=()) -> str:
+        """Chooses the proxy the next segment of a striped download should go through, and counts
+        the request as in flight on it until :meth:`release` is called. Segments are spread across
+        all the healthy proxies in proportion to their measured throughput, by picking the proxy
+        that would finish one more request the soonest. Proxies whose throughput has not been
+        measured yet are treated like the fastest one.
+
+        :param exclude: Proxies that should not be chosen if there is any other one left, defaults to ().
+        :type exclude: tuple, optional
+        :rtype: str
+        """
+        with self.__lock:
+            now = time.monotonic()
+            remaining = [stats for stats in self.stats.values() if stats.proxy not in exclude] or list(self.stats.values())
+            candidates = [stats for stats in remaining if stats.evicted_until <= now]
+            if not candidates:
+                chosen = min(remaining, key=lambda stats: stats.evicted_until)
+            else:
+                measured = [stats.throughput for stats in candidates if stats.throughput]
+                fastest = max(measured) if measured else 1.0
+                chosen = min(
+                    candidates, key=lambda stats: (stats.in_flight + 1) / (stats.throughput or fastest)
+                )
+            chosen.in_flight += 1
+            return chosen.proxy
+
+    def release(self, proxy: str):
+        """Marks a striped request that was started with :meth:`stripe` as finished.
+
+        :param proxy: The proxy the request went through.
+        :type proxy: str
+        """
+        with self.__lock:
+            stats = self.stats.get(proxy)
+            if stats is not None:
+                stats.in_flight -= 1
+
+    def report(self, proxy: str, latency: float, success: bool, banned: bool = False, size: int = 0):
+        """Reports the outcome of a request made through a proxy.
+
+        :param proxy: The proxy the request went through.
+        :type proxy: str
+        :param latency: How long the request took in seconds.
+        :type latency: float
+        :param success: Whether the request succeeded.
+        :type success: bool
+        :param banned: Whether the response shows that the proxy has been banned, defaults to False.
+        :type banned: bool, optional
+        :param size: The number of bytes received, defaults to 0.
+        :type size: int, optional
+        """
+        with self.__lock:
+            stats = self.stats.get(proxy)
+            if stats is None:
+                return
+            if success and not banned:
+                stats.successes += 1
+                stats.consecutive_failures = 0
+                stats.evicted_until = 0.0
+                stats.latency = latency if stats.latency is None else 0.8 * stats.latency + 0.2 * latency
+                if size and latency > 0:
+                    throughput = size / latency
+                    stats.throughput = throughput if stats.throughput is None else 0.8 * stats.throughput + 0.2 * throughput
+                return
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            if banned:
+                stats.bans += 1
+            if banned or stats.consecutive_failures >= self.max_failures:
+                stats.evicted_until = time.monotonic() + self.cooldown
+                stats.consecutive_failures = 0
+
+    def evict(self, proxy: str):
+        """Takes a proxy out of the pool until its cooldown has passed.
+
+        :param proxy: The proxy to evict.
+        :type proxy: str
+        """
+        with self.__lock:
+            self.stats[proxy].evicted_until = time.monotonic() + self.cooldown
+
+    def is_ban(self, response) -> bool:
+        """Checks if a response shows that the proxy it went through has been banned.
+
+        :rtype: bool
+        """
+        return response.status_code in self.ban_status_codes
+
+    @staticmethod
+    def as_requests_proxies(proxy: str) -> dict:
+        """Converts a proxy URL into the ``proxies`` dictionary that ``requests`` expects.
+
+        :rtype: dict
+        """
+        return {"http": proxy, "https": proxy}
+
+    def __repr__(self):
+        return f"<ProxyPool: {len(self.healthy)}/{len(self.stats)} healthy>"
@@ -0,0 +1,127 @@
+import time
+from threading import Lock
+
+
+class TokenBucket(object):
+    """A thread-safe token bucket. Tokens are added at ``rate`` per second up to ``burst``, and
+    every request takes one. Callers that find the bucket empty reserve a token ahead of time and
+    sleep until it is theirs, so waiting threads are served in the order they arrived.
+    """
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        :param rate: The number of requests allowed per second in the long run.
+        :type rate: float
+        :param burst: The number of requests that are allowed to be made at once, defaults to 1.
+        :type burst: int, optional
+        """
+        if rate <= 0:
+            raise ValueError("The rate of a TokenBucket has to be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.__tokens = float(self.burst)
+        self.__last = time.monotonic()
+        self.__lock = Lock()
+
+    def reserve(self) -> float:
+        """Takes a token from the bucket without waiting for it.
+
+        :return: The number of seconds the caller has to wait before making its request.
+        :rtype: float
+        """
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.burst, self.__tokens + (now - self.__last) * self.rate)
+            self.__last = now
+            self.__tokens -= 1
+            if self.__tokens >= 0:
+                return 0.0
+            return -self.__tokens / self.rate
+
+    def acquire(self):
+        """Blocks until a request is allowed to be made."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def __repr__(self):
+        return f"<TokenBucket {self.rate}/s, burst {self.burst}>"
+
+
+class RateLimiter(object):
+    """Limits the rate of the requests made to the API. Limits can be set for all the requests,
+    for every action of a controller or for a single action, with the keys "*", "Controller"
+    and "Controller.action" respectively, for example "Anime" or "Anime.watchAnime". A request
+    has to get past every limit that matches it.
+
+    By default a single limiter, which has no limits set, is shared by every :class:`Sakurajima`
+    instance in the process, so the limits set on it through ``client.network.rate_limiter``
+    apply to all of them and across all threads.
+    """
+    def __init__(self, rules: dict = None):
+        """
+        :param rules: The limits, a dictionary of ``(rate, burst)`` tuples keyed by "*", "Controller"
+                      or "Controller.action", defaults to None. See :meth:`set_limit`.
+        :type rules: dict, optional
+        """
+        self.__buckets = {}
+        self.__lock = Lock()
+        for key, (rate, burst) in (rules or {}).items():
+            self.set_limit(key, rate, burst)
+
+    def set_limit(self, key: str, rate: float, burst: int = 1):
+        """Sets a limit, replacing the previous one for the same key.
+
+        :param key: "*" for all requests, "Controller" for every action of a controller or
+                    "Controller.action" for a single action.
+        :type key: str
+        :param rate: The number of requests allowed per second in the long run.
+        :type rate: float
+        :param burst: The number of requests that are allowed to be made at once, defaults to 1.
+        :type burst: int, optional
+        """
+        with self.__lock:
+            self.__buckets[key] = TokenBucket(rate, burst)
+
+    def remove_limit(self, key: str):
+        """Removes a limit.
+
+        :param key: The key the limit was set for.
+        :type key: str
+        """
+        with self.__lock:
+            self.__buckets.pop(key, None)
+
+    @property
+    def limits(self):
+        """The limits that are set, as a dictionary of :class:`TokenBucket` keyed like in :meth:`set_limit`."""
+        with self.__lock:
+            return dict(self.__buckets)
+
+    def acquire(self, controller: str = None, action: str = None):
+        """Blocks until a request to the given controller and action is allowed by every matching limit.
+        Requests that are not API calls, like the ones made by :meth:`Network.get_with_user_session`,
+        only count against the "*" limit.
+
+        :param controller: The controller of the request, defaults to None.
+        :type controller: str, optional
+        :param action: The action of the request, defaults to None.
+        :type action: str, optional
+        """
+        keys = ["*"]
+        if controller:
+            keys.append(controller)
+            if action:
+                keys.append(f"{controller}.{action}")
+        with self.__lock:
+            buckets = [self.__buckets[key] for key in keys if key in self.__buckets]
+        # A token is reserved in every bucket at once, so the wait is the longest of them
+        # rather than their sum.
+        wait = max([bucket.reserve() for bucket in buckets], default=0.0)
+        if wait > 0:
+            time.sleep(wait)
+
+    def __repr__(self):
+        return f"<RateLimiter {list(self.limits)}>"
+
+
+_shared_rate_limiter = RateLimiter()
@@ -0,0 +1,137 @@
+import json
+import time
+import hashlib
+from threading import Lock
+
+
+class ResponseCache(object):
+    """A persistent cache of the responses to read-only API actions, kept in an SQLite database
+    so that it survives restarts and can be shared by several processes. Every action has its
+    own time to live, see :attr:`DEFAULT_TTLS`. Only the actions that have a time to live are
+    cached, and responses that report an error are never cached.
+
+    Responses are cached by the request data alone. Since some of them, like the episode list,
+    contain details that depend on the user, use a separate cache per account.
+    """
+    DEFAULT_TTLS = {
+        "Anime.getAnime": 24 * 60 * 60,
+        "Anime.getEpisodes": 60 * 60,
+        "Anime.getRecommendations": 24 * 60 * 60,
+        "Anime.getSeasonalAnime": 6 * 60 * 60,
+        "Anime.getPopularAnime": 60 * 60,
+        "Relation.getRelation": 7 * 24 * 60 * 60,
+        "Media.getMedia": 24 * 60 * 60,
+    }
+    """The default time to live in seconds of each cached action, keyed by "Controller.action"."""
+
+    def __init__(self, path: str = "sakurajima_cache.sqlite3", ttls: dict = None):
+        """
+        :param path: The path of the SQLite database, defaults to "sakurajima_cache.sqlite3".
+                     Use ":memory:" for a cache that is not persisted.
+        :type path: str, optional
+        :param ttls: Times to live in seconds keyed by "Controller.action" that override or add to
+                     :attr:`DEFAULT_TTLS`, defaults to None. A time to live of 0 or None stops the
+                     action from being cached.
+        :type ttls: dict, optional
+        """
+        # Imported here so that clients without a cache do not pay for loading SQLite.
+        import sqlite3
+
+        self.path = path
+        self.ttls = dict(self.DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.__lock = Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, action TEXT NOT NULL, response TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS responses_action ON responses (action)")
+
+    @staticmethod
+    def get_action(data: dict) -> str:
+        """Gets the "Controller.action" key of a request.
+
+        :param data: The data of the API request.
+        :type data: dict
+        :rtype: str
+        """
+        return f"{data.get('controller')}.{data.get('action')}"
+
+    @staticmethod
+    def get_key(data: dict) -> str:
+        return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+    def is_cacheable(self, data: dict) -> bool:
+        """Checks if the response to a request is cached.
+
+        :param data: The data of the API request.
+        :type data: dict
+        :rtype: bool
+        """
+        return isinstance(data, dict) and bool(self.ttls.get(self.get_action(data)))
+
+    def get(self, data: dict):
+        """Gets the cached response to a request.
+
+        :param data: The data of the API request.
+        :type data: dict
+        :return: The decoded JSON response, or None if it is not cached or has expired.
+        """
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT response, expires FROM responses WHERE key = ?", (self.get_key(data),)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, data: dict, response):
+        """Caches the response to a request if the action is cached and the response is not an error.
+
+        :param data: The data of the API request.
+        :type data: dict
+        :param response: The decoded JSON response.
+        """
+        if not self.is_cacheable(data):
+            return
+        if isinstance(response, dict) and response.get("success", True) != True:
+            return
+        action = self.get_action(data)
+        with self.__lock:
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO responses (key, action, response, expires) VALUES (?, ?, ?, ?)",
+                (self.get_key(data), action, json.dumps(response), time.time() + self.ttls[action]),
+            )
+
+    def invalidate(self, action: str = None, data: dict = None):
+        """Removes responses from the cache.
+
+        :param action: Removes every response to this "Controller.action", defaults to None.
+        :type action: str, optional
+        :param data: Removes the response to the request with this data, defaults to None.
+        :type data: dict, optional
+
+        If neither is given, the whole cache is cleared.
+        """
+        with self.__lock:
+            if data is not None:
+                self.__connection.execute("DELETE FROM responses WHERE key = ?", (self.get_key(data),))
+            elif action is not None:
+                self.__connection.execute("DELETE FROM responses WHERE action = ?", (action,))
+            else:
+                self.__connection.execute("DELETE FROM responses")
+
+    def purge_expired(self):
+        """Removes the expired responses from the database."""
+        with self.__lock:
+            self.__connection.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),))
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+    def __repr__(self):
+        return f"<ResponseCache {self.path}>"
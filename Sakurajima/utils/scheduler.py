@@ -0,0 +1,202 @@
+import os
+from threading import Condition, Semaphore
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DownloadJob(object):
+    """Represents a single episode download that was added to a :class:`DownloadScheduler`."""
+
+    def __init__(self, episode, quality, file_name=None, priority=0, index=0, **download_options):
+        self.episode = episode
+        """The :class:`Episode` that is downloaded."""
+        self.quality = quality
+        """The quality the episode is downloaded in."""
+        self.file_name = file_name
+        """The file name template passed to :meth:`Episode.create_downloader`."""
+        self.priority = priority
+        """Jobs with a higher priority get their segments downloaded first."""
+        self.download_options = download_options
+        self.index = index
+        self.state = "pending"
+        """One of "pending", "handshake", "downloading", "merging", "done" or "failed"."""
+        self.error = None
+        """The exception that made the job fail, if it failed."""
+        self.downloader = None
+        self.pending_segments = []
+        self.in_flight = 0
+        self.remaining = 0
+
+    def __repr__(self):
+        return f"<DownloadJob {self.episode}: {self.state}>"
+
+
+class DownloadScheduler(object):
+    """Downloads many episodes, possibly of different anime, through a single shared pool
+    of segment downloads. The number of segments downloaded at once is capped globally
+    instead of per episode. Handshakes for upcoming episodes run while the segments of
+    earlier episodes are downloading, and finished episodes are merged in the background.
+
+    Whenever a slot in the pool frees up, the next segment is taken from the job with the
+    highest priority. Among jobs of equal priority, the one with the fewest segments in
+    flight wins, so the bandwidth is shared fairly between them.
+    """
+    def __init__(self, max_segments: int = 32, max_handshakes: int = 4, max_retries: int = 3, path: str = None):
+        """
+        :param max_segments: The maximum number of segments that are downloaded at once across
+                             all the jobs, defaults to 32.
+        :type max_segments: int, optional
+        :param max_handshakes: The maximum number of episodes whose M3U8 data is fetched at once,
+                               this also bounds the number of episodes that are merged at once, defaults to 4.
+        :type max_handshakes: int, optional
+        :param max_retries: The number of times a failed segment is retried, defaults to 3.
+        :type max_retries: int, optional
+        :param path: The directory the episodes are downloaded to, defaults to None. If None, the
+                     current working directory is used.
+        :type path: str, optional
+        """
+        self.max_segments = max_segments
+        self.max_handshakes = max_handshakes
+        self.max_retries = max_retries
+        self.path = path
+        self.jobs = []
+        self.__condition = Condition()
+
+    def add(self, episode, quality: str, file_name: str = None, priority: int = 0, **download_options):
+        """Adds an episode to the scheduler.
+
+        :param episode: The episode that is to be downloaded.
+        :type episode: :class:`Episode`
+        :param quality: The quality the episode is to be downloaded in, see :meth:`Episode.download`.
+        :type quality: str
+        :param file_name: The file name template, see :meth:`Episode.download`, defaults to None.
+        :type file_name: str, optional
+        :param priority: Jobs with a higher priority get their segments downloaded first, defaults to 0.
+        :type priority: int, optional
+        :param download_options: Passed on to :meth:`Episode.create_downloader`, for example
+                                 ``include_intro``, ``use_ffmpeg``, ``delete_chunks`` or ``direct_write``.
+        :return: The job that was added.
+        :rtype: :class:`DownloadJob`
+        """
+        job = DownloadJob(episode, quality, file_name, priority, len(self.jobs), **download_options)
+        self.jobs.append(job)
+        return job
+
+    def run(self):
+        """Downloads all the added episodes and blocks until they are done. A job that fails
+        does not stop the others, check the ``state`` and ``error`` of the returned jobs.
+
+        :return: The jobs in the order they were added.
+        :rtype: list[:class:`DownloadJob`]
+        """
+        current_path = os.getcwd()
+        if self.path:
+            os.chdir(self.path)
+        self.__slots = Semaphore(self.max_segments)
+        try:
+            with ThreadPoolExecutor(self.max_handshakes) as handshake_pool, \
+                    ThreadPoolExecutor(self.max_segments) as segment_pool:
+                self.__handshake_pool = handshake_pool
+                for job in self.jobs:
+                    job.state = "handshake"
+                    handshake_pool.submit(self.__prepare, job)
+                while True:
+                    self.__slots.acquire()
+                    with self.__condition:
+                        job = self.__next_job()
+                        while job is None and not self.__all_finished():
+                            self.__condition.wait()
+                            job = self.__next_job()
+                        if job is None:
+                            self.__slots.release()
+                            break
+                        segment = job.pending_segments.pop(0)
+                        job.in_flight += 1
+                    segment_pool.submit(self.__download_segment, job, segment)
+        finally:
+            os.chdir(current_path)
+        return self.jobs
+
+    def __next_job(self):
+        candidates = [job for job in self.jobs if job.state == "downloading" and job.pending_segments]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda job: (-job.priority, job.in_flight, job.index))
+
+    def __all_finished(self):
+        return all(job.state in ("done", "failed") for job in self.jobs)
+
+    def __fail(self, job, error):
+        with self.__condition:
+            if job.state != "failed":
+                job.state = "failed"
+                job.error = error
+            job.pending_segments = []
+            self.__condition.notify_all()
+        writer = getattr(job.downloader, "writer", None)
+        if writer is not None:
+            # Segments of the job that wait for their turn in the writer would otherwise hold
+            # their slots and threads forever.
+            writer.abort(error)
+
+    def __prepare(self, job):
+        try:
+            m3u8 = job.episode.get_m3u8(job.quality, prefetch=True)
+            if m3u8 is None:
+                raise ValueError(f"Could not get the {job.quality} stream of {job.episode}")
+            options = dict(job.download_options)
+            options.setdefault("max_retries", self.max_retries)
+            # The downloader keeps this many connections alive, one for every segment that can be in flight.
+            options.setdefault("max_threads", self.max_segments)
+            job.downloader = job.episode.create_downloader(
+                m3u8, job.file_name, multi_threading=True, print_progress=False, **options
+            )
+            segments = job.downloader.prepare()
+        except Exception as e:
+            self.__fail(job, e)
+            return
+        with self.__condition:
+            job.pending_segments = segments
+            job.remaining = len(segments)
+            job.state = "downloading"
+            if not segments:
+                job.state = "merging"
+                self.__handshake_pool.submit(self.__finish, job)
+            self.__condition.notify_all()
+
+    def __download_segment(self, job, segment):
+        try:
+            if job.state == "downloading":
+                job.downloader.assign_segments(segment)
+        except Exception as e:
+            self.__fail(job, e)
+        finally:
+            self.__slots.release()
+            with self.__condition:
+                job.in_flight -= 1
+                job.remaining -= 1
+                if job.remaining == 0 and job.state == "downloading":
+                    job.state = "merging"
+                    self.__handshake_pool.submit(self.__finish, job)
+                elif job.state == "failed" and job.in_flight == 0:
+                    self.__handshake_pool.submit(self.__close, job)
+                self.__condition.notify_all()
+
+    def __close(self, job):
+        # Releases the output of a failed job once none of its segments are in flight.
+        try:
+            job.downloader.finish()
+        except Exception:
+            pass
+
+    def __finish(self, job):
+        try:
+            job.downloader.finish()
+            job.downloader.merge()
+            if job.downloader.delete_chunks:
+                job.downloader.remove_chunks()
+        except Exception as e:
+            self.__fail(job, e)
+            return
+        with self.__condition:
+            job.state = "done"
+            self.__condition.notify_all()
@@ -0,0 +1,171 @@
+import os
+import subprocess
+from threading import Condition
+
+
+class OrderedWriter(object):
+    """Writes chunks that finish downloading out of order straight into a single output file,
+    in their original order. Chunks that arrive before their turn are held in a bounded reorder
+    buffer, so no intermediate chunk files are needed and the output is written in a single pass.
+    """
+    def __init__(
+        self, file_name: str, max_buffered: int = 32, start_index: int = 0, offset: int = 0, on_write=None, file=None
+    ):
+        """
+        :param file_name: The path of the output file.
+        :type file_name: str
+        :param max_buffered: The maximum number of chunks that can be held in memory while they
+                             wait for the chunks before them, defaults to 32.
+        :type max_buffered: int, optional
+        :param start_index: The index of the first chunk that will be written, defaults to 0.
+                            Used together with ``offset`` to resume writing an output file whose
+                            first ``start_index`` chunks have already been written.
+        :type start_index: int, optional
+        :param offset: The size in bytes of the part of the output file that is kept when resuming,
+                       anything after it is truncated, defaults to 0.
+        :type offset: int, optional
+        :param on_write: Register a function that is called every time a chunk has been written to the
+                         output file, the function is passed the index of the chunk and its size in bytes,
+                         defaults to None.
+        :type on_write: ``function``, optional
+        :param file: An open binary file-like object to write to instead of opening ``file_name``,
+                     defaults to None. It is closed by :meth:`close`.
+        """
+        self.file_name = file_name
+        self.max_buffered = max_buffered
+        self.on_write = on_write
+        if file is not None:
+            self.__file = file
+        elif start_index and os.path.exists(file_name):
+            self.__file = open(file_name, "r+b")
+            self.__file.truncate(offset)
+            self.__file.seek(offset)
+        else:
+            self.__file = open(file_name, "wb")
+        self.__buffer = {}
+        self.__next_index = start_index
+        self.__condition = Condition()
+        self.__error = None
+
+    @property
+    def next_index(self):
+        """The index of the next chunk that will be written to the output file."""
+        return self.__next_index
+
+    def can_accept(self, index: int):
+        """Checks if a chunk with the given index would fit in the reorder buffer right now.
+
+        :param index: The index of the chunk.
+        :type index: int
+        :rtype: bool
+        """
+        # An aborted writer accepts everything so that nothing keeps waiting for it, writing then raises.
+        return self.__error is not None or index < self.__next_index + self.max_buffered
+
+    @property
+    def aborted(self):
+        """Whether the writer has been aborted or closed."""
+        return self.__error is not None
+
+    def abort(self, error: Exception):
+        """Aborts the writer, for example because a chunk failed to download and the chunks after
+        it can never be written. Every thread that is waiting in :meth:`acquire` is woken up, and
+        :meth:`acquire` and :meth:`write` raise from now on.
+
+        :param error: The reason the writer is aborted.
+        :type error: Exception
+        """
+        with self.__condition:
+            if self.__error is None:
+                self.__error = error
+            self.__buffer.clear()
+            self.__condition.notify_all()
+
+    def __check(self):
+        # The error the writer was aborted with is raised, so callers see why the output failed.
+        if self.__error is not None:
+            raise self.__error
+
+    def acquire(self, index: int):
+        """Blocks until there is room in the reorder buffer for the chunk with the given index.
+        Call this before starting to download the chunk so that at most ``max_buffered`` chunks
+        are held in memory at once.
+
+        :param index: The index of the chunk.
+        :type index: int
+        """
+        with self.__condition:
+            while not self.can_accept(index):
+                self.__condition.wait()
+            self.__check()
+
+    def write(self, index: int, data: bytes):
+        """Hands a downloaded chunk to the writer. The chunk is written right away if it is the
+        next one in order, otherwise it is buffered until the chunks before it have been written.
+
+        :param index: The index of the chunk.
+        :type index: int
+        :param data: The decrypted chunk.
+        :type data: bytes
+        """
+        with self.__condition:
+            self.__check()
+            self.__buffer[index] = data
+            while self.__next_index in self.__buffer:
+                chunk = self.__buffer.pop(self.__next_index)
+                self.__file.write(chunk)
+                if self.on_write:
+                    self.__file.flush()
+                    self.on_write(self.__next_index, len(chunk))
+                self.__next_index += 1
+            self.__condition.notify_all()
+
+    def close(self):
+        """Flushes and closes the output file. Chunks that are still waiting in the reorder
+        buffer are discarded, and threads that are still waiting to write are woken up."""
+        self.abort(ValueError("the writer is closed"))
+        with self.__condition:
+            self.__file.close()
+
+
+class FFmpegWriter(OrderedWriter):
+    """An :class:`OrderedWriter` that pipes the chunks into ``ffmpeg`` in order while they are
+    downloaded, instead of writing them to a file. ``ffmpeg`` remuxes them into the output file
+    as they arrive, so the output is ready as soon as the last chunk is in. Requires ``ffmpeg``.
+
+    Unlike a plain :class:`OrderedWriter`, an interrupted output can not be resumed, ``ffmpeg``
+    has to be fed the episode from the start.
+    """
+    def __init__(self, file_name: str, max_buffered: int = 32, on_write=None, ffmpeg: str = "ffmpeg"):
+        """
+        :param file_name: The path of the output file, its extension decides the container.
+        :type file_name: str
+        :param max_buffered: The maximum number of chunks that can be held in memory while they
+                             wait for the chunks before them, defaults to 32.
+        :type max_buffered: int, optional
+        :param on_write: Register a function that is called every time a chunk has been handed to
+                         ``ffmpeg``, the function is passed the index of the chunk and its size in
+                         bytes, defaults to None.
+        :type on_write: ``function``, optional
+        :param ffmpeg: The path of the ``ffmpeg`` executable, defaults to "ffmpeg".
+        :type ffmpeg: str, optional
+        """
+        self.args = [
+            ffmpeg, "-y", "-loglevel", "error", "-f", "mpegts", "-i", "pipe:0", "-c", "copy", file_name
+        ]
+        self.__process = subprocess.Popen(self.args, stdin=subprocess.PIPE)
+        super().__init__(file_name, max_buffered, on_write=on_write, file=self.__process.stdin)
+
+    def close(self):
+        """Closes the pipe and waits for ``ffmpeg`` to finish the output file.
+
+        :raises subprocess.CalledProcessError: If ``ffmpeg`` fails.
+        """
+        try:
+            super().close()
+        except BrokenPipeError:
+            # ffmpeg already exited, its exit code says why.
+            pass
+        returncode = self.__process.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, self.args)
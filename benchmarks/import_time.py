@@ -0,0 +1,75 @@
+"""Measures how long ``import Sakurajima`` takes in a fresh interpreter, and checks that the
+download stack is not imported along with it.
+
+Usage::
+
+    python benchmarks/import_time.py [--runs 10] [--budget 250]
+
+Exits with a non-zero status if the median import time exceeds the budget in milliseconds,
+or if any of the modules that should only be loaded on demand were imported.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that are only needed to download or decrypt episodes.
+LAZY_MODULES = [
+    "Sakurajima.utils.playlist",
+    "Crypto",
+    "pathvalidate",
+    "progress",
+    "multiprocessing",
+    "asyncio",
+    "aiohttp",
+    "sqlite3",
+    "Sakurajima.utils.downloader",
+    "Sakurajima.utils.scheduler",
+    "Sakurajima.utils.decrypter_provider",
+]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import Sakurajima
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def measure():
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="the number of fresh interpreters to measure")
+    parser.add_argument("--budget", type=float, default=250, help="the maximum median import time in milliseconds")
+    args = parser.parse_args()
+
+    results = [measure() for _ in range(args.runs)]
+    times = [result["elapsed"] * 1000 for result in results]
+    median = statistics.median(times)
+    print(f"import Sakurajima: median {median:.1f} ms, min {min(times):.1f} ms, max {max(times):.1f} ms ({args.runs} runs)")
+
+    loaded = set(results[0]["modules"])
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    failed = False
+    if eager:
+        print(f"modules that should be imported lazily were imported: {', '.join(eager)}")
+        failed = True
+    if median > args.budget:
+        print(f"the median import time exceeds the budget of {args.budget:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
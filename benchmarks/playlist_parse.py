@@ -0,0 +1,53 @@
+"""Measures how long it takes to parse a media playlist like the ones aniwatch.me serves, with
+the built-in :class:`Playlist` parser and, if it is installed, with the m3u8 library.
+
+Usage::
+
+    python benchmarks/playlist_parse.py [--segments 600] [--runs 200]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Sakurajima.utils.playlist import Playlist
+
+
+def make_playlist(segments: int) -> str:
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:10", "#EXT-X-MEDIA-SEQUENCE:0"]
+    for index in range(segments):
+        if index % 100 == 0:
+            lines.append(f'#EXT-X-KEY:METHOD=AES-128,URI="https://aniwatch.me/key/{index // 100}"')
+        lines.append("#EXTINF:10.010000,")
+        lines.append(f"https://cdn.aniwatch.me/stream/{index}.ts?token=abcdef&expires=1600000000")
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def measure(parse, text: str, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        parse(text)
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, default=600, help="the number of segments in the playlist")
+    parser.add_argument("--runs", type=int, default=200, help="the number of times the playlist is parsed")
+    args = parser.parse_args()
+
+    text = make_playlist(args.segments)
+    print(f"Playlist.loads: {measure(Playlist.loads, text, args.runs):.3f} ms per playlist")
+    try:
+        from m3u8 import M3U8
+    except ImportError:
+        return
+    # Reading the segments through data is what the downloaders did with M3U8 objects.
+    print(f"m3u8.M3U8:      {measure(lambda text: M3U8(text).data['segments'], text, args.runs):.3f} ms per playlist")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,7 +21,9 @@ setup(
     install_requires=[
         "requests>=2.23.0",
         "pycryptodome>=3.9.7",
-        "m3u8>=0.6.0",
         "pathvalidate>=2.3.0"
     ],
+    extras_require={
+        "async": ["aiohttp>=3.6.2"]
+    },
 )
@@ -0,0 +1,51 @@
+import unittest
+
+from Sakurajima.utils.catalog import CatalogIndex
+
+
+class _Anime(object):
+    def __init__(self, **data):
+        self.data_dict = data
+
+
+class CatalogIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = CatalogIndex(":memory:")
+        self.index.add(
+            [
+                _Anime(detail_id=1, title="Naruto", synonyms=["ナルト"], tags=["Ninja"]),
+                _Anime(detail_id=2, title="Naruto Shippuden", synonyms=[], tags=["Ninja"]),
+                _Anime(detail_id=3, title="Bleach", synonyms=[], tags=["Shinigami"]),
+                _Anime(title="Without an ID"),
+            ]
+        )
+
+    def tearDown(self):
+        self.index.close()
+
+    def ids(self, results):
+        return [data["detail_id"] for data in results]
+
+    def test_only_anime_with_an_id_are_added(self):
+        self.assertEqual(len(self.index), 3)
+
+    def test_matches_the_beginning_of_words(self):
+        self.assertEqual(self.ids(self.index.search("blea")), [3])
+        self.assertEqual(sorted(self.ids(self.index.search("nin"))), [1, 2])
+        self.assertEqual(self.ids(self.index.search("naruto shipp")), [2])
+
+    def test_tolerates_typos(self):
+        if not self.index.fuzzy:
+            self.skipTest("the trigram tokenizer needs SQLite 3.34 or newer")
+        self.assertEqual(self.ids(self.index.search("narto"))[0], 1)
+        self.assertEqual(self.index.search("narto", fuzzy=False), [])
+
+    def test_replaces_anime_that_are_added_again(self):
+        self.index.add([_Anime(detail_id=3, title="Bleach: Thousand-Year Blood War")])
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.ids(self.index.search("blood")), [3])
+        self.assertEqual(self.index.search("shinigami"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+from Crypto.Cipher import AES
+
+from Sakurajima.utils.hls_server import HLSServer
+from Sakurajima.utils.network import Network
+from Sakurajima.utils.playlist import Playlist
+
+KEY = bytes(range(16))
+SEGMENTS = 12
+
+
+def plain_segment(index):
+    return (b"\x47" + bytes([index]) * 187) * 16
+
+
+def encrypted_segment(index):
+    # Without an IV in the playlist, the media sequence number of the segment is used.
+    return AES.new(KEY, AES.MODE_CBC, iv=index.to_bytes(16, "big")).encrypt(plain_segment(index))
+
+
+class _FakeCDN(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _FakeCDNHandler)
+        self.requests = []
+        self.lock = threading.Lock()
+        self.base = f"http://127.0.0.1:{self.server_port}"
+
+    def playlist(self, token="a"):
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-TARGETDURATION:5",
+            "#EXTINF:5.0,",
+            "https://img.aniwatch.me/intro.ts",
+            f'#EXT-X-KEY:METHOD=AES-128,URI="{self.base}/key"',
+        ]
+        for index in range(1, SEGMENTS + 1):
+            lines += ["#EXTINF:4.0,", f"{self.base}/{index}.ts?token={token}"]
+        lines.append("#EXT-X-ENDLIST")
+        return Playlist.loads("\n".join(lines) + "\n")
+
+
+class _FakeCDNHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].strip("/")
+        with self.server.lock:
+            self.server.requests.append(path)
+        if path == "key":
+            body = KEY
+        elif path.endswith(".ts") and path[:-3].isdigit():
+            body = encrypted_segment(int(path[:-3]))
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class HLSServerTest(unittest.TestCase):
+    def setUp(self):
+        self.cdn = _FakeCDN()
+        threading.Thread(target=self.cdn.serve_forever, daemon=True).start()
+        self.network = Network("user", "1", "token", None, "https://aniwatch.me/api/ajax/APIHandle")
+        self.server = HLSServer(prefetch=2, cache_size=SEGMENTS, max_retries=0).start()
+
+    def tearDown(self):
+        self.server.close()
+        self.cdn.shutdown()
+        self.cdn.server_close()
+
+    def fetch(self, url):
+        with urllib.request.urlopen(url) as response:
+            return response.read()
+
+    def segment_requests(self):
+        with self.cdn.lock:
+            return [path for path in self.cdn.requests if path.endswith(".ts")]
+
+    def test_serves_decrypted_segments_without_the_intro(self):
+        url = self.server.add_stream("episode", self.network, self.cdn.playlist())
+        playlist = Playlist.loads(self.fetch(url).decode())
+        self.assertEqual(len(playlist), SEGMENTS)
+        self.assertFalse(playlist.keys)
+        base = url.rsplit("/", 1)[0]
+        for position, uri in enumerate(playlist.uris):
+            self.assertEqual(self.fetch(f"{base}/{uri}"), plain_segment(position + 1))
+
+    def test_players_share_the_segments(self):
+        url = self.server.add_stream("episode", self.network, self.cdn.playlist())
+        base = url.rsplit("/", 1)[0]
+        results = []
+
+        def play():
+            results.append(b"".join(self.fetch(f"{base}/{position}.ts") for position in range(SEGMENTS)))
+
+        players = [threading.Thread(target=play) for _ in range(3)]
+        for player in players:
+            player.start()
+        for player in players:
+            player.join()
+        expected = b"".join(plain_segment(index) for index in range(1, SEGMENTS + 1))
+        self.assertEqual(results, [expected] * 3)
+        self.assertEqual(sorted(self.segment_requests()), sorted(f"{index}.ts" for index in range(1, SEGMENTS + 1)))
+
+    def test_adding_the_same_stream_keeps_its_cache(self):
+        url = self.server.add_stream("episode", self.network, self.cdn.playlist())
+        self.fetch(url.replace("playlist.m3u8", "0.ts"))
+        self.assertEqual(self.server.add_stream("episode", self.network, self.cdn.playlist()), url)
+        self.assertEqual(self.fetch(url.replace("playlist.m3u8", "0.ts")), plain_segment(1))
+        self.assertEqual(self.segment_requests().count("1.ts"), 1)
+
+    def test_replacing_a_stream_drops_its_cache(self):
+        url = self.server.add_stream("episode", self.network, self.cdn.playlist())
+        self.fetch(url.replace("playlist.m3u8", "0.ts"))
+        self.server.add_stream("episode", self.network, self.cdn.playlist(token="b"))
+        self.assertEqual(self.fetch(url.replace("playlist.m3u8", "0.ts")), plain_segment(1))
+        self.assertEqual(self.segment_requests().count("1.ts"), 2)
+
+    def test_replace_restarts_the_same_stream(self):
+        url = self.server.add_stream("episode", self.network, self.cdn.playlist())
+        self.fetch(url.replace("playlist.m3u8", "0.ts"))
+        self.server.add_stream("episode", self.network, self.cdn.playlist(), replace=True)
+        self.assertEqual(self.fetch(url.replace("playlist.m3u8", "0.ts")), plain_segment(1))
+        self.assertEqual(self.segment_requests().count("1.ts"), 2)
+
+    def test_unknown_paths_are_not_found(self):
+        url = self.server.add_stream("episode", self.network, self.cdn.playlist())
+        for path in (url.replace("playlist.m3u8", f"{SEGMENTS}.ts"), f"{self.server.url}/other/playlist.m3u8"):
+            with self.assertRaises(urllib.error.HTTPError) as raised:
+                self.fetch(path)
+            self.assertEqual(raised.exception.code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
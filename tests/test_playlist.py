@@ -0,0 +1,72 @@
+import unittest
+
+from Sakurajima.utils.playlist import Playlist, get_url_expiry
+
+KEY = {"method": "AES-128", "uri": "https://cdn.example/key"}
+TEXT = "\n".join(
+    [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        "#EXT-X-TARGETDURATION:5",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXTINF:5,",
+        "https://img.aniwatch.me/intro.ts",
+        '#EXT-X-KEY:METHOD=AES-128,URI="https://cdn.example/key"',
+        "#EXTINF:4,",
+        "https://cdn.example/1.ts?expires=1900000000",
+        "#EXTINF:4,",
+        "https://cdn.example/2.ts?expires=1900000000",
+        "#EXTINF:2.5,",
+        "https://cdn.example/3.ts?expires=1900000000",
+        "#EXT-X-ENDLIST",
+    ]
+) + "\n"
+
+
+class PlaylistTest(unittest.TestCase):
+    def setUp(self):
+        self.playlist = Playlist.loads(TEXT)
+
+    def test_dumps_round_trips(self):
+        self.assertEqual(self.playlist.dumps(), TEXT)
+        again = Playlist.loads(self.playlist.dumps())
+        self.assertEqual(again.uris, self.playlist.uris)
+        self.assertEqual(list(again.durations), list(self.playlist.durations))
+        self.assertEqual(list(again.key_indexes), list(self.playlist.key_indexes))
+        self.assertEqual(again.keys, self.playlist.keys)
+
+    def test_parses_segments_and_keys(self):
+        self.assertEqual(len(self.playlist), 4)
+        self.assertEqual(self.playlist.duration, 15.5)
+        self.assertEqual(self.playlist.keys, [KEY])
+        self.assertIsNone(self.playlist.get_key(0))
+        self.assertEqual(self.playlist.get_key(3), KEY)
+        self.assertTrue(self.playlist.is_endlist)
+
+    def test_data_is_shaped_like_m3u8(self):
+        data = self.playlist.data
+        self.assertEqual(data["keys"], [None, KEY])
+        self.assertEqual(data["segments"][0], {"uri": "https://img.aniwatch.me/intro.ts", "duration": 5.0, "key": None})
+        self.assertEqual(data["segments"][1]["key"], KEY)
+        self.assertEqual(data["targetduration"], 5)
+
+    def test_finds_segments(self):
+        self.assertEqual(self.playlist.get_segment_at(0), 0)
+        self.assertEqual(self.playlist.get_segment_at(9), 2)
+        self.assertEqual(self.playlist.get_segment_at(100), 3)
+        self.assertEqual(self.playlist.get_first_segment(), 1)
+        self.assertEqual(self.playlist.get_first_segment(include_intro=True), 0)
+
+    def test_url_expiry(self):
+        self.assertEqual(get_url_expiry(self.playlist.uris[1]), 1900000000.0)
+        self.assertIsNone(get_url_expiry(self.playlist.uris[0]))
+        self.assertIsNone(get_url_expiry("https://cdn.example/1.ts?e=12"))
+
+    def test_rejects_text_that_is_not_a_playlist(self):
+        for text in ("", "<html></html>"):
+            with self.assertRaises(ValueError):
+                Playlist.loads(text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from Sakurajima.utils.progress_tracker import ProgressTracker
+
+
+class ProgressTrackerTest(unittest.TestCase):
+    def setUp(self):
+        # The tracker keeps its files in a "chunks" directory relative to the working directory.
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+        self.resume_data = {"episode_id": 1, "file_name": "episode.mp4", "max_threads": 4}
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def test_journal_round_trips(self):
+        tracker = ProgressTracker(1)
+        tracker.init_tracker(self.resume_data)
+        tracker.update_chunks_done(2, 100)
+        tracker.update_chunks_done(0, 50)
+        self.assertEqual(tracker.get_progress_data(), (self.resume_data, {2: 100, 0: 50}))
+
+    def test_a_partial_record_is_ignored(self):
+        tracker = ProgressTracker(1)
+        tracker.init_tracker(self.resume_data)
+        tracker.update_chunks_done(0, 50)
+        with open(tracker.journal_path, "ab") as journal:
+            journal.write(ProgressTracker.RECORD.pack(1, 60)[:5])
+        self.assertEqual(tracker.read_journal(), {0: 50})
+
+    def test_resume_keeps_the_journal(self):
+        tracker = ProgressTracker(1)
+        tracker.init_tracker(self.resume_data)
+        tracker.update_chunks_done(0, 50)
+        resumed = ProgressTracker(1)
+        resumed.init_tracker(self.resume_data, resume=True)
+        resumed.update_chunks_done(1, 60)
+        self.assertEqual(resumed.read_journal(), {0: 50, 1: 60})
+        restarted = ProgressTracker(1)
+        restarted.init_tracker(self.resume_data)
+        self.assertEqual(restarted.read_journal(), {})
+
+    def test_remove_data_deletes_the_files(self):
+        tracker = ProgressTracker(1)
+        tracker.init_tracker(self.resume_data)
+        tracker.update_chunks_done(0, 50)
+        tracker.remove_data()
+        self.assertFalse(os.path.exists(tracker.directory))
+        self.assertEqual(tracker.read_journal(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
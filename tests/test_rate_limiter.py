@@ -0,0 +1,43 @@
+import time
+import unittest
+
+from Sakurajima.utils.rate_limiter import TokenBucket, RateLimiter
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_allows_a_burst_then_spaces_requests(self):
+        bucket = TokenBucket(10, burst=3)
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0.0] * 3)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, delta=0.02)
+        self.assertAlmostEqual(bucket.reserve(), 0.2, delta=0.02)
+
+    def test_rejects_a_rate_that_is_not_positive(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_every_matching_limit_applies(self):
+        limiter = RateLimiter({"*": (1000, 1000), "Anime.getEpisodes": (20, 1)})
+        started = time.monotonic()
+        for _ in range(3):
+            limiter.acquire("Anime", "getEpisodes")
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+        started = time.monotonic()
+        for _ in range(3):
+            limiter.acquire("Anime", "getAnime")
+        self.assertLess(time.monotonic() - started, 0.05)
+
+    def test_limits_can_be_removed(self):
+        limiter = RateLimiter()
+        limiter.set_limit("Anime", 1)
+        self.assertEqual(list(limiter.limits), ["Anime"])
+        limiter.remove_limit("Anime")
+        started = time.monotonic()
+        for _ in range(3):
+            limiter.acquire("Anime", "getAnime")
+        self.assertLess(time.monotonic() - started, 0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import time
+import unittest
+
+from Sakurajima.utils.response_cache import ResponseCache
+
+ANIME = {"controller": "Anime", "action": "getAnime", "detail_id": 1}
+EPISODES = {"controller": "Anime", "action": "getEpisodes", "detail_id": 1}
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResponseCache(":memory:")
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_caches_the_read_only_actions(self):
+        self.cache.set(ANIME, {"success": True, "anime": {"title": "Naruto"}})
+        self.assertEqual(self.cache.get(ANIME), {"success": True, "anime": {"title": "Naruto"}})
+        self.assertEqual(self.cache.get(dict(reversed(list(ANIME.items())))), self.cache.get(ANIME))
+        self.assertIsNone(self.cache.get(dict(ANIME, detail_id=2)))
+        watched = {"controller": "Profile", "action": "markAsWatched", "detail_id": 1}
+        self.assertFalse(self.cache.is_cacheable(watched))
+        self.cache.set(watched, {"success": True})
+        self.assertIsNone(self.cache.get(watched))
+
+    def test_errors_are_not_cached(self):
+        self.cache.set(ANIME, {"success": False})
+        self.assertIsNone(self.cache.get(ANIME))
+
+    def test_responses_expire(self):
+        cache = ResponseCache(":memory:", ttls={"Anime.getAnime": 0.05, "Anime.getEpisodes": None})
+        self.assertFalse(cache.is_cacheable(EPISODES))
+        cache.set(ANIME, {"success": True})
+        self.assertIsNotNone(cache.get(ANIME))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get(ANIME))
+        cache.close()
+
+    def test_invalidate(self):
+        self.cache.set(ANIME, {"success": True})
+        self.cache.set(EPISODES, {"success": True})
+        self.cache.invalidate(action="Anime.getEpisodes")
+        self.assertIsNone(self.cache.get(EPISODES))
+        self.assertIsNotNone(self.cache.get(ANIME))
+        self.cache.invalidate(data=ANIME)
+        self.assertIsNone(self.cache.get(ANIME))
+
+
+if __name__ == "__main__":
+    unittest.main()
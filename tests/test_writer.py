@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from Sakurajima.utils.writer import OrderedWriter
+
+
+class OrderedWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.directory, "episode.ts")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.file_name, "rb") as file:
+            return file.read()
+
+    def test_writes_chunks_in_order(self):
+        written = []
+        writer = OrderedWriter(self.file_name, on_write=lambda index, size: written.append((index, size)))
+        for index in (2, 0, 3, 1):
+            writer.write(index, bytes([index]) * (index + 1))
+        self.assertEqual(writer.next_index, 4)
+        writer.close()
+        self.assertEqual(self.read(), b"\x00" + b"\x01" * 2 + b"\x02" * 3 + b"\x03" * 4)
+        self.assertEqual(written, [(0, 1), (1, 2), (2, 3), (3, 4)])
+
+    def test_acquire_waits_for_room_in_the_buffer(self):
+        writer = OrderedWriter(self.file_name, max_buffered=2)
+        self.assertTrue(writer.can_accept(1))
+        self.assertFalse(writer.can_accept(2))
+        acquired = threading.Event()
+        thread = threading.Thread(target=lambda: (writer.acquire(2), acquired.set()))
+        thread.start()
+        self.assertFalse(acquired.wait(0.2))
+        writer.write(0, b"a")
+        self.assertTrue(acquired.wait(5))
+        thread.join()
+        writer.close()
+
+    def test_abort_wakes_waiters_with_the_error(self):
+        writer = OrderedWriter(self.file_name, max_buffered=1)
+        error = IOError("chunk 0 failed")
+        raised = []
+
+        def wait():
+            try:
+                writer.acquire(5)
+            except IOError as e:
+                raised.append(e)
+
+        thread = threading.Thread(target=wait)
+        thread.start()
+        writer.write(1, b"b")
+        writer.abort(error)
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(raised, [error])
+        self.assertTrue(writer.aborted)
+        with self.assertRaises(IOError) as context:
+            writer.write(0, b"a")
+        self.assertIs(context.exception, error)
+        writer.close()
+        self.assertEqual(self.read(), b"")
+
+    def test_resume_truncates_to_the_offset(self):
+        with open(self.file_name, "wb") as file:
+            file.write(b"aabbc")
+        writer = OrderedWriter(self.file_name, start_index=2, offset=4)
+        writer.write(2, b"cc")
+        writer.close()
+        self.assertEqual(self.read(), b"aabbcc")
+
+
+if __name__ == "__main__":
+    unittest.main()